@@ -18,4 +18,12 @@ if not settings.configured:
 import pytest
 
 # Configurar pytest-django
-pytest_plugins = ['pytest_django']
\ No newline at end of file
+pytest_plugins = ['pytest_django']
+
+@pytest.fixture(autouse=True)
+def reset_medal_rules():
+    """La tabla de reglas de medallas vive en memoria: no compartirla entre tests"""
+    from gamification.medal_rules import MedalRuleEngine
+    MedalRuleEngine.invalidate()
+    yield
+    MedalRuleEngine.invalidate()
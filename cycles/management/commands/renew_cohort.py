@@ -0,0 +1,145 @@
+# cycles/management/commands/renew_cohort.py
+
+import time
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from cycles.models import UserCycle
+from cycles.services import CycleService
+
+
+class Command(BaseCommand):
+    help = (
+        'Renueva (o avanza, para pruebas) los ciclos de todos los usuarios que cumplen un filtro, '
+        'en lotes transaccionales reanudables'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=['renew', 'advance'],
+            default='renew',
+            help='renew: completa el ciclo y crea el siguiente; advance: retrocede las fechas (default: renew)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Días a avanzar en modo advance (default: 30)'
+        )
+        parser.add_argument(
+            '--status',
+            type=str,
+            default=None,
+            help='Estado de los ciclos (default: PENDING_RENEWAL en renew, ACTIVE en advance)'
+        )
+        parser.add_argument(
+            '--started-after',
+            type=str,
+            default=None,
+            help='Solo ciclos iniciados en o después de esta fecha (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--started-before',
+            type=str,
+            default=None,
+            help='Solo ciclos iniciados antes de esta fecha (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--phenotype',
+            type=str,
+            default=None,
+            help='Solo ciclos con este fenotipo (p. ej. NERD)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Ciclos por lote/transacción (default: 500)'
+        )
+        parser.add_argument(
+            '--resume-from',
+            type=int,
+            default=0,
+            help='Reanudar a partir de este id de ciclo (el último que informó una ejecución interrumpida)'
+        )
+        parser.add_argument(
+            '--snapshot',
+            action='store_true',
+            help='Crear la captura de los ciclos nuevos con el estado actual (solo renew)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Contar los ciclos que se procesarían sin modificarlos'
+        )
+
+    def _parse_day(self, value, option):
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'{option} debe tener formato YYYY-MM-DD')
+        return datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size debe ser 1 o mayor')
+        if options['days'] < 1:
+            raise CommandError('--days debe ser 1 o mayor')
+
+        mode = options['mode']
+        status = options['status'] or ('PENDING_RENEWAL' if mode == 'renew' else 'ACTIVE')
+
+        cycles = UserCycle.objects.filter(status=status)
+        if options['started_after']:
+            cycles = cycles.filter(start_date__gte=self._parse_day(options['started_after'], '--started-after'))
+        if options['started_before']:
+            cycles = cycles.filter(start_date__lt=self._parse_day(options['started_before'], '--started-before'))
+        if options['phenotype']:
+            cycles = cycles.filter(phenotype=options['phenotype'])
+
+        last_id = options['resume_from']
+        total = cycles.filter(id__gt=last_id).count()
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(f'⚠️ {total} ciclo(s) {status} a procesar en modo {mode} (dry-run, sin cambios)')
+            )
+            return
+        if not total:
+            self.stdout.write(self.style.SUCCESS('✅ No hay ciclos que cumplan el filtro'))
+            return
+
+        self.stdout.write(f'🔄 {total} ciclo(s) {status} a procesar en modo {mode}')
+        started = time.monotonic()
+        processed = 0
+        affected = 0
+
+        while True:
+            # Paginación por id: cada lote es una transacción independiente
+            chunk = list(
+                cycles.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:options['chunk_size']]
+            )
+            if not chunk:
+                break
+
+            if mode == 'renew':
+                # Las capturas van en la transacción del lote: una interrupción no deja ciclos sin captura
+                new_cycles = CycleService.renew_cycles(chunk, snapshot=options['snapshot'])
+                affected += len(new_cycles)
+            else:
+                affected += CycleService.advance_cycles(chunk, options['days'])
+
+            processed += len(chunk)
+            last_id = chunk[-1]
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'  • {processed}/{total} ciclos ({processed / elapsed if elapsed else processed:.0f}/s) '
+                f'- último id {last_id}'
+            )
+
+        elapsed = time.monotonic() - started
+        verb = 'renovados' if mode == 'renew' else f'avanzados {options["days"]} días'
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {affected} ciclo(s) {verb} en {elapsed:.2f}s')
+        )
@@ -0,0 +1,40 @@
+# cycles/management/commands/sweep_cycles.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from cycles.models import UserCycle
+from cycles.services import CycleService
+
+
+class Command(BaseCommand):
+    help = 'Pasa a PENDING_RENEWAL todos los ciclos ACTIVE que han llegado a su día 30 (pensado para cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Contar los ciclos vencidos sin actualizarlos'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        started = time.monotonic()
+
+        if options['dry_run']:
+            expired = UserCycle.objects.filter(
+                status='ACTIVE',
+                start_date__lt=UserCycle.renewal_cutoff(now)
+            ).count()
+            self.stdout.write(
+                self.style.WARNING(f'⚠️ {expired} ciclo(s) vencidos pendientes de transición (dry-run, sin cambios)')
+            )
+            return
+
+        updated = CycleService.sweep_expired_cycles(now)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(f'🔄 {updated} ciclo(s) pasados a PENDING_RENEWAL en {elapsed:.2f}s')
+        )
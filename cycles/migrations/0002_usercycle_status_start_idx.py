@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cycles', '0001_initial'),
+        ('programs', '0003_treatmentprogram_color_primary_and_more'),
+        ('questionnaires', '0003_alter_questionnaire_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usercycle',
+            index=models.Index(fields=['status', 'start_date'], name='usercycle_status_start_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cycles', '0002_usercycle_status_start_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cyclehabitassignment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -3,7 +3,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator  # ← Faltaba esta línea
-from datetime import timedelta
+from datetime import datetime, time, timedelta, timezone as dt_timezone
 import uuid
 
 class UserCycle(models.Model):
@@ -77,6 +77,10 @@ class UserCycle(models.Model):
     class Meta:
         ordering = ['-cycle_number']
         unique_together = ('user', 'cycle_number')
+        indexes = [
+            # sweep_cycles: ciclos ACTIVE con start_date vencida
+            models.Index(fields=['status', 'start_date'], name='usercycle_status_start_idx'),
+        ]
         verbose_name = "Ciclo de usuario"
         verbose_name_plural = "Ciclos de usuario"
     
@@ -117,17 +121,35 @@ class UserCycle(models.Model):
         return max(0, remaining)
 
 
+    @staticmethod
+    def renewal_cutoff(now=None):
+        """
+        Los ciclos ACTIVE con start_date anterior a este instante ya están en su
+        día 30 (days_elapsed >= 30): es la medianoche (UTC) de hace 28 días.
+        Permite filtrar los ciclos vencidos en la base de datos con el índice.
+        """
+        today = (now or timezone.now()).date()
+        return datetime.combine(today - timedelta(days=28), time.min, tzinfo=dt_timezone.utc)
+
+    @property
+    def effective_status(self):
+        """
+        Estado del ciclo derivado sin escribir: un ciclo ACTIVE en su día 30
+        ya se considera PENDING_RENEWAL aunque sweep_cycles aún no lo haya movido.
+        """
+        if self.status == 'ACTIVE' and self.days_elapsed >= 30:
+            return 'PENDING_RENEWAL'
+        return self.status
+
     def check_and_update_status(self):
         """
         Actualiza el estado cuando se completan 30 días.
         Se activa cuando days_elapsed = 30 (days_remaining = 0)
         """
-        if self.status == 'ACTIVE':
-            # Cambiar la condición para que se active en día 30
-            if self.days_elapsed >= 30:  # Cambio aquí: >= 30 en lugar de days_remaining <= 0
-                self.status = 'PENDING_RENEWAL'
-                self.save()
-                print(f"Ciclo {self.id} actualizado a PENDING_RENEWAL (día {self.days_elapsed})")
+        if self.status != self.effective_status:
+            self.status = self.effective_status
+            self.save()
+            print(f"Ciclo {self.id} actualizado a PENDING_RENEWAL (día {self.days_elapsed})")
         
         return self.status
     
@@ -146,6 +168,8 @@ class CycleHabitAssignment(models.Model):
         verbose_name="Orden de prioridad",
         help_text="1 para el peor hábito, 5 para el quinto peor"
     )
+    # Versión de la asignación para el ETag del historial de ciclos
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['priority_order']
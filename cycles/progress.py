@@ -0,0 +1,122 @@
+# cycles/progress.py
+"""
+Comparación del progreso entre ciclos.
+
+Cada ciclo guarda su punto de partida en CycleSnapshot (puntuaciones de
+hábitos, IMC) y en UserCycle (GERDq, RSI). Aquí se recorren todos los ciclos
+del usuario con su captura en una sola consulta y se calculan las
+diferencias entre el primer y el último valor de cada serie.
+
+El resultado se cachea por usuario y se invalida al escribir capturas o
+puntuaciones de cuestionarios (ver CycleService).
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from gastro_assistant.cache import app_cache
+from .models import UserCycle
+
+# Con fecha: el estado efectivo de un ciclo (PENDING_RENEWAL el día 30) cambia a diario
+PROGRESS_CACHE_KEY = 'cycles:progress:{user_id}:{date}'
+PROGRESS_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _series_summary(points, lower_is_better):
+    """Primer y último valor, diferencia y tendencia de una serie [(ciclo, valor)]"""
+    if not points:
+        return {'points': [], 'first': None, 'last': None, 'delta': None, 'trend': None}
+
+    first, last = points[0][1], points[-1][1]
+    delta = round(last - first, 2)
+    trend = None
+    if len(points) > 1:
+        improvement = -delta if lower_is_better else delta
+        trend = 'improving' if improvement > 0 else 'worsening' if improvement < 0 else 'stable'
+
+    return {
+        'points': [{'cycle_number': cycle_number, 'value': value} for cycle_number, value in points],
+        'first': first,
+        'last': last,
+        'delta': delta,
+        'trend': trend
+    }
+
+
+class CycleProgressService:
+    """
+    Evolución de hábitos, IMC y cuestionarios a lo largo de los ciclos del usuario
+    """
+
+    @staticmethod
+    def for_user(user):
+        """Progreso entre ciclos, desde caché si no hay capturas nuevas"""
+        cache = app_cache()
+        key = PROGRESS_CACHE_KEY.format(user_id=user.id, date=timezone.now().date().isoformat())
+        result = cache.get(key)
+        if result is None:
+            result = CycleProgressService.compute(user)
+            cache.set(key, result, PROGRESS_CACHE_TIMEOUT)
+        return result
+
+    @staticmethod
+    def invalidate(*user_ids):
+        """Borra el progreso cacheado ahora y tras el commit (como DashboardCache)"""
+        today = timezone.now().date().isoformat()
+        keys = [PROGRESS_CACHE_KEY.format(user_id=user_id, date=today) for user_id in user_ids]
+        if not keys:
+            return
+        cache = app_cache()
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+    @staticmethod
+    def compute(user):
+        """Recorre una vez los ciclos con su captura y construye las series"""
+        cycles = UserCycle.objects.filter(user=user).select_related('snapshot').order_by('cycle_number')
+
+        summary = []
+        habit_points = {}
+        bmi_points = []
+        weight_points = []
+        gerdq_points = []
+        rsi_points = []
+
+        for cycle in cycles:
+            snapshot = getattr(cycle, 'snapshot', None)
+            summary.append({
+                'cycle_number': cycle.cycle_number,
+                'start_date': cycle.start_date,
+                'status': cycle.effective_status,
+                'phenotype': cycle.phenotype,
+                'gerdq_score': cycle.gerdq_score,
+                'rsi_score': cycle.rsi_score,
+                'bmi': snapshot.bmi if snapshot else None,
+                'has_snapshot': snapshot is not None
+            })
+
+            if cycle.gerdq_score is not None:
+                gerdq_points.append((cycle.cycle_number, cycle.gerdq_score))
+            if cycle.rsi_score is not None:
+                rsi_points.append((cycle.cycle_number, cycle.rsi_score))
+            if snapshot is None:
+                continue
+            if snapshot.bmi is not None:
+                bmi_points.append((cycle.cycle_number, snapshot.bmi))
+            if snapshot.weight_kg is not None:
+                weight_points.append((cycle.cycle_number, snapshot.weight_kg))
+            for habit_type, score in snapshot.habit_scores.items():
+                habit_points.setdefault(habit_type, []).append((cycle.cycle_number, score))
+
+        return {
+            'total_cycles': len(summary),
+            'cycles': summary,
+            # En los hábitos una puntuación mayor es mejor (0 peor, 3 mejor)
+            'habits': [
+                {'habit_type': habit_type, **_series_summary(points, lower_is_better=False)}
+                for habit_type, points in sorted(habit_points.items())
+            ],
+            'bmi': _series_summary(bmi_points, lower_is_better=True),
+            'weight_kg': _series_summary(weight_points, lower_is_better=True),
+            'gerdq': _series_summary(gerdq_points, lower_is_better=True),
+            'rsi': _series_summary(rsi_points, lower_is_better=True)
+        }
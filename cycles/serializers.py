@@ -11,6 +11,9 @@ class CycleHabitAssignmentSerializer(serializers.ModelSerializer):
         fields = ['habit_name', 'habit_type', 'initial_score', 'priority_order']
 
 class CycleSerializer(serializers.ModelSerializer):
+    # Estado derivado: un ciclo ACTIVE en su día 30 se muestra como PENDING_RENEWAL
+    # aunque sweep_cycles todavía no lo haya escrito
+    status = serializers.CharField(source='effective_status', read_only=True)
     days_remaining = serializers.ReadOnlyField()
     days_elapsed = serializers.ReadOnlyField()
     assigned_habits = CycleHabitAssignmentSerializer(
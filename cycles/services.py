@@ -1,12 +1,26 @@
 # cycles/services.py
+import heapq
+
 from django.utils import timezone
 from datetime import timedelta
 from django.db import transaction
+from django.db.models import F, Max, Q, Window
+from django.db.models.functions import RowNumber
 from .models import UserCycle, CycleSnapshot, CycleHabitAssignment
+from .progress import CycleProgressService
 from questionnaires.models import UserHabitAnswer, HabitQuestion
 from profiles.models import UserProfile
 from gamification.services import GamificationService  # ← AÑADE ESTO
 
+WORST_HABITS_COUNT = 5
+SNAPSHOT_BATCH_SIZE = 500
+SWEEP_BATCH_SIZE = 5000
+SNAPSHOT_PROFILE_FIELDS = [
+    'weight_kg', 'height_cm', 'bmi', 'has_hernia', 'has_altered_motility',
+    'has_slow_emptying', 'has_dry_mouth', 'has_constipation', 'stress_affects',
+    'endoscopy_result', 'ph_monitoring_result'
+]
+
 
 # En cycles/services.py, actualiza la función create_new_cycle:
 
@@ -22,7 +36,7 @@ class CycleService:
         cycle_number = 1 if not last_cycle else last_cycle.cycle_number + 1
         
         # Si hay un ciclo anterior, marcarlo como completado
-        if last_cycle and last_cycle.status == 'PENDING_RENEWAL':
+        if last_cycle and last_cycle.effective_status == 'PENDING_RENEWAL':
             last_cycle.status = 'COMPLETED'
             last_cycle.save()
             
@@ -42,9 +56,78 @@ class CycleService:
         # NUEVO: Resetear la gamificación para el nuevo ciclo
         from gamification.services import GamificationService
         GamificationService.reset_for_new_cycle(user, new_cycle)
+        CycleProgressService.invalidate(user.id)
         
         return new_cycle
     
+    @staticmethod
+    @transaction.atomic
+    def renew_cycles(cycle_ids, now=None, snapshot=False):
+        """
+        Renovación por lotes (cohortes): completa los ciclos PENDING_RENEWAL
+        indicados y crea el siguiente ciclo de cada usuario con bulk inserts de
+        UserCycle y CycleGamificationSummary y un bulk_update de UserLevel.
+        Con snapshot=True las capturas de los ciclos nuevos se crean en la misma
+        transacción. Los ciclos ya renovados (o que ya no están pendientes) se
+        omiten, así que repetir un lote es seguro. Devuelve los ciclos nuevos.
+        """
+        now = now or timezone.now()
+        
+        pending = {}
+        for cycle in UserCycle.objects.select_for_update().filter(
+            id__in=cycle_ids,
+            status='PENDING_RENEWAL'
+        ).order_by('cycle_number'):
+            # Un ciclo por usuario: el más reciente
+            pending[cycle.user_id] = cycle
+        if not pending:
+            return []
+        
+        last_numbers = dict(
+            UserCycle.objects.filter(user_id__in=pending).values('user_id').annotate(
+                last=Max('cycle_number')
+            ).values_list('user_id', 'last')
+        )
+        
+        completed = list(pending.values())
+        GamificationService.create_cycle_summaries(completed)
+        UserCycle.objects.filter(id__in=[cycle.id for cycle in completed]).update(
+            status='COMPLETED',
+            updated_at=now
+        )
+        
+        new_cycles = UserCycle.objects.bulk_create([
+            UserCycle(
+                user_id=user_id,
+                cycle_number=last_numbers[user_id] + 1,
+                start_date=now,
+                end_date=now + timedelta(days=30),
+                status='ACTIVE'
+            )
+            for user_id in pending
+        ])
+        
+        GamificationService.reset_for_new_cycles(new_cycles)
+        if snapshot:
+            CycleService.snapshot_cycles(new_cycles)
+        CycleProgressService.invalidate(*pending)
+        return new_cycles
+    
+    @staticmethod
+    def advance_cycles(cycle_ids, days):
+        """
+        Retrocede las fechas de varios ciclos `days` días con un solo UPDATE
+        (versión por lotes de advance_cycle, para pruebas con cohortes).
+        Devuelve el número de ciclos actualizados.
+        """
+        shift = timedelta(days=days)
+        return UserCycle.objects.filter(id__in=cycle_ids).update(
+            start_date=F('start_date') - shift,
+            end_date=F('end_date') - shift,
+            onboarding_completed_at=F('onboarding_completed_at') - shift,
+            updated_at=timezone.now()
+        )
+    
     @staticmethod
     def complete_cycle_onboarding(cycle, gerdq_score, rsi_score, phenotype, program):
         """
@@ -56,6 +139,7 @@ class CycleService:
         cycle.program = program
         cycle.onboarding_completed_at = timezone.now()
         cycle.save()
+        CycleProgressService.invalidate(cycle.user_id)
         
         # Crear snapshot del estado actual
         CycleService._create_cycle_snapshot(cycle)
@@ -65,79 +149,132 @@ class CycleService:
         
         return cycle
     
+    @staticmethod
+    def latest_habit_answers(cutoffs):
+        """
+        Última respuesta de cada hábito por usuario, en una sola consulta
+        (ROW_NUMBER() por usuario y pregunta; válido en PostgreSQL y SQLite).
+        cutoffs: {user_id: fecha límite de answered_at o None}.
+        Devuelve {user_id: [(question_id, habit_type, valor), ...]} de la más
+        reciente a la más antigua.
+        """
+        condition = Q(pk__in=[])
+        for user_id, cutoff in cutoffs.items():
+            user_condition = Q(user_id=user_id)
+            if cutoff is not None:
+                user_condition &= Q(answered_at__lte=cutoff)
+            condition |= user_condition
+        
+        rows = UserHabitAnswer.objects.filter(condition).annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F('user_id'), F('question_id')],
+                order_by=[F('answered_at').desc(), F('id').desc()]
+            )
+        ).filter(position=1).order_by('-answered_at', '-id').values_list(
+            'user_id', 'question_id', 'question__habit_type', 'selected_option__value'
+        )
+        
+        answers = {user_id: [] for user_id in cutoffs}
+        for user_id, question_id, habit_type, value in rows:
+            answers[user_id].append((question_id, habit_type, value))
+        return answers
+    
     @staticmethod
     def _create_cycle_snapshot(cycle):
         """
         Crea una captura del estado del usuario al inicio del ciclo.
         """
-        profile = cycle.user.profile
-        
-        # Obtener puntuaciones de hábitos actuales
-# Obtener puntuaciones de hábitos actuales
-        habit_answers = UserHabitAnswer.objects.filter(
-            user=cycle.user,
-            answered_at__lte=cycle.start_date + timedelta(days=1)
-        ).select_related('question', 'selected_option').order_by(
-            'question__id', '-answered_at'  # ← Cambiar a question__id
-        ).distinct('question')
-        
-        habit_scores = {}
-        for answer in habit_answers:
-            habit_scores[answer.question.habit_type] = answer.selected_option.value
-        
-        snapshot = CycleSnapshot.objects.create(
-            cycle=cycle,
-            weight_kg=profile.weight_kg,
-            height_cm=profile.height_cm,
-            bmi=profile.bmi,
-            has_hernia=profile.has_hernia,
-            has_altered_motility=profile.has_altered_motility,
-            has_slow_emptying=profile.has_slow_emptying,
-            has_dry_mouth=profile.has_dry_mouth,
-            has_constipation=profile.has_constipation,
-            stress_affects=profile.stress_affects,
-            endoscopy_result=profile.endoscopy_result,
-            ph_monitoring_result=profile.ph_monitoring_result,
-            habit_scores=habit_scores
-        )
+        created = CycleService.snapshot_cycles([cycle])
+        return created[0] if created else cycle.snapshot
+    
+    @staticmethod
+    def snapshot_cycles(cycles, batch_size=SNAPSHOT_BATCH_SIZE):
+        """
+        Crea las capturas de varios ciclos (de usuarios distintos) con una
+        consulta de respuestas y un bulk_create por lote. Los ciclos que ya
+        tienen captura se omiten. Devuelve las capturas creadas.
+        """
+        cycles = list(cycles)
+        if len({cycle.user_id for cycle in cycles}) != len(cycles):
+            raise ValueError('snapshot_cycles necesita ciclos de usuarios distintos')
+        
+        created = []
+        for offset in range(0, len(cycles), batch_size):
+            chunk = cycles[offset:offset + batch_size]
+            existing = set(
+                CycleSnapshot.objects.filter(cycle__in=chunk).values_list('cycle_id', flat=True)
+            )
+            chunk = [cycle for cycle in chunk if cycle.id not in existing]
+            if not chunk:
+                continue
+            
+            profiles = UserProfile.objects.in_bulk([cycle.user_id for cycle in chunk], field_name='user_id')
+            answers = CycleService.latest_habit_answers({
+                cycle.user_id: cycle.start_date + timedelta(days=1) for cycle in chunk
+            })
+            
+            snapshots = []
+            for cycle in chunk:
+                profile = profiles.get(cycle.user_id)
+                profile_fields = {
+                    field: getattr(profile, field) for field in SNAPSHOT_PROFILE_FIELDS
+                } if profile else {}
+                snapshots.append(CycleSnapshot(
+                    cycle=cycle,
+                    habit_scores={habit_type: value for _, habit_type, value in answers[cycle.user_id]},
+                    **profile_fields
+                ))
+            created.extend(CycleSnapshot.objects.bulk_create(snapshots))
+            CycleProgressService.invalidate(*(cycle.user_id for cycle in chunk))
         
-        return snapshot
+        return created
     
     @staticmethod
     def _assign_worst_habits(cycle):
         """
         Asigna los 5 peores hábitos del usuario para tracking en este ciclo.
         """
-        # Obtener las últimas respuestas de hábitos
-        latest_answers = {}
-        habit_answers = UserHabitAnswer.objects.filter(
-            user=cycle.user
-        ).select_related('question', 'selected_option').order_by('-answered_at')
-        
-        # Obtener la respuesta más reciente para cada hábito
-        for answer in habit_answers:
-            if answer.question.id not in latest_answers:
-                latest_answers[answer.question.id] = answer
-        
-        # Ordenar por puntuación (menor es peor)
-        worst_habits = sorted(
-            latest_answers.values(),
-            key=lambda x: x.selected_option.value
-        )[:5]
-        
-        # Crear asignaciones
-        for i, answer in enumerate(worst_habits, 1):
-            CycleHabitAssignment.objects.create(
-                cycle=cycle,
-                habit=answer.question,
-                initial_score=answer.selected_option.value,
-                priority_order=i
-            )
+        return CycleService.assign_worst_habits_many([cycle])
+    
+    @staticmethod
+    def assign_worst_habits_many(cycles, batch_size=SNAPSHOT_BATCH_SIZE):
+        """
+        Asigna a cada ciclo (de usuarios distintos) los WORST_HABITS_COUNT
+        hábitos con peor última respuesta (menor valor es peor), con selección
+        top-k y un solo bulk_create por lote.
+        """
+        cycles = list(cycles)
+        if len({cycle.user_id for cycle in cycles}) != len(cycles):
+            raise ValueError('assign_worst_habits_many necesita ciclos de usuarios distintos')
+        
+        created = []
+        for offset in range(0, len(cycles), batch_size):
+            chunk = cycles[offset:offset + batch_size]
+            answers = CycleService.latest_habit_answers({cycle.user_id: None for cycle in chunk})
+            
+            assignments = []
+            for cycle in chunk:
+                worst = heapq.nsmallest(WORST_HABITS_COUNT, answers[cycle.user_id], key=lambda answer: answer[2])
+                assignments.extend(
+                    CycleHabitAssignment(
+                        cycle=cycle,
+                        habit_id=question_id,
+                        initial_score=value,
+                        priority_order=i
+                    )
+                    for i, (question_id, _, value) in enumerate(worst, 1)
+                )
+            created.extend(CycleHabitAssignment.objects.bulk_create(assignments))
+        
+        return created
     
     @staticmethod
     def get_current_cycle(user):
         """
         Obtiene el ciclo actual del usuario.
+        Solo lectura: el estado se deriva en memoria (effective_status) y la
+        transición en la base de datos la hace sweep_cycles.
         """
         cycle = UserCycle.objects.filter(
             user=user,
@@ -145,10 +282,77 @@ class CycleService:
         ).first()
         
         if cycle:
-            cycle.check_and_update_status()
+            cycle.status = cycle.effective_status
         
         return cycle
     
+    @staticmethod
+    def status_summary(user):
+        """
+        Estado del ciclo actual para la app (renovación y contadores de días).
+        El ciclo se lee con sus hábitos asignados precargados.
+        """
+        from .serializers import CycleSerializer
+        
+        current_cycle = UserCycle.objects.filter(
+            user=user,
+            status__in=['ACTIVE', 'PENDING_RENEWAL']
+        ).prefetch_related('cyclehabitassignment_set__habit').first()
+        
+        summary = {
+            'needs_renewal': True,
+            'current_cycle': None,
+            'days_remaining': 0,
+            'days_elapsed': 0,
+            'has_completed_onboarding': False
+        }
+        if not current_cycle:
+            return summary
+        
+        # Estado derivado si han pasado 30 días (sin escribir; lo persiste sweep_cycles)
+        current_cycle.status = current_cycle.effective_status
+        days_elapsed = current_cycle.days_elapsed
+        
+        summary.update({
+            'current_cycle': CycleSerializer(current_cycle).data,
+            'days_remaining': current_cycle.days_remaining,
+            'days_elapsed': days_elapsed,
+            'has_completed_onboarding': bool(current_cycle.onboarding_completed_at),
+            # Si estamos en día 30 o el ciclo está en PENDING_RENEWAL
+            'needs_renewal': days_elapsed >= 30 or current_cycle.status == 'PENDING_RENEWAL'
+        })
+        return summary
+    
+    @staticmethod
+    def sweep_expired_cycles(now=None, batch_size=SWEEP_BATCH_SIZE):
+        """
+        Pasa a PENDING_RENEWAL todos los ciclos ACTIVE que ya están en su día 30.
+        Recorre los candidatos por lotes de batch_size con paginación por clave
+        (id__gt sobre el índice (status, start_date)): cada lote es una lectura
+        de (id, user_id) y un UPDATE por rango de ids, sin cargar todos los
+        ciclos vencidos en memoria. Invalida el progreso cacheado de los
+        usuarios afectados. Devuelve el número de ciclos actualizados.
+        """
+        now = now or timezone.now()
+        expired = UserCycle.objects.filter(
+            status='ACTIVE',
+            start_date__lt=UserCycle.renewal_cutoff(now)
+        ).order_by('id')
+        
+        updated = 0
+        last_id = 0
+        while True:
+            chunk = list(expired.filter(id__gt=last_id).values_list('id', 'user_id')[:batch_size])
+            if not chunk:
+                break
+            updated += expired.filter(
+                id__gt=last_id,
+                id__lte=chunk[-1][0]
+            ).update(status='PENDING_RENEWAL', updated_at=now)
+            CycleProgressService.invalidate(*{user_id for _, user_id in chunk})
+            last_id = chunk[-1][0]
+        return updated
+    
     @staticmethod
     def needs_new_cycle(user):
         """
@@ -180,6 +180,54 @@ class TestCycleService:
         assert snapshot.endoscopy_result == 'ESOPHAGITIS_A'
         assert isinstance(snapshot.habit_scores, dict)
     
+    def test_latest_habit_answers_picks_newest_within_cutoff(self, user_with_habits):
+        """Test una fila por pregunta: la más reciente antes del límite"""
+        user, habits = user_with_habits
+        meal_size = habits[0]
+        old_answer = UserHabitAnswer.objects.get(user=user, question=meal_size)
+        UserHabitAnswer.objects.filter(pk=old_answer.pk).update(answered_at=timezone.now() - timedelta(days=10))
+        UserHabitAnswer.objects.create(
+            user=user,
+            question=meal_size,
+            selected_option=meal_size.options.get(value=3),
+            is_onboarding=False
+        )
+        
+        latest = CycleService.latest_habit_answers({user.id: None})[user.id]
+        assert len(latest) == 7
+        assert dict((habit_type, value) for _, habit_type, value in latest)['MEAL_SIZE'] == 3
+        
+        before_new = CycleService.latest_habit_answers({user.id: timezone.now() - timedelta(days=5)})[user.id]
+        assert before_new == [(meal_size.id, 'MEAL_SIZE', 0)]
+    
+    def test_snapshot_cycles_in_bulk(self, user_with_habits, django_assert_num_queries):
+        """Test capturas de varios ciclos con un número fijo de consultas"""
+        user, _ = user_with_habits
+        other = User.objects.create_user(username='otheruser')
+        UserProfile.objects.get_or_create(user=other)
+        cycles = [
+            UserCycle.objects.create(
+                user=cycle_user,
+                cycle_number=1,
+                start_date=timezone.now(),
+                end_date=timezone.now() + timedelta(days=30)
+            )
+            for cycle_user in (user, other)
+        ]
+        
+        # Capturas existentes + perfiles + respuestas + bulk_create
+        with django_assert_num_queries(4):
+            snapshots = CycleService.snapshot_cycles(cycles)
+        
+        assert len(snapshots) == 2
+        scores = {snapshot.cycle.user_id: snapshot.habit_scores for snapshot in snapshots}
+        assert scores[user.id]['MEAL_SIZE'] == 0
+        assert scores[other.id] == {}
+        
+        # Repetir no duplica capturas
+        assert CycleService.snapshot_cycles(cycles) == []
+        assert CycleService._create_cycle_snapshot(cycles[0]) == snapshots[0]
+    
     def test_assign_worst_habits(self, user_with_habits):
         """Test asignar los 5 peores hábitos"""
         user, habits = user_with_habits
@@ -297,11 +345,170 @@ class TestCycleService:
             status='ACTIVE'
         )
         
-        # Obtener ciclo actual (debería actualizar estado)
+        # Obtener ciclo actual (estado derivado, sin escribir)
         current = CycleService.get_current_cycle(user)
         
         assert current == cycle
         assert current.status == 'PENDING_RENEWAL'
+        cycle.refresh_from_db()
+        assert cycle.status == 'ACTIVE'
+    
+    def test_sweep_expired_cycles(self, user):
+        """Test el barrido mueve solo los ciclos ACTIVE en su día 30"""
+        other = User.objects.create_user(username='otheruser')
+        now = timezone.now()
+        expired = UserCycle.objects.create(
+            user=user, cycle_number=1, status='ACTIVE',
+            start_date=now - timedelta(days=29), end_date=now + timedelta(days=1)
+        )
+        current = UserCycle.objects.create(
+            user=other, cycle_number=1, status='ACTIVE',
+            start_date=now - timedelta(days=28), end_date=now + timedelta(days=2)
+        )
+        
+        assert expired.effective_status == 'PENDING_RENEWAL'
+        assert current.effective_status == 'ACTIVE'
+        
+        assert CycleService.sweep_expired_cycles(now) == 1
+        assert CycleService.sweep_expired_cycles(now) == 0
+        
+        expired.refresh_from_db()
+        current.refresh_from_db()
+        assert expired.status == 'PENDING_RENEWAL'
+        assert current.status == 'ACTIVE'
+    
+    def test_sweep_expired_cycles_in_keyset_batches(self, user, django_assert_num_queries):
+        """Test el barrido pagina por id: una lectura y un UPDATE por lote"""
+        now = timezone.now()
+        for number in range(1, 6):
+            UserCycle.objects.create(
+                user=user, cycle_number=number, status='ACTIVE',
+                start_date=now - timedelta(days=40), end_date=now - timedelta(days=10)
+            )
+        
+        # 3 lotes (2 + 2 + 1) de lectura + UPDATE y la lectura vacía final
+        with django_assert_num_queries(7):
+            assert CycleService.sweep_expired_cycles(now, batch_size=2) == 5
+        assert not UserCycle.objects.filter(status='ACTIVE').exists()
+    
+    def test_renew_cycles_in_bulk(self, user):
+        """Test renovación por lotes: resumen, ciclo nuevo y nivel reseteado; repetir no duplica"""
+        from gamification.models import CycleGamificationSummary, DailyPoints
+        
+        other = User.objects.create_user(username='otheruser')
+        old_cycles = [
+            UserCycle.objects.create(
+                user=cycle_user, cycle_number=1, status='PENDING_RENEWAL',
+                start_date=timezone.now() - timedelta(days=31), end_date=timezone.now() - timedelta(days=1)
+            )
+            for cycle_user in (user, other)
+        ]
+        UserLevel.objects.create(
+            user=user, current_cycle=old_cycles[0], current_level='BRONCE',
+            current_cycle_points=400, longest_streak=6, current_streak=3,
+            last_activity_date=timezone.now().date() - timedelta(days=5)
+        )
+        DailyPoints.objects.create(
+            user=user, cycle=old_cycles[0], date=timezone.now().date() - timedelta(days=2),
+            habits_completed=5, habits_total=5
+        )
+        
+        new_cycles = CycleService.renew_cycles([cycle.id for cycle in old_cycles])
+        
+        assert sorted(cycle.cycle_number for cycle in new_cycles) == [2, 2]
+        assert UserCycle.objects.filter(status='COMPLETED').count() == 2
+        summary = CycleGamificationSummary.objects.get(cycle=old_cycles[0])
+        assert summary.total_points_earned == 400
+        assert summary.final_level == 'BRONCE'
+        assert summary.active_days == 1
+        assert summary.perfect_days == 1
+        
+        level = UserLevel.objects.get(user=user)
+        assert level.current_cycle.cycle_number == 2
+        assert level.current_cycle_points == 0
+        assert level.current_streak == 0
+        assert UserLevel.objects.get(user=other).current_cycle.cycle_number == 2
+        
+        assert CycleService.renew_cycles([cycle.id for cycle in old_cycles]) == []
+        assert UserCycle.objects.count() == 4
+    
+    def test_renew_cohort_command(self, user):
+        """Test el comando de cohortes filtra por fenotipo y se puede reanudar"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        users = [user] + [User.objects.create_user(username=f'cohort{i}') for i in range(3)]
+        cycles = [
+            UserCycle.objects.create(
+                user=cycle_user, cycle_number=1, status='PENDING_RENEWAL',
+                phenotype='NERD' if i < 3 else 'EROSIVE',
+                start_date=timezone.now() - timedelta(days=31), end_date=timezone.now() - timedelta(days=1)
+            )
+            for i, cycle_user in enumerate(users)
+        ]
+        
+        out = StringIO()
+        call_command(
+            'renew_cohort', '--phenotype', 'NERD', '--chunk-size', '2',
+            '--resume-from', str(cycles[0].id), stdout=out
+        )
+        
+        assert '2/2 ciclos' in out.getvalue()
+        assert '2 ciclo(s) renovados' in out.getvalue()
+        statuses = dict(UserCycle.objects.filter(cycle_number=1).values_list('user_id', 'status'))
+        assert statuses[users[0].id] == 'PENDING_RENEWAL'
+        assert statuses[users[1].id] == 'COMPLETED'
+        assert statuses[users[2].id] == 'COMPLETED'
+        assert statuses[users[3].id] == 'PENDING_RENEWAL'
+        
+        out = StringIO()
+        call_command('renew_cohort', '--mode', 'advance', '--days', '10', stdout=out)
+        assert '2 ciclo(s) avanzados 10 días' in out.getvalue()
+        assert UserCycle.objects.get(user=users[1], cycle_number=2).days_elapsed == 11
+        
+        from django.core.management.base import CommandError
+        with pytest.raises(CommandError):
+            call_command('renew_cohort', '--chunk-size', '0', stdout=StringIO())
+    
+    def test_renew_cycles_snapshots_in_same_transaction(self, user_with_habits):
+        """Test si la captura falla se revierte también la renovación del lote"""
+        user, _ = user_with_habits
+        cycle = UserCycle.objects.create(
+            user=user, cycle_number=1, status='PENDING_RENEWAL',
+            start_date=timezone.now() - timedelta(days=31), end_date=timezone.now() - timedelta(days=1)
+        )
+        
+        with patch.object(CycleService, 'snapshot_cycles', side_effect=RuntimeError('interrumpido')):
+            with pytest.raises(RuntimeError):
+                CycleService.renew_cycles([cycle.id], snapshot=True)
+        cycle.refresh_from_db()
+        assert cycle.status == 'PENDING_RENEWAL'
+        assert UserCycle.objects.filter(user=user).count() == 1
+        
+        new_cycles = CycleService.renew_cycles([cycle.id], snapshot=True)
+        assert CycleSnapshot.objects.get(cycle=new_cycles[0]).habit_scores['MEAL_SIZE'] == 0
+    
+    def test_sweep_cycles_command(self, user):
+        """Test el comando sweep_cycles informa y aplica la transición"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        cycle = UserCycle.objects.create(
+            user=user, cycle_number=1, status='ACTIVE',
+            start_date=timezone.now() - timedelta(days=31), end_date=timezone.now() - timedelta(days=1)
+        )
+        
+        out = StringIO()
+        call_command('sweep_cycles', '--dry-run', stdout=out)
+        assert '1 ciclo(s)' in out.getvalue()
+        cycle.refresh_from_db()
+        assert cycle.status == 'ACTIVE'
+        
+        out = StringIO()
+        call_command('sweep_cycles', stdout=out)
+        assert '1 ciclo(s) pasados a PENDING_RENEWAL' in out.getvalue()
+        cycle.refresh_from_db()
+        assert cycle.status == 'PENDING_RENEWAL'
     
     def test_create_cycle_without_habits(self, user):
         """Test crear ciclo cuando usuario no tiene respuestas de hábitos"""
@@ -7,7 +7,7 @@ from datetime import timedelta
 from rest_framework.test import APIClient
 from rest_framework.authtoken.models import Token
 from unittest.mock import patch
-from cycles.models import UserCycle
+from cycles.models import UserCycle, CycleHabitAssignment
 from cycles.services import CycleService
 from programs.models import TreatmentProgram
 from profiles.models import UserProfile
@@ -198,6 +198,168 @@ class TestCycleViews:
         cycle_numbers = [c['cycle_number'] for c in response.data['cycles']]
         assert cycle_numbers == [4, 3, 2, 1]
     
+    def test_get_cycle_history_prefetch_and_etag(self, authenticated_client, django_assert_num_queries):
+        """Test historial con hábitos precargados, ETag y 304 si no hay cambios"""
+        client, user, _ = authenticated_client
+        habits = [HabitQuestion.objects.create(habit_type=f'HABIT_{i}', text=f'Hábito {i}') for i in range(2)]
+        for number in range(1, 13):
+            cycle = UserCycle.objects.create(
+                user=user,
+                cycle_number=number,
+                start_date=timezone.now() - timedelta(days=30 * (13 - number)),
+                end_date=timezone.now() - timedelta(days=30 * (12 - number)),
+                status='COMPLETED'
+            )
+            for order, habit in enumerate(habits, start=1):
+                CycleHabitAssignment.objects.create(cycle=cycle, habit=habit, initial_score=1, priority_order=order)
+        
+        # Token + ETag + ciclos + asignaciones con hábito
+        with django_assert_num_queries(4):
+            response = client.get('/api/cycles/history/')
+        
+        assert response.status_code == 200
+        assert response.data['total_cycles'] == 12
+        assert all(len(cycle['assigned_habits']) == 2 for cycle in response.data['cycles'])
+        etag = response['ETag']
+        assert etag.startswith('"')
+        
+        # Token + ETag, sin serializar
+        with django_assert_num_queries(2):
+            not_modified = client.get('/api/cycles/history/', HTTP_IF_NONE_MATCH=etag)
+        assert not_modified.status_code == 304
+        
+        # Un cambio en un ciclo invalida el ETag
+        cycle = UserCycle.objects.get(user=user, cycle_number=12)
+        cycle.gerdq_score = 9
+        cycle.save()
+        changed = client.get('/api/cycles/history/', HTTP_IF_NONE_MATCH=etag)
+        assert changed.status_code == 200
+        assert changed['ETag'] != etag
+        
+        # Editar solo una asignación (sin guardar el ciclo) también lo invalida
+        assignment = CycleHabitAssignment.objects.filter(cycle=cycle).first()
+        assignment.habit = HabitQuestion.objects.create(habit_type='HABIT_NEW', text='Hábito nuevo')
+        assignment.save()
+        reassigned = client.get('/api/cycles/history/', HTTP_IF_NONE_MATCH=changed['ETag'])
+        assert reassigned.status_code == 200
+        assert reassigned['ETag'] != changed['ETag']
+    
+    def test_get_cycle_history_uses_effective_status(self, authenticated_client):
+        """Test un ciclo ACTIVE en su día 30 aparece como PENDING_RENEWAL y entra en el ETag"""
+        client, user, _ = authenticated_client
+        cycle = UserCycle.objects.create(
+            user=user,
+            cycle_number=1,
+            start_date=timezone.now() - timedelta(days=10),
+            end_date=timezone.now() + timedelta(days=20),
+            status='ACTIVE'
+        )
+        response = client.get('/api/cycles/history/')
+        assert response.data['cycles'][0]['status'] == 'ACTIVE'
+        
+        # Vencido sin pasar por sweep_cycles (update no toca updated_at)
+        UserCycle.objects.filter(pk=cycle.pk).update(start_date=timezone.now() - timedelta(days=35))
+        changed = client.get('/api/cycles/history/', HTTP_IF_NONE_MATCH=response['ETag'])
+        
+        assert changed.status_code == 200
+        assert changed.data['cycles'][0]['status'] == 'PENDING_RENEWAL'
+        assert changed['ETag'] != response['ETag']
+    
+    def test_get_cycle_progress(self, authenticated_client, settings, django_assert_num_queries):
+        """Test progreso entre ciclos: diferencias por hábito, IMC y tendencias, cacheado por usuario"""
+        from django.core.cache import caches
+        from cycles.models import CycleSnapshot
+        
+        client, user, _ = authenticated_client
+        settings.GAMIFICATION_CACHE_ALIAS = 'locmem'
+        caches['locmem'].clear()
+        
+        starts = [
+            (1, {'MEAL_SIZE': 0, 'EXERCISE': 1}, 28.0, 30, 20),
+            (2, {'MEAL_SIZE': 2, 'EXERCISE': 1}, 26.5, 20, 15),
+        ]
+        for number, scores, bmi, gerdq, rsi in starts:
+            cycle = UserCycle.objects.create(
+                user=user,
+                cycle_number=number,
+                start_date=timezone.now() - timedelta(days=30 * (3 - number)),
+                end_date=timezone.now() - timedelta(days=30 * (2 - number)),
+                status='COMPLETED',
+                gerdq_score=gerdq,
+                rsi_score=rsi
+            )
+            CycleSnapshot.objects.create(cycle=cycle, bmi=bmi, habit_scores=scores)
+        
+        response = client.get('/api/cycles/progress/')
+        
+        assert response.status_code == 200
+        assert response.data['total_cycles'] == 2
+        habits = {habit['habit_type']: habit for habit in response.data['habits']}
+        assert habits['MEAL_SIZE']['delta'] == 2
+        assert habits['MEAL_SIZE']['trend'] == 'improving'
+        assert habits['EXERCISE']['trend'] == 'stable'
+        assert response.data['bmi']['delta'] == -1.5
+        assert response.data['bmi']['trend'] == 'improving'
+        assert response.data['gerdq']['trend'] == 'improving'
+        
+        # Solo autenticación: el progreso sale de caché
+        with django_assert_num_queries(1):
+            client.get('/api/cycles/progress/')
+        
+        # Una captura nueva invalida la caché
+        third = UserCycle.objects.create(
+            user=user,
+            cycle_number=3,
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=30),
+            status='ACTIVE'
+        )
+        CycleService.snapshot_cycles([third])
+        response = client.get('/api/cycles/progress/')
+        assert response.data['total_cycles'] == 3
+    
+    def test_cycle_progress_invalidated_by_new_cycle_and_sweep(self, authenticated_client, settings):
+        """Test crear un ciclo o barrer los vencidos invalida el progreso cacheado"""
+        from django.core.cache import caches
+        
+        client, user, _ = authenticated_client
+        settings.GAMIFICATION_CACHE_ALIAS = 'locmem'
+        caches['locmem'].clear()
+        cycle = UserCycle.objects.create(
+            user=user,
+            cycle_number=1,
+            start_date=timezone.now() - timedelta(days=10),
+            end_date=timezone.now() + timedelta(days=20),
+            status='ACTIVE'
+        )
+        
+        assert client.get('/api/cycles/progress/').data['cycles'][0]['status'] == 'ACTIVE'
+        
+        # Vencido sin escribir: solo el barrido invalida la entrada de hoy
+        UserCycle.objects.filter(pk=cycle.pk).update(start_date=timezone.now() - timedelta(days=31))
+        CycleService.sweep_expired_cycles()
+        assert client.get('/api/cycles/progress/').data['cycles'][0]['status'] == 'PENDING_RENEWAL'
+        
+        CycleService.create_new_cycle(user)
+        response = client.get('/api/cycles/progress/')
+        assert response.data['total_cycles'] == 2
+        assert [cycle['status'] for cycle in response.data['cycles']] == ['COMPLETED', 'ACTIVE']
+    
+    def test_cycle_progress_uses_effective_status(self, authenticated_client):
+        """Test un ciclo vencido que el barrido aún no movió aparece como PENDING_RENEWAL"""
+        client, user, _ = authenticated_client
+        UserCycle.objects.create(
+            user=user,
+            cycle_number=1,
+            start_date=timezone.now() - timedelta(days=31),
+            end_date=timezone.now() - timedelta(days=1),
+            status='ACTIVE'
+        )
+        
+        response = client.get('/api/cycles/progress/')
+        
+        assert response.data['cycles'][0]['status'] == 'PENDING_RENEWAL'
+    
     def test_complete_cycle_onboarding(self, authenticated_client):
         """Test marcar onboarding como completado"""
         client, user, _ = authenticated_client
@@ -1,11 +1,17 @@
 # cycles/views.py
+import hashlib
+
+from django.db.models import Count, Max, Prefetch, Q
+from django.utils import timezone
+from django.views.decorators.http import condition
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .services import CycleService
+from .progress import CycleProgressService
 from .serializers import CycleSerializer
-from .models import UserCycle
+from .models import UserCycle, CycleHabitAssignment
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -13,38 +19,7 @@ def check_cycle_status(request):
     """
     Verifica el estado del ciclo actual del usuario.
     """
-    user = request.user
-    current_cycle = CycleService.get_current_cycle(user)
-    
-    response_data = {
-        'needs_renewal': False,
-        'current_cycle': None,
-        'days_remaining': 0,
-        'days_elapsed': 0,
-        'has_completed_onboarding': False
-    }
-    
-    if current_cycle:
-        # Actualizar estado si han pasado 30 días
-        current_cycle.check_and_update_status()
-        current_cycle.refresh_from_db()
-        
-        # Obtener datos actualizados
-        days_elapsed = current_cycle.days_elapsed
-        days_remaining = current_cycle.days_remaining
-        
-        response_data['current_cycle'] = CycleSerializer(current_cycle).data
-        response_data['days_remaining'] = days_remaining
-        response_data['days_elapsed'] = days_elapsed
-        response_data['has_completed_onboarding'] = bool(current_cycle.onboarding_completed_at)
-        
-        # Si estamos en día 30 o el ciclo está en PENDING_RENEWAL
-        if days_elapsed >= 30 or current_cycle.status == 'PENDING_RENEWAL':
-            response_data['needs_renewal'] = True
-    else:
-        response_data['needs_renewal'] = True
-    
-    return Response(response_data)
+    return Response(CycleService.status_summary(request.user))
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -69,21 +44,65 @@ def start_new_cycle(request):
         'cycle': CycleSerializer(new_cycle).data
     })
 
+def cycle_history_etag(request):
+    """
+    ETag del historial: cambia al crear, editar o borrar ciclos o asignaciones
+    (cada una con su propio updated_at),
+    cada día (days_elapsed/days_remaining dependen de la fecha) y cuando un
+    ciclo pasa a PENDING_RENEWAL sin escribirse (effective_status).
+    """
+    version = UserCycle.objects.filter(user=request.user).aggregate(
+        cycles=Count('id', distinct=True),
+        assignments=Count('cyclehabitassignment'),
+        last_update=Max('updated_at'),
+        last_assignment_update=Max('cyclehabitassignment__updated_at'),
+        pending_renewal=Count(
+            'id',
+            filter=Q(status='ACTIVE', start_date__lt=UserCycle.renewal_cutoff()),
+            distinct=True
+        )
+    )
+    last_update = version['last_update'].timestamp() if version['last_update'] else 0
+    last_assignment_update = (
+        version['last_assignment_update'].timestamp() if version['last_assignment_update'] else 0
+    )
+    raw = (
+        f"{request.user.id}:{version['cycles']}:{version['assignments']}:{last_update}:{last_assignment_update}:"
+        f"{version['pending_renewal']}:{timezone.now().date()}"
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=cycle_history_etag)
 def get_cycle_history(request):
     """
     Obtiene el historial de ciclos del usuario.
+    Los hábitos asignados se precargan en una consulta; con If-None-Match
+    igual al ETag actual se responde 304 sin serializar.
     """
-    user = request.user
-    cycles = UserCycle.objects.filter(user=user).order_by('-cycle_number')
-    serializer = CycleSerializer(cycles, many=True)
+    cycles = UserCycle.objects.filter(user=request.user).order_by('-cycle_number').prefetch_related(
+        Prefetch(
+            'cyclehabitassignment_set',
+            queryset=CycleHabitAssignment.objects.select_related('habit')
+        )
+    )
+    data = CycleSerializer(cycles, many=True).data
     
     return Response({
-        'cycles': serializer.data,
-        'total_cycles': cycles.count()
+        'cycles': data,
+        'total_cycles': len(data)
     })
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_cycle_progress(request):
+    """
+    Compara el punto de partida de todos los ciclos del usuario: diferencias
+    por hábito, IMC y tendencia de GERDq/RSI. Cacheado hasta la siguiente captura.
+    """
+    return Response(CycleProgressService.for_user(request.user))
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def complete_cycle_onboarding(request):
@@ -6,11 +6,12 @@ from django.forms.widgets import Textarea
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from .models import UserLevel, Medal, UserMedal, DailyPoints, CycleGamificationSummary
+from .medal_rules import MedalRuleEngine
 
 @admin.register(Medal)
 class MedalAdmin(admin.ModelAdmin):
     list_display = ('icon_display', 'name', 'cycle_info', 'points_required', 'level_required', 'users_earned', 'is_active')
-    list_filter = ('required_level', 'required_cycle_number', 'is_active', 'week_number')
+    list_filter = ('required_level', 'required_cycle_number', 'criterion_type', 'is_active', 'week_number')
     search_fields = ('name', 'description')
     ordering = ('required_cycle_number', 'week_number', 'order')
     
@@ -23,6 +24,10 @@ class MedalAdmin(admin.ModelAdmin):
             'fields': ('required_points', 'required_level', 'required_cycle_number'),
             'description': 'Cuándo se puede obtener esta medalla'
         }),
+        ('🏅 Criterio especial', {
+            'fields': ('criterion_type', 'criterion_threshold'),
+            'description': 'Racha, semana completa o días perfectos además de los puntos'
+        }),
         ('📅 Organización', {
             'fields': ('week_number', 'order'),
             'description': 'Orden dentro del ciclo'
@@ -92,11 +97,13 @@ class MedalAdmin(admin.ModelAdmin):
     
     def activate_medals(self, request, queryset):
         count = queryset.update(is_active=True)
+        MedalRuleEngine.invalidate()  # update() no dispara señales
         self.message_user(request, f'{count} medallas activadas.')
     activate_medals.short_description = "✅ Activar medallas seleccionadas"
     
     def deactivate_medals(self, request, queryset):
         count = queryset.update(is_active=False)
+        MedalRuleEngine.invalidate()  # update() no dispara señales
         self.message_user(request, f'{count} medallas desactivadas.')
     deactivate_medals.short_description = "❌ Desactivar medallas seleccionadas"
 
@@ -0,0 +1,302 @@
+# gamification/batch.py
+"""
+Recálculo de gamificación por lotes (proceso nocturno).
+
+Cada lote de usuarios se resuelve con un número fijo de consultas: los datos
+diarios y los logs de todos los usuarios del lote se leen de una vez, los
+puntos se calculan en memoria y se escriben con bulk_create/bulk_update.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from habits.models import HabitLog
+from .models import UserLevel, DailyPoints
+from .cache import DashboardCache
+from .ledger import PointsLedgerService, components_from_score, components_from_daily_points, DAILY_POINTS_COMPONENT_FIELDS
+from .services import GamificationService
+from .streaks import StreakEngine, CompletionBits, CompletionBitmapService, streak_memo, prime_memo
+
+DAILY_POINTS_UPDATE_FIELDS = [
+    'cycle',
+    'habit_points',
+    'bonus_completion',
+    'bonus_streak',
+    'bonus_promoted_habit',
+    'total_points',
+    'habits_completed',
+    'habits_total',
+    'streak_on_date',
+]
+
+USER_LEVEL_UPDATE_FIELDS = [
+    'current_cycle',
+    'current_level',
+    'current_cycle_points',
+    'total_points_all_time',
+    'current_streak',
+    'longest_streak',
+    'last_activity_date',
+    'updated_at',
+]
+
+
+def init_worker():
+    """Inicializa Django en cada proceso del pool (cada uno abre su propia conexión)"""
+    import django
+    django.setup()
+
+
+def recompute_chunk(user_ids, dates, dry_run=False, reason='BATCH'):
+    """Punto de entrada serializable para el pool de procesos"""
+    return GamificationBatchService.recompute_users(user_ids, dates, dry_run=dry_run, reason=reason)
+
+
+class GamificationBatchService:
+    """
+    Servicio para recalcular puntos, niveles, rachas y medallas de muchos usuarios
+    """
+
+    @staticmethod
+    def target_user_ids():
+        """Usuarios con gamificación o con un ciclo activo, ordenados por id"""
+        return list(
+            User.objects.filter(
+                Q(gamification_level__isnull=False) | Q(cycles__status='ACTIVE')
+            ).distinct().order_by('id').values_list('id', flat=True)
+        )
+
+    @staticmethod
+    def _resolve_levels(user_ids, dry_run):
+        """
+        Devuelve {user_id: UserLevel} con el ciclo actual resuelto.
+        Crea en bloque los UserLevel que falten y asigna el ciclo activo
+        a quienes no lo tengan. Fuera de dry_run las filas quedan bloqueadas:
+        debe llamarse dentro de una transacción.
+        """
+        from cycles.models import UserCycle
+
+        queryset = UserLevel.objects.filter(user_id__in=user_ids).select_related('current_cycle')
+        if not dry_run:
+            # Bloqueo hasta el bulk_update de recompute_users (sin leer valores obsoletos)
+            queryset = queryset.select_for_update(of=('self',))
+        levels = {level.user_id: level for level in queryset.order_by('user_id')}
+
+        without_cycle = [
+            user_id for user_id in user_ids
+            if user_id not in levels or levels[user_id].current_cycle is None
+        ]
+        active_cycles = {}
+        for cycle in UserCycle.objects.filter(
+            user_id__in=without_cycle,
+            status='ACTIVE'
+        ).order_by('user_id', '-cycle_number'):
+            active_cycles.setdefault(cycle.user_id, cycle)
+
+        new_levels = []
+        for user_id, cycle in active_cycles.items():
+            if user_id in levels:
+                levels[user_id].current_cycle = cycle
+            else:
+                level = UserLevel(user_id=user_id, current_level='NOVATO', current_cycle=cycle)
+                levels[user_id] = level
+                new_levels.append(level)
+
+        if new_levels and not dry_run:
+            UserLevel.objects.bulk_create(new_levels)
+
+        return levels
+
+    @staticmethod
+    def following_days(user, target_date):
+        """
+        Días cuya racha depende de target_date: la cadena de días completos que
+        empieza justo después, hasta el primer día incompleto (o hoy).
+        """
+        today = timezone.now().date()
+        run = StreakEngine.completion_bits(user).complete_run_after(target_date)
+        return [
+            target_date + timedelta(days=offset)
+            for offset in range(1, run + 1)
+            if target_date + timedelta(days=offset) <= today
+        ]
+
+    @staticmethod
+    def recompute_following_days(user, target_date):
+        """
+        Tras editar un día pasado, recalcula en una pasada los días siguientes
+        cuya racha depende de él. No verifica medallas: lo hace
+        process_daily_gamification al terminar.
+        Devuelve las estadísticas del recálculo o None si no hay días afectados.
+        """
+        dates = GamificationBatchService.following_days(user, target_date)
+        if not dates:
+            return None
+
+        print(f"🔁 Recalculando {len(dates)} día(s) posteriores a {target_date} para usuario {user.id}")
+        return GamificationBatchService.recompute_users([user.id], dates, reason='LOG', check_medals=False)
+
+    @staticmethod
+    def recompute_days(user, dates):
+        """
+        Recalcula en una pasada varios días editados de un usuario (p. ej. una
+        sincronización offline) junto con los días siguientes que dependen de ellos.
+        """
+        affected = set(dates)
+        for target_date in dates:
+            affected.update(GamificationBatchService.following_days(user, target_date))
+        return GamificationBatchService.recompute_users([user.id], sorted(affected), reason='LOG')
+
+    @staticmethod
+    def recompute_users(user_ids, dates, dry_run=False, reason='BATCH', check_medals=True):
+        """
+        Recalcula DailyPoints de las fechas indicadas y el estado de UserLevel
+        (puntos, nivel, rachas) de un lote de usuarios; después verifica medallas
+        (salvo check_medals=False, cuando el llamador ya las verifica).
+        Las diferencias de cada día se anotan en el libro de puntos con el motivo indicado.
+        Devuelve un diccionario con estadísticas del lote.
+        """
+        today = timezone.now().date()
+        dates = sorted(set(dates))
+        stats = {'users': len(user_ids), 'daily_points': 0, 'levels_changed': 0, 'medals': 0}
+
+        days_by_user = StreakEngine.daily_completion_by_user(user_ids)
+        bits_by_user = {
+            user_id: CompletionBits.from_days(days_by_user.get(user_id, {}))
+            for user_id in user_ids
+        }
+
+        # Logs de las fechas a recalcular: (nivel, promocionado) por usuario y fecha
+        logs_by_user_date = defaultdict(list)
+        for user_id, log_date, completion_level, is_promoted in HabitLog.objects.filter(
+            user_id__in=user_ids,
+            date__in=dates
+        ).values_list('user_id', 'date', 'completion_level', 'tracker__is_promoted'):
+            logs_by_user_date[(user_id, log_date)].append((completion_level, is_promoted))
+
+        # Los UserLevel se leen bloqueados y se escriben en la misma transacción:
+        # un registro en vivo concurrente (update_daily_points) espera al lote
+        # en lugar de ser sobrescrito con valores leídos antes del bloqueo.
+        with transaction.atomic():
+            levels = GamificationBatchService._resolve_levels(user_ids, dry_run)
+
+            # Puntuación ya registrada de esas fechas (para el libro de puntos)
+            previous_points = {
+                (row['user_id'], row['date']): row
+                for row in DailyPoints.objects.filter(
+                    user_id__in=user_ids,
+                    date__in=dates
+                ).values('user_id', 'date', 'cycle_id', *DAILY_POINTS_COMPONENT_FIELDS)
+            }
+
+            # Ciclo que contiene cada fecha (misma regla que update_daily_points)
+            cycles_by_date = GamificationService.cycles_for_dates(
+                user_ids, dates,
+                {user_id: level.current_cycle_id for user_id, level in levels.items()}
+            )
+
+            # 1. Puntos diarios calculados en memoria
+            daily_points = []
+            ledger_entries = []
+            for (user_id, log_date), habit_logs in logs_by_user_date.items():
+                level = levels.get(user_id)
+                if level is None or level.current_cycle is None:
+                    continue
+                streak = bits_by_user[user_id].streak_ending(log_date)
+                points = GamificationService.score_day(habit_logs, streak)
+
+                previous = previous_points.get((user_id, log_date))
+                cycle_id = cycles_by_date[(user_id, log_date)]
+                ledger_entries.extend(PointsLedgerService.diff_entries(
+                    user_id,
+                    log_date,
+                    (previous['cycle_id'], components_from_daily_points(previous)) if previous else None,
+                    (cycle_id, components_from_score(points)),
+                    reason=reason
+                ))
+                daily_points.append(DailyPoints(
+                    user_id=user_id,
+                    date=log_date,
+                    cycle_id=cycle_id,
+                    habit_points=points['habit_points'],
+                    bonus_completion=points['bonus_completion'],
+                    bonus_streak=points['bonus_streak'],
+                    bonus_promoted_habit=points['bonus_promoted'],
+                    total_points=points['total_points'],
+                    habits_completed=points['habits_completed'],
+                    habits_total=points['habits_total'],
+                    streak_on_date=points['current_streak'],
+                ))
+            stats['daily_points'] = len(daily_points)
+
+            if dry_run:
+                return stats
+
+            # Los bitmaps de cumplimiento se reconstruyen con los mismos datos
+            CompletionBitmapService.store(bits_by_user)
+            PointsLedgerService.append(ledger_entries)
+
+            if daily_points:
+                DailyPoints.objects.bulk_create(
+                    daily_points,
+                    update_conflicts=True,
+                    unique_fields=['user', 'date'],
+                    update_fields=DAILY_POINTS_UPDATE_FIELDS,
+                    batch_size=1000
+                )
+
+            # 2. Contadores de puntos recalculados desde DailyPoints en una consulta
+            cycle_points = defaultdict(int)
+            all_time_points = defaultdict(int)
+            for user_id, cycle_id, total in DailyPoints.objects.filter(
+                user_id__in=user_ids
+            ).order_by().values('user_id', 'cycle_id').annotate(
+                total=Sum('total_points')
+            ).values_list('user_id', 'cycle_id', 'total'):
+                all_time_points[user_id] += total or 0
+                cycle_points[(user_id, cycle_id)] += total or 0
+
+            # 3. Nivel y rachas
+            now = timezone.now()
+            to_update = []
+            for user_id, level in levels.items():
+                if level.current_cycle is None:
+                    continue
+                days = days_by_user.get(user_id, {})
+                previous_level = level.current_level
+
+                level.current_cycle_points = cycle_points[(user_id, level.current_cycle_id)]
+                level.total_points_all_time = all_time_points[user_id]
+                level.current_level = GamificationService.level_for_points(
+                    level.current_level,
+                    level.current_cycle.cycle_number,
+                    level.current_cycle_points
+                )
+                level.current_streak = bits_by_user[user_id].streak_ending(today)
+                level.longest_streak = max(level.longest_streak, level.current_streak)
+                if days:
+                    level.last_activity_date = max(days)
+                level.updated_at = now
+
+                if level.current_level != previous_level:
+                    stats['levels_changed'] += 1
+                to_update.append(level)
+
+            UserLevel.objects.bulk_update(to_update, USER_LEVEL_UPDATE_FIELDS, batch_size=1000)
+            DashboardCache.invalidate(*[level.user_id for level in to_update])
+
+        if not check_medals:
+            return stats
+
+        # 4. Medallas, reutilizando los datos diarios ya cargados
+        users = User.objects.in_bulk([level.user_id for level in to_update])
+        with streak_memo():
+            for level in to_update:
+                prime_memo(level.user_id, bits_by_user[level.user_id])
+                stats['medals'] += len(GamificationService.check_new_medals(users[level.user_id]))
+
+        return stats
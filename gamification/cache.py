@@ -0,0 +1,95 @@
+# gamification/cache.py
+"""
+Caché del dashboard de gamificación.
+
+El payload del dashboard se guarda por usuario ya serializado a JSON en el
+backend de caché configurado en GAMIFICATION_CACHE_ALIAS. Un acierto no
+toca la base de datos. Las escrituras que cambian el estado (puntos,
+nivel, medallas o ciclo) invalidan la entrada del usuario.
+"""
+import random
+
+from django.conf import settings
+from django.db import transaction
+
+from gastro_assistant.cache import app_cache
+
+DASHBOARD_CACHE_KEY = 'gamification:dashboard:{user_id}'
+DASHBOARD_HITS_KEY = 'gamification:dashboard:hits'
+DASHBOARD_MISSES_KEY = 'gamification:dashboard:misses'
+DASHBOARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def gamification_cache():
+    """Backend de caché de gamificación (configurable por settings)"""
+    return app_cache()
+
+
+def _increment(cache, key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Primera vez: crear el contador sin pisar un incremento concurrente
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def _record(cache, key):
+    """
+    Cuenta un acierto/fallo muestreado: solo una fracción de las lecturas
+    escribe en la caché (GAMIFICATION_CACHE_STATS_SAMPLE_RATE) y suma el peso
+    de la muestra, así la tasa de aciertos se conserva sin una escritura por
+    lectura. Con 0 no se cuenta nada.
+    """
+    rate = getattr(settings, 'GAMIFICATION_CACHE_STATS_SAMPLE_RATE', 0.05)
+    if rate <= 0 or random.random() >= rate:
+        return
+    _increment(cache, key, max(1, round(1 / rate)))
+
+
+class DashboardCache:
+    """
+    Payload del dashboard pre-serializado por usuario y contadores de aciertos
+    """
+
+    @staticmethod
+    def get(user_id):
+        """JSON del dashboard (bytes) o None si no está en caché"""
+        cache = gamification_cache()
+        payload = cache.get(DASHBOARD_CACHE_KEY.format(user_id=user_id))
+        _record(cache, DASHBOARD_HITS_KEY if payload is not None else DASHBOARD_MISSES_KEY)
+        return payload
+
+    @staticmethod
+    def set(user_id, payload):
+        gamification_cache().set(
+            DASHBOARD_CACHE_KEY.format(user_id=user_id),
+            payload,
+            DASHBOARD_CACHE_TIMEOUT
+        )
+
+    @staticmethod
+    def invalidate(*user_ids):
+        """
+        Borra el dashboard de los usuarios indicados ahora y otra vez tras el
+        commit, para que una lectura concurrente no deje cacheado el estado anterior.
+        """
+        keys = [DASHBOARD_CACHE_KEY.format(user_id=user_id) for user_id in user_ids]
+        if not keys:
+            return
+        cache = gamification_cache()
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+    @staticmethod
+    def stats():
+        """Aciertos, fallos y tasa de aciertos acumulados (estimados por muestreo)"""
+        counters = gamification_cache().get_many([DASHBOARD_HITS_KEY, DASHBOARD_MISSES_KEY])
+        hits = counters.get(DASHBOARD_HITS_KEY, 0)
+        misses = counters.get(DASHBOARD_MISSES_KEY, 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total * 100, 1) if total else 0.0
+        }
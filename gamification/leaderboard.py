@@ -0,0 +1,169 @@
+# gamification/leaderboard.py
+"""
+Clasificación por número de ciclo.
+
+Las posiciones se calculan con funciones de ventana (RANK / PERCENT_RANK)
+en una sola consulta y se materializan en bloque en LeaderboardEntry y en
+CycleGamificationSummary.cycle_ranking. La API lee un snapshot cacheado del
+top-N y la posición del usuario con una búsqueda por índice.
+
+Solo se clasifican cuentas activas y el top nunca expone el nombre de
+usuario (es el identificador de acceso): cada paciente aparece con un alias
+estable derivado de su id.
+"""
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import Rank, PercentRank
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from .cache import gamification_cache
+from .models import UserLevel, LeaderboardEntry, CycleGamificationSummary
+
+LEADERBOARD_CACHE_KEY = 'gamification:leaderboard:v2:{cycle_number}:{limit}'
+LEADERBOARD_CACHE_TIMEOUT = 60 * 60
+LEADERBOARD_TOP_N = 10
+LEADERBOARD_MAX_N = 100
+LEADERBOARD_ALIAS_SALT = 'gamification.leaderboard.alias'
+
+
+def public_alias(user_id):
+    """Alias estable y no identificable de un usuario para la clasificación"""
+    digest = salted_hmac(LEADERBOARD_ALIAS_SALT, str(user_id)).hexdigest()
+    return f'Paciente {digest[:6].upper()}'
+
+
+class LeaderboardService:
+    """
+    Servicio de clasificación y ranking de ciclos
+    """
+
+    @staticmethod
+    def refresh(batch_size=1000):
+        """
+        Recalcula la clasificación de todos los usuarios con ciclo actual.
+        Devuelve el número de entradas escritas.
+        """
+        computed_at = timezone.now()
+        partition = [F('current_cycle__cycle_number')]
+        ordering = F('current_cycle_points').desc()
+
+        rows = UserLevel.objects.filter(
+            current_cycle__isnull=False,
+            user__is_active=True
+        ).annotate(
+            cycle_number=F('current_cycle__cycle_number'),
+            position=Window(expression=Rank(), partition_by=partition, order_by=ordering),
+            percent_rank=Window(expression=PercentRank(), partition_by=partition, order_by=ordering),
+        ).values_list(
+            'user_id', 'cycle_number', 'current_cycle_points', 'current_level', 'position', 'percent_rank'
+        ).order_by()
+
+        written = 0
+        with transaction.atomic():
+            batch = []
+            for user_id, cycle_number, points, level, position, percent_rank in rows.iterator(chunk_size=batch_size):
+                batch.append(LeaderboardEntry(
+                    user_id=user_id,
+                    cycle_number=cycle_number,
+                    points=points,
+                    level=level,
+                    rank=position,
+                    percentile=round((1 - percent_rank) * 100, 1),
+                    computed_at=computed_at,
+                ))
+                if len(batch) >= batch_size:
+                    written += LeaderboardService._store(batch)
+                    batch = []
+            if batch:
+                written += LeaderboardService._store(batch)
+
+            # Usuarios que ya no tienen ciclo actual o cuya cuenta se desactivó
+            LeaderboardEntry.objects.exclude(computed_at=computed_at).delete()
+
+        LeaderboardService.rank_cycle_summaries(batch_size=batch_size)
+        LeaderboardService.invalidate_snapshots()
+        return written
+
+    @staticmethod
+    def _store(entries):
+        LeaderboardEntry.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['cycle_number', 'points', 'level', 'rank', 'percentile', 'computed_at'],
+        )
+        return len(entries)
+
+    @staticmethod
+    def rank_cycle_summaries(batch_size=1000):
+        """
+        Rellena CycleGamificationSummary.cycle_ranking: posición de cada resumen
+        entre los ciclos completados con el mismo número de ciclo.
+        """
+        rows = CycleGamificationSummary.objects.filter(user__is_active=True).annotate(
+            position=Window(
+                expression=Rank(),
+                partition_by=[F('cycle__cycle_number')],
+                order_by=F('total_points_earned').desc()
+            )
+        ).values_list('id', 'position', 'cycle_ranking').order_by()
+
+        changed = [
+            CycleGamificationSummary(id=summary_id, cycle_ranking=position)
+            for summary_id, position, current in rows.iterator(chunk_size=batch_size)
+            if position != current
+        ]
+        CycleGamificationSummary.objects.bulk_update(changed, ['cycle_ranking'], batch_size=batch_size)
+        return len(changed)
+
+    @staticmethod
+    def invalidate_snapshots():
+        """Descarta los snapshots cacheados del top-N (tras un refresh)"""
+        cycle_numbers = LeaderboardEntry.objects.order_by().values_list('cycle_number', flat=True).distinct()
+        gamification_cache().delete_many([
+            LEADERBOARD_CACHE_KEY.format(cycle_number=cycle_number, limit=limit)
+            for cycle_number in cycle_numbers
+            for limit in (LEADERBOARD_TOP_N, LEADERBOARD_MAX_N)
+        ])
+
+    @staticmethod
+    def top(cycle_number, limit=LEADERBOARD_TOP_N):
+        """
+        Snapshot del top-N de un número de ciclo: lectura por índice
+        (cycle_number, rank) cacheada hasta el siguiente refresh.
+        """
+        cache = gamification_cache()
+        key = LEADERBOARD_CACHE_KEY.format(cycle_number=cycle_number, limit=limit)
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            return snapshot
+
+        entries = LeaderboardEntry.objects.filter(
+            cycle_number=cycle_number
+        ).order_by('rank').values(
+            'rank', 'points', 'level', 'percentile', 'computed_at', 'user_id'
+        )[:limit]
+
+        snapshot = {
+            'cycle_number': cycle_number,
+            'total_users': LeaderboardEntry.objects.filter(cycle_number=cycle_number).count(),
+            'computed_at': None,
+            'top': [],
+        }
+        for entry in entries:
+            snapshot['computed_at'] = entry['computed_at']
+            snapshot['top'].append({
+                'rank': entry['rank'],
+                'alias': public_alias(entry['user_id']),
+                'points': entry['points'],
+                'level': entry['level'],
+            })
+
+        cache.set(key, snapshot, LEADERBOARD_CACHE_TIMEOUT)
+        return snapshot
+
+    @staticmethod
+    def entry_for(user):
+        """Posición materializada del usuario (búsqueda por índice único) o None"""
+        return LeaderboardEntry.objects.filter(user=user).first()
@@ -0,0 +1,202 @@
+# gamification/ledger.py
+"""
+Libro mayor de puntos (append-only).
+
+Cada recálculo de un día escribe solo las variaciones de cada componente
+(hábitos, promocionado, completar todos, racha) respecto a lo ya registrado.
+Así queda el historial de cómo cambió la puntuación de un día, los totales
+a una fecha son una búsqueda por índice (balance_after) y DailyPoints/UserLevel
+se pueden reconstruir desde el libro en bloque (comando replay_points).
+"""
+from collections import defaultdict
+
+from django.db.models import Max, Q, Sum
+
+from .models import PointsLedger, DailyPoints
+
+COMPONENTS = ('HABIT', 'PROMOTED', 'COMPLETION', 'STREAK')
+
+DAILY_POINTS_COMPONENT_FIELDS = [
+    'habit_points',
+    'bonus_promoted_habit',
+    'bonus_completion',
+    'bonus_streak',
+]
+
+
+def components_from_score(points):
+    """Componentes de una puntuación de GamificationService.score_day"""
+    return {
+        'HABIT': points['habit_points'] - points['bonus_promoted'],
+        'PROMOTED': points['bonus_promoted'],
+        'COMPLETION': points['bonus_completion'],
+        'STREAK': points['bonus_streak'],
+    }
+
+
+def components_from_daily_points(row):
+    """Componentes de una fila de DailyPoints (instancia o dict de values())"""
+    get = row.get if isinstance(row, dict) else lambda field: getattr(row, field)
+    return {
+        'HABIT': get('habit_points') - get('bonus_promoted_habit'),
+        'PROMOTED': get('bonus_promoted_habit'),
+        'COMPLETION': get('bonus_completion'),
+        'STREAK': get('bonus_streak'),
+    }
+
+
+class PointsLedgerService:
+    """
+    Escritura, consulta y reproducción del libro de puntos
+    """
+
+    @staticmethod
+    def diff_entries(user_id, target_date, previous, current, reason='LOG'):
+        """
+        Movimientos para pasar de previous a current, ambos (cycle_id, componentes)
+        o None. Si el día cambió de ciclo se revierte en el ciclo anterior y se
+        registra completo en el nuevo.
+        """
+        old_cycle_id, old_components = previous or (None, {})
+        new_cycle_id, new_components = current
+        entries = []
+
+        if old_cycle_id is not None and old_cycle_id != new_cycle_id:
+            for component in COMPONENTS:
+                if old_components.get(component):
+                    entries.append(PointsLedger(
+                        user_id=user_id, cycle_id=old_cycle_id, date=target_date,
+                        component=component, delta=-old_components[component], reason=reason
+                    ))
+            old_components = {}
+
+        for component in COMPONENTS:
+            delta = new_components.get(component, 0) - old_components.get(component, 0)
+            if delta:
+                entries.append(PointsLedger(
+                    user_id=user_id, cycle_id=new_cycle_id, date=target_date,
+                    component=component, delta=delta, reason=reason
+                ))
+        return entries
+
+    @staticmethod
+    def opening_balances(user_ids):
+        """{user_id: balance_after del último movimiento} (0 si no hay movimientos)"""
+        last_ids = PointsLedger.objects.filter(
+            user_id__in=user_ids
+        ).order_by().values('user_id').annotate(last_id=Max('id')).values_list('last_id', flat=True)
+        balances = dict(
+            PointsLedger.objects.filter(id__in=list(last_ids)).values_list('user_id', 'balance_after')
+        )
+        return {user_id: balances.get(user_id, 0) for user_id in user_ids}
+
+    @staticmethod
+    def append(entries, balances=None, batch_size=1000):
+        """
+        Añade los movimientos calculando balance_after en orden.
+        balances: {user_id: saldo actual}; si no se pasa se lee del libro.
+        Las escrituras concurrentes del mismo usuario deben estar serializadas
+        por el llamador (bloqueo de UserLevel).
+        """
+        if not entries:
+            return []
+        if balances is None:
+            balances = PointsLedgerService.opening_balances({entry.user_id for entry in entries})
+
+        # Número de ciclo denormalizado: el historial sobrevive al borrado del ciclo
+        from cycles.models import UserCycle
+        cycle_numbers = UserCycle.objects.in_bulk(
+            {entry.cycle_id for entry in entries if entry.cycle_id}
+        )
+
+        for entry in entries:
+            balances[entry.user_id] = balances.get(entry.user_id, 0) + entry.delta
+            entry.balance_after = balances[entry.user_id]
+            if entry.cycle_id in cycle_numbers:
+                entry.cycle_number = cycle_numbers[entry.cycle_id].cycle_number
+        return PointsLedger.objects.bulk_create(entries, batch_size=batch_size)
+
+    @staticmethod
+    def balance_at(user, at=None):
+        """Total histórico de puntos del usuario en un instante (búsqueda por índice)"""
+        entries = PointsLedger.objects.filter(user=user)
+        if at is not None:
+            entries = entries.filter(created_at__lte=at)
+        last = entries.order_by('-created_at', '-id').values_list('balance_after', flat=True).first()
+        return last or 0
+
+    @staticmethod
+    def day_history(user, target_date):
+        """Movimientos de un día en orden: para revisar reclamaciones de puntos"""
+        return PointsLedger.objects.filter(user=user, date=target_date).order_by('id')
+
+    @staticmethod
+    def replay(user_ids=None, since=None, until=None, dry_run=False):
+        """
+        Reconstruye DailyPoints desde el libro (una consulta agrupada y un upsert
+        en bloque) y corrige los contadores de UserLevel.
+        Devuelve {'days': días reproducidos, 'changed': días que no coincidían}.
+        """
+        from .services import GamificationService
+
+        ledger = PointsLedger.objects.all()
+        if user_ids is not None:
+            ledger = ledger.filter(user_id__in=user_ids)
+        if since is not None:
+            ledger = ledger.filter(date__gte=since)
+        if until is not None:
+            ledger = ledger.filter(date__lte=until)
+
+        rows = ledger.order_by().values('user_id', 'date', 'cycle_id').annotate(
+            last_id=Max('id'),
+            **{
+                component.lower(): Sum('delta', filter=Q(component=component))
+                for component in COMPONENTS
+            }
+        )
+
+        # Un día que cambió de ciclo tiene un grupo por ciclo: vale el más reciente.
+        # Los movimientos de ciclos borrados se conservan en el libro pero no se reproducen.
+        days = {}
+        for row in rows:
+            if row['cycle_id'] is None:
+                continue
+            key = (row['user_id'], row['date'])
+            if key not in days or row['last_id'] > days[key]['last_id']:
+                days[key] = row
+
+        existing = defaultdict(dict)
+        for row in DailyPoints.objects.filter(
+            user_id__in={user_id for user_id, _ in days},
+            date__in={day for _, day in days}
+        ).values('user_id', 'date', 'cycle_id', 'total_points', *DAILY_POINTS_COMPONENT_FIELDS):
+            existing[row['user_id']][row['date']] = row
+
+        rebuilt = []
+        changed = 0
+        for (user_id, day), row in days.items():
+            habit = (row['habit'] or 0) + (row['promoted'] or 0)
+            values = {
+                'cycle_id': row['cycle_id'],
+                'habit_points': habit,
+                'bonus_promoted_habit': row['promoted'] or 0,
+                'bonus_completion': row['completion'] or 0,
+                'bonus_streak': row['streak'] or 0,
+                'total_points': habit + (row['completion'] or 0) + (row['streak'] or 0),
+            }
+            current = existing[user_id].get(day)
+            if current is None or any(current[field] != value for field, value in values.items()):
+                changed += 1
+                rebuilt.append(DailyPoints(user_id=user_id, date=day, **values))
+
+        if not dry_run and rebuilt:
+            DailyPoints.objects.bulk_create(
+                rebuilt,
+                update_conflicts=True,
+                unique_fields=['user', 'date'],
+                update_fields=['cycle', 'total_points', *DAILY_POINTS_COMPONENT_FIELDS],
+                batch_size=1000
+            )
+            GamificationService.reconcile_points(user_ids={user_id for user_id, _ in days})
+
+        return {'days': len(days), 'changed': changed}
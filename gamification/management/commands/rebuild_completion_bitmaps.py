@@ -0,0 +1,48 @@
+# gamification/management/commands/rebuild_completion_bitmaps.py
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from habits.models import HabitTracker
+from gamification.streaks import CompletionBitmapService
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde HabitLog los bitmaps de cumplimiento diario (rachas y días perfectos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            type=str,
+            help='Reconstruir solo el bitmap de un usuario (opcional)',
+            default=None
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Usuarios por lote (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        if options['username']:
+            try:
+                user_ids = [User.objects.get(username=options['username']).id]
+            except User.DoesNotExist:
+                self.stdout.write(
+                    self.style.ERROR(f'❌ Usuario "{options["username"]}" no encontrado')
+                )
+                return
+        else:
+            user_ids = list(
+                HabitTracker.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+            )
+
+        batch_size = max(1, options['batch_size'])
+        for start in range(0, len(user_ids), batch_size):
+            CompletionBitmapService.rebuild(user_ids[start:start + batch_size])
+            self.stdout.write(f'  {min(start + batch_size, len(user_ids))}/{len(user_ids)} usuarios')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {len(user_ids)} bitmap(s) reconstruidos')
+        )
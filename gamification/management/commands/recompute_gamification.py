@@ -0,0 +1,107 @@
+# gamification/management/commands/recompute_gamification.py
+
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from gamification.batch import GamificationBatchService, init_worker, recompute_chunk
+
+
+class Command(BaseCommand):
+    help = 'Recalcula puntos, niveles, rachas y medallas de todos los usuarios (proceso nocturno)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Fecha a recalcular YYYY-MM-DD (default: hoy)',
+            default=None
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Recalcular todas las fechas desde YYYY-MM-DD hasta --date',
+            default=None
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Número de procesos en paralelo, cada uno con su conexión (default: 1)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Usuarios por lote (default: 200)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Calcular sin escribir en la base de datos'
+        )
+
+    def _parse_date(self, value, option):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Formato de fecha inválido en {option}. Usar YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        end_date = self._parse_date(options['date'], '--date') if options['date'] else timezone.now().date()
+        start_date = self._parse_date(options['since'], '--since') if options['since'] else end_date
+        if start_date > end_date:
+            raise CommandError('--since no puede ser posterior a --date')
+
+        dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        workers = max(1, options['workers'])
+        chunk_size = max(1, options['chunk_size'])
+        dry_run = options['dry_run']
+
+        user_ids = GamificationBatchService.target_user_ids()
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+        self.stdout.write(
+            f'🎮 Recalculando {len(user_ids)} usuarios, {len(dates)} día(s) '
+            f'({start_date} → {end_date}), {len(chunks)} lote(s), {workers} worker(s)'
+            f'{" [dry-run]" if dry_run else ""}'
+        )
+
+        totals = {'users': 0, 'daily_points': 0, 'levels_changed': 0, 'medals': 0}
+        started = time.monotonic()
+
+        if workers == 1:
+            for chunk in chunks:
+                self._accumulate(totals, recompute_chunk(chunk, dates, dry_run), started)
+        else:
+            # Cada proceso abre su propia conexión: no heredar las del proceso padre
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+                futures = [executor.submit(recompute_chunk, chunk, dates, dry_run) for chunk in chunks]
+                for future in as_completed(futures):
+                    self._accumulate(totals, future.result(), started)
+
+        elapsed = time.monotonic() - started
+        throughput = totals['users'] / elapsed if elapsed > 0 else 0
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n✅ Recalculo completado en {elapsed:.1f}s:\n'
+                f'- Usuarios: {totals["users"]}\n'
+                f'- Puntos diarios escritos: {totals["daily_points"]}\n'
+                f'- Cambios de nivel: {totals["levels_changed"]}\n'
+                f'- Medallas otorgadas: {totals["medals"]}\n'
+                f'- Throughput: {throughput:.1f} usuarios/s'
+            )
+        )
+
+    def _accumulate(self, totals, stats, started):
+        for key in totals:
+            totals[key] += stats[key]
+        elapsed = time.monotonic() - started
+        rate = totals['users'] / elapsed if elapsed > 0 else 0
+        self.stdout.write(f'  {totals["users"]} usuarios procesados ({rate:.1f} usuarios/s)')
@@ -0,0 +1,65 @@
+# gamification/management/commands/reconcile_points.py
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from gamification.services import GamificationService
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Verifica los contadores de puntos de UserLevel contra DailyPoints y corrige desviaciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            type=str,
+            help='Limitar la verificación a un usuario (opcional)',
+            default=None
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar las desviaciones sin corregirlas'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Tamaño de lote para lectura y bulk_update (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['username']:
+            try:
+                user_ids = [User.objects.get(username=options['username']).id]
+            except User.DoesNotExist:
+                self.stdout.write(
+                    self.style.ERROR(f'❌ Usuario "{options["username"]}" no encontrado')
+                )
+                return
+
+        drifts = GamificationService.reconcile_points(
+            user_ids=user_ids,
+            dry_run=options['dry_run'],
+            batch_size=options['batch_size']
+        )
+
+        for drift in drifts:
+            cycle_before, cycle_expected = drift['cycle_points']
+            total_before, total_expected = drift['total_points']
+            self.stdout.write(
+                f'  • Usuario {drift["user_id"]}: ciclo {cycle_before} → {cycle_expected}, '
+                f'total {total_before} → {total_expected}'
+            )
+
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS('✅ Todos los contadores coinciden con DailyPoints'))
+        elif options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(f'⚠️ {len(drifts)} usuario(s) con desviaciones (dry-run, sin cambios)')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'🔧 {len(drifts)} usuario(s) corregidos')
+            )
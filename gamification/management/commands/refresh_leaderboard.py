@@ -0,0 +1,27 @@
+# gamification/management/commands/refresh_leaderboard.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from gamification.leaderboard import LeaderboardService
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la clasificación por ciclo y el ranking de los resúmenes de ciclo (programar con cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Filas por lote en la escritura (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = LeaderboardService.refresh(batch_size=max(1, options['batch_size']))
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(f'🏆 Clasificación actualizada: {written} usuario(s) en {elapsed:.1f}s')
+        )
@@ -0,0 +1,111 @@
+# gamification/management/commands/replay_points.py
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from gamification.batch import GamificationBatchService
+from gamification.ledger import PointsLedgerService
+from gamification.models import DailyPoints
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Reconstruye DailyPoints y UserLevel desde el libro de puntos (opcionalmente re-puntuando con POINTS_CONFIG actual)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            type=str,
+            help='Limitar a un usuario (opcional)',
+            default=None
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Primera fecha YYYY-MM-DD (opcional)',
+            default=None
+        )
+        parser.add_argument(
+            '--until',
+            type=str,
+            help='Última fecha YYYY-MM-DD (opcional)',
+            default=None
+        )
+        parser.add_argument(
+            '--rescore',
+            action='store_true',
+            help='Re-puntuar los días con la configuración actual y anotar las diferencias en el libro'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Usuarios por lote al re-puntuar (default: 200)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar cuántos días cambiarían sin escribir'
+        )
+
+    def _parse_date(self, value, option):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Formato de fecha inválido en {option}. Usar YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        since = self._parse_date(options['since'], '--since')
+        until = self._parse_date(options['until'], '--until')
+
+        user_ids = None
+        if options['username']:
+            try:
+                user_ids = [User.objects.get(username=options['username']).id]
+            except User.DoesNotExist:
+                self.stdout.write(
+                    self.style.ERROR(f'❌ Usuario "{options["username"]}" no encontrado')
+                )
+                return
+
+        if options['rescore']:
+            self._rescore(user_ids, since, until, options)
+
+        result = PointsLedgerService.replay(
+            user_ids=user_ids,
+            since=since,
+            until=until,
+            dry_run=options['dry_run']
+        )
+
+        message = f'{result["days"]} día(s) reproducidos desde el libro, {result["changed"]} con cambios'
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'⚠️ {message} (dry-run, sin cambios)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ {message}'))
+
+    def _rescore(self, user_ids, since, until, options):
+        """Re-puntúa con POINTS_CONFIG actual los días ya registrados en DailyPoints"""
+        days = DailyPoints.objects.all()
+        if user_ids is not None:
+            days = days.filter(user_id__in=user_ids)
+        if since:
+            days = days.filter(date__gte=since)
+        if until:
+            days = days.filter(date__lte=until)
+
+        target_users = sorted(set(days.values_list('user_id', flat=True)))
+        dates = sorted(set(days.values_list('date', flat=True)))
+        chunk_size = max(1, options['chunk_size'])
+
+        self.stdout.write(f'🔁 Re-puntuando {len(target_users)} usuario(s), {len(dates)} fecha(s)')
+        for start in range(0, len(target_users), chunk_size):
+            GamificationBatchService.recompute_users(
+                target_users[start:start + chunk_size],
+                dates,
+                dry_run=options['dry_run'],
+                reason='RESCORE'
+            )
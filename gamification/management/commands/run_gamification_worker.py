@@ -0,0 +1,55 @@
+# gamification/management/commands/run_gamification_worker.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from gamification.queue import GamificationQueue
+
+
+class Command(BaseCommand):
+    help = 'Consume la cola de gamificación diferida (GAMIFICATION_DEFERRED)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Tareas reservadas por vuelta (default: 50)'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Segundos de espera cuando la cola está vacía (default: 2)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Vaciar la cola una vez y terminar (útil desde cron)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        self.stdout.write(f'🎮 Worker de gamificación iniciado (lotes de {batch_size})')
+
+        total = 0
+        while True:
+            stats = GamificationQueue.drain(batch_size)
+            handled = stats['processed'] + stats['coalesced_requeued'] + stats['failed']
+
+            if handled:
+                total += stats['processed']
+                latencies = stats['latencies']
+                avg_latency = sum(latencies) / len(latencies) if latencies else 0
+                self.stdout.write(
+                    f'  {stats["processed"]} procesadas, {stats["coalesced_requeued"]} reencoladas, '
+                    f'{stats["failed"]} fallidas en {stats["duration"]:.2f}s '
+                    f'(latencia media {avg_latency:.1f}s, cola: {GamificationQueue.stats()["depth"]})'
+                )
+                continue
+
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Cola vacía: {total} recálculo(s) procesados'))
@@ -0,0 +1,188 @@
+# gamification/medal_rules.py
+"""
+Tabla de reglas y catálogo de medallas compilados en memoria.
+
+Las medallas se leen una vez y se convierten en reglas inmutables (puntos,
+nivel, ciclo, tipo de criterio y umbral) y en un catálogo ya serializado
+para la API. Ambos comparten versión y se invalidan:
+- en este proceso, con las señales post_save/post_delete de Medal;
+- en el resto de procesos, con una versión compartida en la caché, que se
+  consulta como mucho una vez cada GAMIFICATION_MEDAL_RULES_VERSION_CHECK
+  segundos (no en cada búsqueda: con Redis sería un viaje de red por llamada);
+- como último recurso, al vencer un TTL (cachés no compartidas).
+"""
+import threading
+import time
+from types import MappingProxyType
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .cache import gamification_cache
+
+MEDAL_RULES_VERSION_KEY = 'gamification:medal_rules:version'
+
+LEVEL_ORDER = ['NOVATO', 'BRONCE', 'PLATA', 'ORO', 'PLATINO', 'MAESTRO']
+
+
+class MedalRule(NamedTuple):
+    medal_id: int
+    required_points: int
+    level_index: int
+    required_cycle_number: int
+    criterion_type: str
+    threshold: int
+
+
+class MedalTable(NamedTuple):
+    rules: list
+    medals: dict
+    catalog: dict
+    active_catalog: tuple
+    version: object
+    loaded_at: float
+
+
+class MedalRuleEngine:
+    """
+    Reglas de medallas compiladas y su evaluación contra un snapshot de estadísticas
+    """
+    _lock = threading.Lock()
+    _table = None
+    _version_checked_at = 0.0
+
+    @staticmethod
+    def _shared_version():
+        return gamification_cache().get(MEDAL_RULES_VERSION_KEY)
+
+    @classmethod
+    def invalidate(cls):
+        """Descarta la tabla local y avisa al resto de procesos"""
+        with cls._lock:
+            cls._table = None
+            cls._version_checked_at = 0.0
+        cache = gamification_cache()
+        try:
+            cache.incr(MEDAL_RULES_VERSION_KEY)
+        except ValueError:
+            # La clave no existe todavía (o la caché no persiste valores)
+            cache.set(MEDAL_RULES_VERSION_KEY, int(time.time()), None)
+
+    @classmethod
+    def _current(cls):
+        """Tabla vigente; se recompila si falta, venció el TTL o cambió la versión"""
+        table = cls._table
+        now = time.monotonic()
+        ttl = getattr(settings, 'GAMIFICATION_MEDAL_RULES_TTL', 300)
+        if table is None or now - table.loaded_at > ttl:
+            return cls._compile()
+
+        check_interval = getattr(settings, 'GAMIFICATION_MEDAL_RULES_VERSION_CHECK', 5)
+        if now - cls._version_checked_at < check_interval:
+            return table
+        if cls._shared_version() != table.version:
+            return cls._compile()
+        cls._version_checked_at = now
+        return table
+
+    @classmethod
+    def _compile(cls):
+        from .models import Medal
+        from .serializers import MedalSerializer
+
+        version = cls._shared_version()
+        medals = {
+            medal.id: medal
+            for medal in Medal.objects.order_by('required_cycle_number', 'week_number', 'order')
+        }
+        catalog = {
+            medal_id: MappingProxyType(dict(MedalSerializer(medal).data))
+            for medal_id, medal in medals.items()
+        }
+        active_catalog = tuple(
+            catalog[medal.id]
+            for medal in sorted(medals.values(), key=lambda m: (m.required_cycle_number, m.order))
+            if medal.is_active
+        )
+        rules = [
+            MedalRule(
+                medal_id=medal.id,
+                required_points=medal.required_points,
+                level_index=LEVEL_ORDER.index(medal.required_level),
+                required_cycle_number=medal.required_cycle_number,
+                criterion_type=medal.criterion_type,
+                threshold=medal.criterion_threshold,
+            )
+            for medal in medals.values()
+            if medal.is_active
+        ]
+        table = MedalTable(rules, medals, catalog, active_catalog, version, time.monotonic())
+        with cls._lock:
+            cls._table = table
+            cls._version_checked_at = table.loaded_at
+        return table
+
+    @classmethod
+    def rules(cls):
+        """Reglas activas, compilando la tabla si está vacía o desactualizada"""
+        return cls._current().rules
+
+    @classmethod
+    def medal(cls, medal_id):
+        """Instancia de Medal cargada al compilar la tabla"""
+        table = cls._current()
+        if medal_id not in table.medals:
+            table = cls._compile()
+        return table.medals[medal_id]
+
+    @classmethod
+    def catalog(cls, medal_ids=()):
+        """
+        {medal_id: datos serializados} de todas las medallas (solo lectura).
+        Si falta alguno de medal_ids (medalla creada sin señal) se recompila.
+        """
+        table = cls._current()
+        if any(medal_id not in table.catalog for medal_id in medal_ids):
+            table = cls._compile()
+        return table.catalog
+
+    @classmethod
+    def active_catalog(cls):
+        """Medallas activas serializadas, ordenadas por ciclo y orden (solo lectura)"""
+        return cls._current().active_catalog
+
+    @staticmethod
+    def needs_activity_stats(rules):
+        """True si alguna regla necesita rachas o días perfectos"""
+        return any(rule.criterion_type != 'POINTS' for rule in rules)
+
+    @staticmethod
+    def eligible(rules, stats, earned_ids):
+        """
+        Reglas cumplidas por el snapshot de estadísticas, en una sola pasada.
+        stats: cycle_points, cycle_number, level_index y, si hacen falta,
+        current_streak, week_completed y perfect_days.
+        """
+        matched = []
+        for rule in rules:
+            if rule.medal_id in earned_ids:
+                continue
+            if rule.required_points > stats['cycle_points']:
+                continue
+            if rule.required_cycle_number > stats['cycle_number']:
+                continue
+            if rule.level_index > stats['level_index']:
+                continue
+
+            if rule.criterion_type == 'STREAK':
+                if stats['current_streak'] < rule.threshold:
+                    continue
+            elif rule.criterion_type == 'WEEK_COMPLETE':
+                if not stats['week_completed']:
+                    continue
+            elif rule.criterion_type == 'PERFECT_DAYS':
+                if stats['perfect_days'] < rule.threshold:
+                    continue
+
+            matched.append(rule)
+        return matched
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:56
+
+from django.db import migrations, models
+
+
+def backfill_medal_criteria(apps, schema_editor):
+    """
+    Traduce los criterios que antes se deducían del texto de la medalla
+    (nombre/descripción) a criterion_type + criterion_threshold.
+    """
+    Medal = apps.get_model('gamification', 'Medal')
+
+    for medal in Medal.objects.all():
+        name = medal.name.lower()
+        description = medal.description.lower()
+        criterion_type, threshold = 'POINTS', 0
+
+        if 'racha' in name or 'consecutivos' in name:
+            for days in (3, 10, 15, 21):
+                if f'{days} días' in medal.description:
+                    criterion_type, threshold = 'STREAK', days
+                    break
+
+        if criterion_type == 'POINTS':
+            if 'semana' in name or 'semana' in description:
+                criterion_type, threshold = 'WEEK_COMPLETE', 7
+            elif ('perfect' in name or 'perfecta' in description) and '15 días' in medal.description:
+                criterion_type, threshold = 'PERFECT_DAYS', 15
+
+        if criterion_type != 'POINTS':
+            medal.criterion_type = criterion_type
+            medal.criterion_threshold = threshold
+            medal.save(update_fields=['criterion_type', 'criterion_threshold'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0005_auto_20250629_1623'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medal',
+            name='criterion_threshold',
+            field=models.PositiveIntegerField(default=0, help_text='Días de racha o días perfectos requeridos según el tipo de criterio', verbose_name='Umbral del criterio'),
+        ),
+        migrations.AddField(
+            model_name='medal',
+            name='criterion_type',
+            field=models.CharField(choices=[('POINTS', 'Solo puntos y nivel'), ('STREAK', 'Racha de días consecutivos'), ('WEEK_COMPLETE', 'Semana completa'), ('PERFECT_DAYS', 'Días perfectos en el ciclo')], default='POINTS', max_length=20, verbose_name='Tipo de criterio'),
+        ),
+        migrations.RunPython(backfill_medal_criteria, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0006_medal_criterion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCompletionBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin_date', models.DateField(blank=True, null=True, verbose_name='Fecha del bit 0')),
+                ('complete_bits', models.BinaryField(default=b'', verbose_name='Días completos')),
+                ('perfect_bits', models.BinaryField(default=b'', verbose_name='Días perfectos')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='completion_bitmap', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Bitmap de Cumplimiento Diario',
+                'verbose_name_plural': 'Bitmaps de Cumplimiento Diario',
+            },
+        ),
+    ]
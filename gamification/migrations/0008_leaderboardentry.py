@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0007_dailycompletionbitmap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cycle_number', models.IntegerField(verbose_name='Número de ciclo')),
+                ('points', models.IntegerField(default=0, verbose_name='Puntos del ciclo')),
+                ('level', models.CharField(max_length=20, verbose_name='Nivel')),
+                ('rank', models.IntegerField(verbose_name='Posición')),
+                ('percentile', models.FloatField(default=100.0, help_text='Usuarios del mismo ciclo por debajo, en % (100 = primera posición)', verbose_name='Percentil')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculado en')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Entrada de Clasificación',
+                'verbose_name_plural': 'Clasificación',
+                'ordering': ['cycle_number', 'rank'],
+                'indexes': [models.Index(fields=['cycle_number', 'rank'], name='leaderboard_cycle_rank_idx')],
+            },
+        ),
+    ]
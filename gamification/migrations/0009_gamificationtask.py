@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0008_leaderboardentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GamificationTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha a recalcular')),
+                ('first_requested_at', models.DateTimeField(verbose_name='Primera solicitud')),
+                ('last_requested_at', models.DateTimeField(verbose_name='Última solicitud')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='Reservada por un worker')),
+                ('attempts', models.IntegerField(default=0, verbose_name='Intentos')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gamification_tasks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tarea de Gamificación',
+                'verbose_name_plural': 'Tareas de Gamificación',
+                'ordering': ['first_requested_at'],
+                'indexes': [models.Index(fields=['first_requested_at'], name='gamification_task_fifo_idx')],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
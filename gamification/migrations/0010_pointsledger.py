@@ -0,0 +1,76 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_ledger(apps, schema_editor):
+    """
+    Abre el libro de puntos con los DailyPoints existentes: un movimiento por
+    componente distinto de cero, con el saldo acumulado por usuario y fecha.
+    """
+    DailyPoints = apps.get_model('gamification', 'DailyPoints')
+    PointsLedger = apps.get_model('gamification', 'PointsLedger')
+
+    entries = []
+    balance = 0
+    current_user = None
+    rows = DailyPoints.objects.order_by('user_id', 'date').values_list(
+        'user_id', 'cycle_id', 'date',
+        'habit_points', 'bonus_promoted_habit', 'bonus_completion', 'bonus_streak'
+    )
+    for user_id, cycle_id, day, habit, promoted, completion, streak in rows.iterator(chunk_size=2000):
+        if user_id != current_user:
+            current_user, balance = user_id, 0
+        for component, delta in (
+            ('HABIT', habit - promoted),
+            ('PROMOTED', promoted),
+            ('COMPLETION', completion),
+            ('STREAK', streak),
+        ):
+            if delta:
+                balance += delta
+                entries.append(PointsLedger(
+                    user_id=user_id, cycle_id=cycle_id, date=day, component=component,
+                    delta=delta, balance_after=balance, reason='BACKFILL'
+                ))
+        if len(entries) >= 2000:
+            PointsLedger.objects.bulk_create(entries)
+            entries = []
+
+    if entries:
+        PointsLedger.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cycles', '0001_initial'),
+        ('gamification', '0009_gamificationtask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('component', models.CharField(choices=[('HABIT', 'Puntos por hábitos'), ('PROMOTED', 'Bonus hábito promocionado'), ('COMPLETION', 'Bonus por completar todos'), ('STREAK', 'Bonus por racha')], max_length=20, verbose_name='Componente')),
+                ('delta', models.IntegerField(verbose_name='Variación de puntos')),
+                ('balance_after', models.IntegerField(verbose_name='Total histórico tras el movimiento')),
+                ('reason', models.CharField(choices=[('LOG', 'Registro de hábitos'), ('BATCH', 'Recálculo por lotes'), ('RESCORE', 'Recálculo con nueva configuración'), ('BACKFILL', 'Migración de DailyPoints existentes')], default='LOG', max_length=20, verbose_name='Motivo')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cycle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cycles.usercycle', verbose_name='Ciclo al que pertenece')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Puntos',
+                'verbose_name_plural': 'Libro de Puntos',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['user', 'date'], name='ledger_user_date_idx'), models.Index(fields=['user', 'created_at'], name='ledger_user_created_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_cycle_number(apps, schema_editor):
+    """Copia el número de ciclo en los movimientos existentes"""
+    PointsLedger = apps.get_model('gamification', 'PointsLedger')
+    UserCycle = apps.get_model('cycles', 'UserCycle')
+    PointsLedger.objects.filter(cycle__isnull=False).update(
+        cycle_number=Subquery(UserCycle.objects.filter(pk=OuterRef('cycle_id')).values('cycle_number')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cycles', '0002_usercycle_status_start_idx'),
+        ('gamification', '0010_pointsledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pointsledger',
+            name='cycle_number',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Número de ciclo'),
+        ),
+        migrations.RunPython(backfill_cycle_number, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='pointsledger',
+            name='cycle',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='cycles.usercycle', verbose_name='Ciclo al que pertenece'),
+        ),
+    ]
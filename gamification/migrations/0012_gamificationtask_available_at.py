@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0011_ledger_keep_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamificationtask',
+            name='available_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Disponible a partir de'),
+        ),
+    ]
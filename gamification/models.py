@@ -3,6 +3,9 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from habits.models import HabitLog
 
 class UserLevel(models.Model):
     """
@@ -90,6 +93,12 @@ class Medal(models.Model):
     MODIFICADO: Ahora se basa en número de ciclo en lugar de mes
     """
     LEVEL_CHOICES = UserLevel.LEVEL_CHOICES
+    CRITERION_CHOICES = [
+        ('POINTS', 'Solo puntos y nivel'),
+        ('STREAK', 'Racha de días consecutivos'),
+        ('WEEK_COMPLETE', 'Semana completa'),
+        ('PERFECT_DAYS', 'Días perfectos en el ciclo'),
+    ]
     
     name = models.CharField(max_length=100, verbose_name="Nombre de la medalla")
     description = models.TextField(verbose_name="Descripción")
@@ -126,6 +135,19 @@ class Medal(models.Model):
         verbose_name="Semana objetivo (1-4)"
     )
     
+    # Criterio adicional a puntos/nivel/ciclo (compilado en medal_rules)
+    criterion_type = models.CharField(
+        max_length=20,
+        choices=CRITERION_CHOICES,
+        default='POINTS',
+        verbose_name="Tipo de criterio"
+    )
+    criterion_threshold = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Umbral del criterio",
+        help_text="Días de racha o días perfectos requeridos según el tipo de criterio"
+    )
+    
     # Control
     is_active = models.BooleanField(default=True, verbose_name="Está activa")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -256,4 +278,179 @@ class DailyPoints(models.Model):
         unique_together = ('user', 'date')
         ordering = ['-date']
         verbose_name = "Puntos Diarios"
-        verbose_name_plural = "Puntos Diarios"
\ No newline at end of file
+        verbose_name_plural = "Puntos Diarios"
+
+
+class PointsLedger(models.Model):
+    """
+    Libro mayor de puntos: solo se añaden filas, nunca se modifican.
+    Cada fila es una variación con signo de un componente de la puntuación de
+    un día. La suma de un día reproduce DailyPoints.total_points y balance_after
+    guarda el total histórico del usuario tras aplicar la fila.
+    """
+    COMPONENT_CHOICES = [
+        ('HABIT', 'Puntos por hábitos'),
+        ('PROMOTED', 'Bonus hábito promocionado'),
+        ('COMPLETION', 'Bonus por completar todos'),
+        ('STREAK', 'Bonus por racha'),
+    ]
+    REASON_CHOICES = [
+        ('LOG', 'Registro de hábitos'),
+        ('BATCH', 'Recálculo por lotes'),
+        ('RESCORE', 'Recálculo con nueva configuración'),
+        ('BACKFILL', 'Migración de DailyPoints existentes'),
+    ]
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='points_ledger'
+    )
+    # Borrar un ciclo no borra su historial: queda el número de ciclo denormalizado
+    cycle = models.ForeignKey(
+        'cycles.UserCycle',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Ciclo al que pertenece"
+    )
+    cycle_number = models.PositiveIntegerField(null=True, blank=True, verbose_name="Número de ciclo")
+    date = models.DateField(verbose_name="Fecha")
+    component = models.CharField(max_length=20, choices=COMPONENT_CHOICES, verbose_name="Componente")
+    delta = models.IntegerField(verbose_name="Variación de puntos")
+    balance_after = models.IntegerField(verbose_name="Total histórico tras el movimiento")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default='LOG', verbose_name="Motivo")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.date} {self.component} {self.delta:+d}"
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'date'], name='ledger_user_date_idx'),
+            models.Index(fields=['user', 'created_at'], name='ledger_user_created_idx'),
+        ]
+        verbose_name = "Movimiento de Puntos"
+        verbose_name_plural = "Libro de Puntos"
+
+
+class DailyCompletionBitmap(models.Model):
+    """
+    Mapa de bits compacto de cumplimiento diario de cada usuario.
+    El bit i corresponde a origin_date + i días:
+    - complete_bits: todos los hábitos del día con nivel >= 2
+    - perfect_bits: todos los hábitos del día con nivel 3
+    Se mantiene desde las señales de HabitLog y se puede reconstruir
+    con el comando rebuild_completion_bitmaps.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='completion_bitmap'
+    )
+    origin_date = models.DateField(null=True, blank=True, verbose_name="Fecha del bit 0")
+    complete_bits = models.BinaryField(default=b'', verbose_name="Días completos")
+    perfect_bits = models.BinaryField(default=b'', verbose_name="Días perfectos")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user.username} - Bitmap desde {self.origin_date}"
+    
+    class Meta:
+        verbose_name = "Bitmap de Cumplimiento Diario"
+        verbose_name_plural = "Bitmaps de Cumplimiento Diario"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Posición materializada de cada usuario en la clasificación de su número de ciclo.
+    Se recalcula en bloque con el comando refresh_leaderboard; la posición de un
+    usuario es una búsqueda por índice, nunca una ordenación completa.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='leaderboard_entry'
+    )
+    cycle_number = models.IntegerField(verbose_name="Número de ciclo")
+    points = models.IntegerField(default=0, verbose_name="Puntos del ciclo")
+    level = models.CharField(max_length=20, verbose_name="Nivel")
+    rank = models.IntegerField(verbose_name="Posición")
+    percentile = models.FloatField(
+        default=100.0,
+        verbose_name="Percentil",
+        help_text="Usuarios del mismo ciclo por debajo, en % (100 = primera posición)"
+    )
+    computed_at = models.DateTimeField(verbose_name="Calculado en")
+    
+    def __str__(self):
+        return f"{self.user.username} - #{self.rank} (Ciclo {self.cycle_number})"
+    
+    class Meta:
+        ordering = ['cycle_number', 'rank']
+        indexes = [
+            models.Index(fields=['cycle_number', 'rank'], name='leaderboard_cycle_rank_idx'),
+        ]
+        verbose_name = "Entrada de Clasificación"
+        verbose_name_plural = "Clasificación"
+
+
+class GamificationTask(models.Model):
+    """
+    Cola en base de datos de recálculos de gamificación pendientes (modo diferido).
+    Una fila por usuario y fecha: varios registros de hábitos del mismo día se
+    agrupan en un solo recálculo. La consume el comando run_gamification_worker.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='gamification_tasks'
+    )
+    date = models.DateField(verbose_name="Fecha a recalcular")
+    first_requested_at = models.DateTimeField(verbose_name="Primera solicitud")
+    last_requested_at = models.DateTimeField(verbose_name="Última solicitud")
+    claimed_at = models.DateTimeField(null=True, blank=True, verbose_name="Reservada por un worker")
+    attempts = models.IntegerField(default=0, verbose_name="Intentos")
+    # Tras un fallo no se reintenta hasta esta hora (espera exponencial)
+    available_at = models.DateTimeField(null=True, blank=True, verbose_name="Disponible a partir de")
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.date} (pendiente desde {self.first_requested_at})"
+    
+    class Meta:
+        unique_together = ('user', 'date')
+        ordering = ['first_requested_at']
+        indexes = [
+            models.Index(fields=['first_requested_at'], name='gamification_task_fifo_idx'),
+        ]
+        verbose_name = "Tarea de Gamificación"
+        verbose_name_plural = "Tareas de Gamificación"
+
+
+@receiver([post_save, post_delete], sender=Medal)
+def invalidate_medal_rules(sender, **kwargs):
+    """
+    Invalida la tabla de reglas de medallas compilada al crear, editar o borrar medallas
+    """
+    from .medal_rules import MedalRuleEngine
+    MedalRuleEngine.invalidate()
+
+
+@receiver(post_save, sender=HabitLog)
+def refresh_completion_bitmap_on_save(sender, instance, **kwargs):
+    """
+    Actualiza el bit del día registrado en el bitmap del usuario
+    (las escrituras en bloque lo hacen en HabitLogQuerySet)
+    """
+    from .streaks import CompletionBitmapService
+    CompletionBitmapService.refresh_days(instance.user_id, [instance.date])
+
+
+@receiver(post_delete, sender=HabitLog)
+def refresh_completion_bitmap_on_delete(sender, instance, **kwargs):
+    """
+    Actualiza el bit del día borrado (sin crear bitmaps nuevos durante borrados en cascada)
+    """
+    from .streaks import CompletionBitmapService
+    CompletionBitmapService.refresh_days(instance.user_id, [instance.date], create=False)
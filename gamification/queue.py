@@ -0,0 +1,171 @@
+# gamification/queue.py
+"""
+Procesamiento diferido (write-behind) de la gamificación.
+
+Con GAMIFICATION_DEFERRED activo, el registro de hábitos solo encola una
+tarea (usuario, fecha) y responde al momento. El comando
+run_gamification_worker consume la cola: cada tarea agrupa todos los
+registros del mismo usuario y día en un único process_daily_gamification.
+
+Una tarea se reserva (claimed_at) y se procesa fuera del bloqueo. Si llega
+una nueva solicitud mientras se procesa, last_requested_at cambia y la tarea
+no se borra: se vuelve a procesar en la siguiente vuelta.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .cache import gamification_cache
+from .models import GamificationTask
+from .services import GamificationService
+
+QUEUE_STATS_KEY = 'gamification:queue:last_batch'
+CLAIM_LEASE_SECONDS = 300
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+
+def deferred_enabled():
+    """True si la gamificación del registro de hábitos se procesa en diferido"""
+    return getattr(settings, 'GAMIFICATION_DEFERRED', False)
+
+
+def retry_backoff(attempts):
+    """Espera antes del siguiente intento tras attempts fallos: 30s, 60s, 120s... hasta 1h"""
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+class GamificationQueue:
+    """
+    Cola de recálculos de gamificación en base de datos
+    """
+
+    @staticmethod
+    def enqueue(user_id, target_date):
+        """
+        Encola (o agrupa con una pendiente) el recálculo de un usuario y fecha.
+        Una solicitud nueva reactiva la tarea: reinicia los intentos y la espera,
+        así un día que agotó los reintentos o está en espera vuelve a procesarse.
+        """
+        now = timezone.now()
+        GamificationTask.objects.bulk_create(
+            [GamificationTask(
+                user_id=user_id,
+                date=target_date,
+                first_requested_at=now,
+                last_requested_at=now,
+                claimed_at=None,
+                attempts=0,
+                available_at=None
+            )],
+            update_conflicts=True,
+            unique_fields=['user', 'date'],
+            update_fields=['last_requested_at', 'claimed_at', 'attempts', 'available_at']
+        )
+
+    @staticmethod
+    def claim(batch_size=50, lease_seconds=CLAIM_LEASE_SECONDS):
+        """
+        Reserva hasta batch_size tareas en orden de llegada. Las reservas de un
+        worker caído vuelven a estar disponibles tras lease_seconds; las tareas
+        fallidas esperan hasta available_at y las que fallaron MAX_ATTEMPTS
+        veces se quedan en la cola para revisión.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            tasks = list(
+                GamificationTask.objects.select_for_update(skip_locked=True).filter(
+                    Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=lease_seconds)),
+                    Q(available_at__isnull=True) | Q(available_at__lte=now),
+                    attempts__lt=MAX_ATTEMPTS
+                ).order_by('first_requested_at')[:batch_size]
+            )
+            if tasks:
+                GamificationTask.objects.filter(pk__in=[task.pk for task in tasks]).update(claimed_at=now)
+        return tasks
+
+    @staticmethod
+    def complete(task):
+        """
+        Borra la tarea si no hubo solicitudes nuevas durante el procesamiento;
+        si las hubo la libera para otra vuelta. Devuelve True si se borró.
+        """
+        deleted, _ = GamificationTask.objects.filter(
+            pk=task.pk,
+            last_requested_at=task.last_requested_at
+        ).delete()
+        if not deleted:
+            GamificationTask.objects.filter(pk=task.pk).update(claimed_at=None)
+        return bool(deleted)
+
+    @staticmethod
+    def release(task):
+        """
+        Libera una tarea fallida para reintentarla tras una espera exponencial:
+        un fallo persistente no vuelve a reservarse en cada vuelta del worker.
+        """
+        attempts = task.attempts + 1
+        GamificationTask.objects.filter(pk=task.pk).update(
+            claimed_at=None,
+            attempts=attempts,
+            available_at=timezone.now() + retry_backoff(attempts)
+        )
+
+    @staticmethod
+    def drain(batch_size=50):
+        """
+        Procesa un lote de la cola. Devuelve estadísticas del lote, incluida
+        la latencia (desde la primera solicitud hasta el recálculo) en segundos.
+        """
+        tasks = GamificationQueue.claim(batch_size)
+        users = User.objects.in_bulk({task.user_id for task in tasks})
+        stats = {'processed': 0, 'coalesced_requeued': 0, 'failed': 0, 'latencies': []}
+
+        started = time.monotonic()
+        for task in tasks:
+            try:
+                GamificationService.process_daily_gamification(users[task.user_id], task.date)
+            except Exception as e:
+                print(f"❌ Error procesando gamificación de {task.user_id} ({task.date}): {str(e)}")
+                GamificationQueue.release(task)
+                stats['failed'] += 1
+                continue
+
+            if GamificationQueue.complete(task):
+                stats['processed'] += 1
+                stats['latencies'].append((timezone.now() - task.first_requested_at).total_seconds())
+            else:
+                stats['coalesced_requeued'] += 1
+
+        stats['duration'] = time.monotonic() - started
+        if tasks:
+            GamificationQueue._record_batch(stats)
+        return stats
+
+    @staticmethod
+    def _record_batch(stats):
+        latencies = stats['latencies']
+        gamification_cache().set(QUEUE_STATS_KEY, {
+            'finished_at': timezone.now().isoformat(),
+            'processed': stats['processed'],
+            'failed': stats['failed'],
+            'avg_latency_seconds': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            'max_latency_seconds': round(max(latencies), 2) if latencies else None,
+        }, None)
+
+    @staticmethod
+    def stats():
+        """Profundidad de la cola, antigüedad de la tarea más vieja y último lote procesado"""
+        summary = GamificationTask.objects.aggregate(depth=Count('id'), oldest=Min('first_requested_at'))
+        oldest = summary['oldest']
+        return {
+            'depth': summary['depth'],
+            'oldest_pending_seconds': round((timezone.now() - oldest).total_seconds(), 1) if oldest else None,
+            'last_batch': gamification_cache().get(QUEUE_STATS_KEY),
+        }
@@ -1,11 +1,23 @@
 # gamification/services.py - VERSIÓN ARREGLADA
 
+from bisect import bisect_right
+from collections import defaultdict
+
 from django.utils import timezone
-from django.db.models import Q
-from django.db import models
+from django.db.models import Q, F, Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db import models, transaction, IntegrityError
 from datetime import date, timedelta
 from .models import UserLevel, Medal, UserMedal, DailyPoints
+from .streaks import StreakEngine, streak_memo
+from .cache import DashboardCache
+from .ledger import (
+    PointsLedgerService, components_from_score, components_from_daily_points,
+    DAILY_POINTS_COMPONENT_FIELDS
+)
+from .medal_rules import MedalRuleEngine, LEVEL_ORDER
 from habits.models import HabitLog, HabitTracker
+from gastro_assistant.db import upsert
 
 class GamificationService:
     """
@@ -38,7 +50,7 @@ class GamificationService:
         """
         Obtiene o crea el nivel de gamificación del usuario
         """
-        user_level, created = UserLevel.objects.get_or_create(
+        user_level, created = UserLevel.objects.select_related('current_cycle').get_or_create(
             user=user,
             defaults={
                 'current_level': 'NOVATO',
@@ -56,34 +68,37 @@ class GamificationService:
         if target_date is None:
             target_date = timezone.now().date()
         
-        # Obtener TODOS los logs de hábitos del día
-        habit_logs = HabitLog.objects.filter(
-            tracker__user=user,
+        # Obtener TODOS los logs de hábitos del día (nivel y si es promocionado)
+        habit_logs = list(HabitLog.objects.filter(
+            user=user,
             date=target_date
-        ).select_related('tracker__habit', 'tracker')
+        ).values_list('completion_level', 'tracker__is_promoted'))
         
-        if not habit_logs.exists():
-            return {
-                'total_points': 0,
-                'habit_points': 0,
-                'bonus_completion': 0,
-                'bonus_streak': 0,
-                'bonus_promoted': 0,
-                'habits_completed': 0,
-                'habits_total': 0,
-                'current_streak': 0
-            }
+        if not habit_logs:
+            return GamificationService.score_day([], 0)
         
+        # Bonus por racha
+        current_streak = GamificationService.calculate_streak_on_date(user, target_date)
+        
+        return GamificationService.score_day(habit_logs, current_streak)
+    
+    @staticmethod
+    def score_day(habit_logs, current_streak):
+        """
+        Puntuación de un día a partir de pares (completion_level, is_promoted)
+        y de la racha en esa fecha. No consulta la base de datos, de modo que
+        los procesos por lotes pueden reutilizarla con datos precargados.
+        """
         habit_points = 0
         bonus_promoted = 0
         habits_completed = 0
         habits_total = len(habit_logs)
         
+        if habits_total == 0:
+            current_streak = 0
+        
         # Calcular puntos por cada hábito
-        for log in habit_logs:
-            is_promoted = log.tracker.is_promoted
-            completion_level = log.completion_level
-            
+        for completion_level, is_promoted in habit_logs:
             if is_promoted:
                 points = GamificationService.POINTS_CONFIG['habit_promoted'][completion_level]
                 bonus_promoted += points - GamificationService.POINTS_CONFIG['habit_normal'][completion_level]
@@ -102,7 +117,6 @@ class GamificationService:
             bonus_completion = GamificationService.POINTS_CONFIG['bonus_all_completed']
         
         # Bonus por racha
-        current_streak = GamificationService.calculate_streak_on_date(user, target_date)
         bonus_streak = min(
             current_streak * GamificationService.POINTS_CONFIG['bonus_streak_per_day'],
             GamificationService.POINTS_CONFIG['max_streak_bonus']
@@ -125,33 +139,38 @@ class GamificationService:
     def calculate_streak_on_date(user, target_date):
         """
         Calcula la racha de días consecutivos hasta una fecha específica
+        OPTIMIZADO: una sola consulta agrupada (ver gamification/streaks.py)
         """
-        current_date = target_date
-        streak = 0
-        
-        # Mirar hacia atrás desde la fecha objetivo
-        while True:
-            # Verificar si completó los hábitos este día
-            daily_logs = HabitLog.objects.filter(
-                tracker__user=user,
-                date=current_date
-            )
-            
-            if not daily_logs.exists():
-                break
-            
-            # Contar hábitos completados (nivel 2 o 3)
-            completed_count = daily_logs.filter(completion_level__gte=2).count()
-            total_count = daily_logs.count()
-            
-            # Si no completó todos los hábitos, rompe la racha
-            if completed_count < total_count or total_count == 0:
-                break
-            
-            streak += 1
-            current_date -= timedelta(days=1)
-        
-        return streak
+        return StreakEngine.streak_on_date(user, target_date)
+    
+    @staticmethod
+    def cycles_for_dates(user_ids, dates, fallback=None):
+        """
+        Ciclo al que pertenece cada día: el último ciclo del usuario iniciado
+        en esa fecha o antes. Los días anteriores al primer ciclo van al ciclo
+        de fallback ({user_id: cycle_id}, normalmente el ciclo actual).
+        Devuelve {(user_id, fecha): cycle_id} con una sola consulta.
+        Regla común del registro en vivo y del recálculo por lotes.
+        """
+        from cycles.models import UserCycle
+
+        fallback = fallback or {}
+        starts = defaultdict(list)
+        cycle_ids = defaultdict(list)
+        for user_id, cycle_id, start_date in UserCycle.objects.filter(
+            user_id__in=user_ids
+        ).order_by('user_id', 'start_date', 'cycle_number').values_list('user_id', 'id', 'start_date'):
+            starts[user_id].append(start_date.date())
+            cycle_ids[user_id].append(cycle_id)
+
+        result = {}
+        for user_id in user_ids:
+            for target_date in dates:
+                position = bisect_right(starts[user_id], target_date)
+                result[(user_id, target_date)] = (
+                    cycle_ids[user_id][position - 1] if position else fallback.get(user_id)
+                )
+        return result
     
     @staticmethod
     def update_daily_points(user, target_date=None):
@@ -177,30 +196,129 @@ class GamificationService:
                 return None
             
             user_level.current_cycle = active_cycle
-            user_level.save()
+            user_level.save(update_fields=['current_cycle', 'updated_at'])
         
         # Calcular puntos del día
         points_data = GamificationService.calculate_daily_points(user, target_date)
         
-        # ARREGLADO: Crear o actualizar registro de puntos diarios
-        daily_points, created = DailyPoints.objects.update_or_create(
-            user=user,
-            date=target_date,
-            defaults={
-                'cycle': user_level.current_cycle,
-                'habit_points': points_data['habit_points'],
-                'bonus_completion': points_data['bonus_completion'],
-                'bonus_streak': points_data['bonus_streak'],
-                'bonus_promoted_habit': points_data['bonus_promoted'],
-                'total_points': points_data['total_points'],
-                'habits_completed': points_data['habits_completed'],
-                'habits_total': points_data['habits_total'],
-                'streak_on_date': points_data['current_streak']
-            }
-        )
+        # El día va al ciclo que lo contiene (misma regla que el recálculo por lotes)
+        cycle_id = GamificationService.cycles_for_dates(
+            [user.id], [target_date], {user.id: user_level.current_cycle_id}
+        )[(user.id, target_date)]
+        
+        with transaction.atomic():
+            # Serializa las escrituras del usuario (saldo del libro de puntos)
+            UserLevel.objects.select_for_update().filter(pk=user_level.pk).values_list('pk').first()
+            
+            # Puntuación anterior del día para aplicar solo la diferencia
+            previous = DailyPoints.objects.select_for_update().filter(
+                user=user,
+                date=target_date
+            ).values('total_points', 'cycle_id', *DAILY_POINTS_COMPONENT_FIELDS).first()
+            
+            # ARREGLADO: Crear o actualizar registro de puntos diarios
+            daily_points = upsert(
+                DailyPoints,
+                {'user': user, 'date': target_date},
+                {
+                    'cycle_id': cycle_id,
+                    'habit_points': points_data['habit_points'],
+                    'bonus_completion': points_data['bonus_completion'],
+                    'bonus_streak': points_data['bonus_streak'],
+                    'bonus_promoted_habit': points_data['bonus_promoted'],
+                    'total_points': points_data['total_points'],
+                    'habits_completed': points_data['habits_completed'],
+                    'habits_total': points_data['habits_total'],
+                    'streak_on_date': points_data['current_streak']
+                }
+            )
+            
+            GamificationService._apply_points_delta(user_level, previous, daily_points)
+            
+            # Movimientos del libro de puntos (solo componentes que cambiaron)
+            PointsLedgerService.append(PointsLedgerService.diff_entries(
+                user.id,
+                target_date,
+                (previous['cycle_id'], components_from_daily_points(previous)) if previous else None,
+                (daily_points.cycle_id, components_from_score(points_data))
+            ))
         
         return daily_points
     
+    @staticmethod
+    def _apply_points_delta(user_level, previous, daily_points):
+        """
+        Aplica a los contadores de UserLevel la diferencia entre el total nuevo
+        del día y el anterior, de forma atómica con expresiones F.
+        NUEVO: Evita re-agregar todos los DailyPoints del ciclo en cada registro
+        """
+        old_total = previous['total_points'] if previous else 0
+        total_delta = daily_points.total_points - old_total
+        
+        # Los puntos del ciclo actual solo cuentan los días asignados a él
+        current_cycle_id = user_level.current_cycle_id
+        old_in_cycle = old_total if previous and previous['cycle_id'] == current_cycle_id else 0
+        new_in_cycle = daily_points.total_points if daily_points.cycle_id == current_cycle_id else 0
+        cycle_delta = new_in_cycle - old_in_cycle
+        
+        if total_delta == 0 and cycle_delta == 0:
+            return
+        
+        UserLevel.objects.filter(pk=user_level.pk).update(
+            current_cycle_points=F('current_cycle_points') + cycle_delta,
+            total_points_all_time=F('total_points_all_time') + total_delta,
+            updated_at=timezone.now()
+        )
+    
+    @staticmethod
+    def reconcile_points(user_ids=None, dry_run=False, batch_size=500):
+        """
+        Compara los contadores de UserLevel con la suma real de DailyPoints y
+        corrige las desviaciones en bloque.
+        Devuelve la lista de correcciones aplicadas (o detectadas si dry_run).
+        """
+        cycle_points = DailyPoints.objects.filter(
+            user=OuterRef('user'),
+            cycle=OuterRef('current_cycle')
+        ).order_by().values('user').annotate(total=Sum('total_points')).values('total')
+        
+        all_time_points = DailyPoints.objects.filter(
+            user=OuterRef('user')
+        ).order_by().values('user').annotate(total=Sum('total_points')).values('total')
+        
+        levels = UserLevel.objects.annotate(
+            expected_cycle_points=Coalesce(Subquery(cycle_points), 0),
+            expected_total_points=Coalesce(Subquery(all_time_points), 0)
+        ).exclude(
+            current_cycle_points=F('expected_cycle_points'),
+            total_points_all_time=F('expected_total_points')
+        ).only('id', 'user_id', 'current_cycle_points', 'total_points_all_time')
+        
+        if user_ids is not None:
+            levels = levels.filter(user_id__in=user_ids)
+        
+        drifts = []
+        to_update = []
+        for user_level in levels.order_by('id').iterator(chunk_size=batch_size):
+            drifts.append({
+                'user_id': user_level.user_id,
+                'cycle_points': (user_level.current_cycle_points, user_level.expected_cycle_points),
+                'total_points': (user_level.total_points_all_time, user_level.expected_total_points),
+            })
+            user_level.current_cycle_points = user_level.expected_cycle_points
+            user_level.total_points_all_time = user_level.expected_total_points
+            to_update.append(user_level)
+        
+        if to_update and not dry_run:
+            UserLevel.objects.bulk_update(
+                to_update,
+                ['current_cycle_points', 'total_points_all_time'],
+                batch_size=batch_size
+            )
+            DashboardCache.invalidate(*[drift['user_id'] for drift in drifts])
+        
+        return drifts
+    
     @staticmethod
     def update_user_level_progress(user):
         """
@@ -219,38 +337,21 @@ class GamificationService:
             
             if active_cycle:
                 user_level.current_cycle = active_cycle
-                user_level.save()
+                user_level.save(update_fields=['current_cycle', 'updated_at'])
         
         # Guardar nivel anterior para detectar cambios
         previous_level = user_level.current_level
         
-        # ARREGLADO: Calcular puntos del ciclo actual correctamente
         if user_level.current_cycle:
-            # Sumar TODOS los puntos de TODOS los días del ciclo
-            current_cycle_points = DailyPoints.objects.filter(
-                user=user,
-                cycle=user_level.current_cycle
-            ).aggregate(
-                total=models.Sum('total_points')
-            )['total'] or 0
-            
-            # Actualizar puntos del ciclo
-            user_level.current_cycle_points = current_cycle_points
+            # Los puntos del ciclo se mantienen incrementalmente en update_daily_points
+            current_cycle_points = user_level.current_cycle_points
             
             # Verificar si puede subir de nivel
-            cycle_number = user_level.current_cycle.cycle_number
-            threshold_data = GamificationService.LEVEL_THRESHOLDS.get(cycle_number)
-            
-            if threshold_data and current_cycle_points >= threshold_data['points']:
-                # Solo subir si el nuevo nivel es superior al actual
-                new_level = threshold_data['level']
-                level_order = ['NOVATO', 'BRONCE', 'PLATA', 'ORO', 'PLATINO', 'MAESTRO']
-                
-                current_index = level_order.index(user_level.current_level)
-                new_index = level_order.index(new_level)
-                
-                if new_index > current_index:
-                    user_level.current_level = new_level
+            user_level.current_level = GamificationService.level_for_points(
+                user_level.current_level,
+                user_level.current_cycle.cycle_number,
+                current_cycle_points
+            )
         
         # Actualizar racha actual
         today = timezone.now().date()
@@ -261,153 +362,123 @@ class GamificationService:
         if user_level.current_streak > user_level.longest_streak:
             user_level.longest_streak = user_level.current_streak
         
-        user_level.save()
+        # No se guardan los contadores de puntos: se actualizan con expresiones F
+        user_level.save(update_fields=[
+            'current_level', 'current_streak', 'longest_streak',
+            'last_activity_date', 'updated_at'
+        ])
         
         # Devolver si hubo cambio de nivel
         level_changed = previous_level != user_level.current_level
         
         return user_level, level_changed
     
+    @staticmethod
+    def level_for_points(current_level, cycle_number, cycle_points):
+        """
+        Nivel resultante al acumular cycle_points en el ciclo cycle_number.
+        El nivel nunca baja: solo sube si el umbral del ciclo da un nivel superior.
+        """
+        threshold_data = GamificationService.LEVEL_THRESHOLDS.get(cycle_number)
+        
+        if threshold_data and cycle_points >= threshold_data['points']:
+            new_level = threshold_data['level']
+            level_order = ['NOVATO', 'BRONCE', 'PLATA', 'ORO', 'PLATINO', 'MAESTRO']
+            
+            if level_order.index(new_level) > level_order.index(current_level):
+                return new_level
+        
+        return current_level
+    
     @staticmethod
     def check_new_medals(user):
         """
-        Verifica si el usuario ha desbloqueado nuevas medallas
-        ARREGLADO: Verifica correctamente los criterios de medallas
+        Verifica si el usuario ha desbloqueado nuevas medallas.
+        Todas las reglas se evalúan en una sola pasada contra un snapshot de
+        estadísticas del usuario y las medallas se otorgan con un único bulk_create.
         """
         user_level = GamificationService.get_or_create_user_level(user)
         
         if not user_level.current_cycle:
             return []
         
-        # Obtener medallas ya ganadas por el usuario
-        earned_medal_ids = UserMedal.objects.filter(user=user).values_list('medal_id', flat=True)
-        
-        # Buscar medallas disponibles que cumplan criterios
-        available_medals = Medal.objects.filter(
-            is_active=True,
-            required_points__lte=user_level.current_cycle_points,
-            required_cycle_number__lte=user_level.current_cycle.cycle_number
-        ).exclude(
-            id__in=earned_medal_ids
+        rules = MedalRuleEngine.rules()
+        earned_medal_ids = set(
+            UserMedal.objects.filter(user=user).values_list('medal_id', flat=True)
         )
+        pending_rules = [rule for rule in rules if rule.medal_id not in earned_medal_ids]
+        if not pending_rules:
+            return []
         
-        # Filtrar por nivel actual o inferior
-        level_order = ['NOVATO', 'BRONCE', 'PLATA', 'ORO', 'PLATINO', 'MAESTRO']
-        current_level_index = level_order.index(user_level.current_level)
-        
-        eligible_levels = level_order[:current_level_index + 1]
-        available_medals = available_medals.filter(required_level__in=eligible_levels)
+        stats = GamificationService.medal_stats_snapshot(
+            user,
+            user_level,
+            with_activity=MedalRuleEngine.needs_activity_stats(pending_rules)
+        )
+        matched = MedalRuleEngine.eligible(pending_rules, stats, earned_medal_ids)
+        if not matched:
+            return []
         
-        new_medals = []
-        for medal in available_medals:
-            # Verificar criterios especiales según el nombre de la medalla
-            if GamificationService._check_special_medal_criteria(user, medal):
-                user_medal = UserMedal.objects.create(
+        new_medals = [
+            UserMedal(
+                user=user,
+                medal=MedalRuleEngine.medal(rule.medal_id),
+                cycle_earned=user_level.current_cycle,
+                points_when_earned=user_level.current_cycle_points,
+                level_when_earned=user_level.current_level
+            )
+            for rule in matched
+        ]
+        DashboardCache.invalidate(user.id)
+        try:
+            with transaction.atomic():
+                return UserMedal.objects.bulk_create(new_medals)
+        except IntegrityError:
+            # Otra petición otorgó alguna de estas medallas en paralelo
+            awarded = []
+            for user_medal in new_medals:
+                awarded_medal, created = UserMedal.objects.get_or_create(
                     user=user,
-                    medal=medal,
-                    cycle_earned=user_level.current_cycle,
-                    points_when_earned=user_level.current_cycle_points,
-                    level_when_earned=user_level.current_level
+                    medal=user_medal.medal,
+                    defaults={
+                        'cycle_earned': user_medal.cycle_earned,
+                        'points_when_earned': user_medal.points_when_earned,
+                        'level_when_earned': user_medal.level_when_earned,
+                    }
                 )
-                new_medals.append(user_medal)
-        
-        return new_medals
+                if created:
+                    awarded.append(awarded_medal)
+            return awarded
     
     @staticmethod
-    def _check_special_medal_criteria(user, medal):
+    def medal_stats_snapshot(user, user_level, with_activity=True):
         """
-        Verifica criterios especiales para medallas específicas
+        Estadísticas del usuario que necesitan las reglas de medallas.
+        Con with_activity=False solo se usan los contadores de UserLevel
+        (sin leer el bitmap de cumplimiento).
         """
-        medal_name = medal.name.lower()
-        
-        # Medallas basadas en racha
-        if 'racha' in medal_name or 'consecutivos' in medal_name:
-            current_streak = GamificationService.calculate_streak_on_date(user, timezone.now().date())
-            
-            if '3 días' in medal.description:
-                return current_streak >= 3
-            elif '10 días' in medal.description:
-                return current_streak >= 10
-            elif '15 días' in medal.description:
-                return current_streak >= 15
-            elif '21 días' in medal.description:
-                return current_streak >= 21
-        
-        # Medallas basadas en semanas completas
-        if 'semana' in medal_name.lower() or 'semana' in medal.description.lower():
-            return GamificationService._check_week_completion(user)
-        
-        # Medallas basadas en días perfectos
-        if 'perfect' in medal_name or 'perfecta' in medal.description.lower():
-            perfect_days = GamificationService._count_perfect_days(user)
-            
-            if '15 días' in medal.description:
-                return perfect_days >= 15
+        stats = {
+            'cycle_points': user_level.current_cycle_points,
+            'cycle_number': user_level.current_cycle.cycle_number,
+            'level_index': LEVEL_ORDER.index(user_level.current_level),
+            'current_streak': 0,
+            'week_completed': False,
+            'perfect_days': 0,
+        }
+        if not with_activity:
+            return stats
         
-        # Por defecto, solo verificar puntos y nivel (ya filtrado en la consulta principal)
-        return True
-    
-    @staticmethod
-    def _check_week_completion(user):
-        """
-        Verifica si el usuario completó una semana completa consecutiva
-        """
         today = timezone.now().date()
-        
-        # Verificar los últimos 7 días
-        for i in range(7):
-            check_date = today - timedelta(days=i)
-            
-            daily_logs = HabitLog.objects.filter(
-                tracker__user=user,
-                date=check_date
-            )
-            
-            if not daily_logs.exists():
-                return False
-            
-            # Verificar que todos los hábitos estén completados (nivel >= 2)
-            completed_count = daily_logs.filter(completion_level__gte=2).count()
-            total_count = daily_logs.count()
-            
-            if completed_count < total_count:
-                return False
-        
-        return True
-    
-    @staticmethod
-    def _count_perfect_days(user):
-        """
-        Cuenta los días donde el usuario obtuvo puntuación perfecta
-        """
-        if not hasattr(user, 'userlevel') or not user.userlevel.current_cycle:
-            return 0
-        
-        # Un día perfecto es cuando todos los hábitos están en nivel 3
-        perfect_days = 0
-        
-        # Obtener todos los días con registros en el ciclo actual
-        dates_with_logs = HabitLog.objects.filter(
-            tracker__user=user,
-            date__gte=user.userlevel.current_cycle.start_date,
-            date__lte=timezone.now().date()
-        ).values_list('date', flat=True).distinct()
-        
-        for log_date in dates_with_logs:
-            daily_logs = HabitLog.objects.filter(
-                tracker__user=user,
-                date=log_date
-            )
-            
-            # Verificar que todos estén en nivel 3
-            if daily_logs.exists():
-                level_3_count = daily_logs.filter(completion_level=3).count()
-                total_count = daily_logs.count()
-                
-                if level_3_count == total_count and total_count > 0:
-                    perfect_days += 1
-        
-        return perfect_days
+        bits = StreakEngine.completion_bits(user)
+        current_streak = bits.streak_ending(today)
+        stats['current_streak'] = current_streak
+        # Semana completa: los últimos 7 días con todos los hábitos completados
+        stats['week_completed'] = current_streak >= 7
+        stats['perfect_days'] = bits.perfect_days_between(
+            user_level.current_cycle.start_date.date(),
+            today
+        )
+        return stats
     
     @staticmethod
     def process_daily_gamification(user, target_date=None):
@@ -418,6 +489,16 @@ class GamificationService:
         if target_date is None:
             target_date = timezone.now().date()
         
+        # Las rachas se consultan una sola vez por pasada (puntos, nivel y medallas)
+        try:
+            with streak_memo():
+                return GamificationService._process_daily_gamification(user, target_date)
+        finally:
+            DashboardCache.invalidate(user.id)
+    
+    @staticmethod
+    def _process_daily_gamification(user, target_date):
+        """Pasos del proceso diario; se ejecuta dentro de streak_memo()"""
         # 1. Actualizar puntos diarios
         daily_points = GamificationService.update_daily_points(user, target_date)
         
@@ -432,10 +513,15 @@ class GamificationService:
                 'level_changed': False
             }
         
-        # 2. Actualizar nivel y progreso
+        # 2. Registro atrasado: los días siguientes dependen de la racha de este
+        if target_date < timezone.now().date():
+            from .batch import GamificationBatchService
+            GamificationBatchService.recompute_following_days(user, target_date)
+        
+        # 3. Actualizar nivel y progreso
         user_level, level_changed = GamificationService.update_user_level_progress(user)
         
-        # 3. Verificar nuevas medallas (especialmente importante si cambió de nivel)
+        # 4. Verificar nuevas medallas (especialmente importante si cambió de nivel)
         new_medals = GamificationService.check_new_medals(user)
         
         return {
@@ -470,6 +556,7 @@ class GamificationService:
                 user_level.current_streak = 0
         
         user_level.save()
+        DashboardCache.invalidate(user.id)
         
         print(f"✅ Gamificación reseteada para {user.username} - Ciclo {new_cycle.cycle_number}")
         return user_level
@@ -522,3 +609,92 @@ class GamificationService:
         print(f"   - Medallas ganadas: {medals_count}")
         
         return summary
+    
+    @staticmethod
+    def create_cycle_summaries(completed_cycles):
+        """
+        Versión por lotes de create_cycle_summary para renovaciones de cohortes:
+        medallas y días agregados por ciclo en una consulta cada uno y un único
+        upsert de los resúmenes. Sin prints por usuario.
+        """
+        from .models import CycleGamificationSummary
+        
+        completed_cycles = list(completed_cycles)
+        if not completed_cycles:
+            return []
+        cycle_ids = [cycle.id for cycle in completed_cycles]
+        
+        levels = UserLevel.objects.in_bulk([cycle.user_id for cycle in completed_cycles], field_name='user_id')
+        medals = dict(
+            UserMedal.objects.filter(cycle_earned_id__in=cycle_ids).values('cycle_earned_id').annotate(
+                count=models.Count('id')
+            ).values_list('cycle_earned_id', 'count')
+        )
+        days = {
+            row['cycle_id']: row
+            for row in DailyPoints.objects.filter(cycle_id__in=cycle_ids).values('cycle_id').annotate(
+                active=models.Count('id'),
+                perfect=models.Count('id', filter=Q(habits_completed=5, habits_total=5))
+            )
+        }
+        
+        summaries = []
+        for cycle in completed_cycles:
+            user_level = levels.get(cycle.user_id)
+            cycle_days = days.get(cycle.id, {})
+            summaries.append(CycleGamificationSummary(
+                user_id=cycle.user_id,
+                cycle=cycle,
+                total_points_earned=user_level.current_cycle_points if user_level else 0,
+                final_level=user_level.current_level if user_level else 'NOVATO',
+                medals_earned_count=medals.get(cycle.id, 0),
+                best_streak=user_level.longest_streak if user_level else 0,
+                active_days=cycle_days.get('active', 0),
+                perfect_days=cycle_days.get('perfect', 0)
+            ))
+        
+        return CycleGamificationSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['cycle'],
+            update_fields=[
+                'total_points_earned', 'final_level', 'medals_earned_count',
+                'best_streak', 'active_days', 'perfect_days'
+            ]
+        )
+    
+    @staticmethod
+    def reset_for_new_cycles(new_cycles):
+        """
+        Versión por lotes de reset_for_new_cycle: un bulk_update de los niveles
+        existentes y un bulk_create de los que faltan.
+        """
+        new_cycles = list(new_cycles)
+        if not new_cycles:
+            return
+        
+        now = timezone.now()
+        today = now.date()
+        levels = UserLevel.objects.in_bulk([cycle.user_id for cycle in new_cycles], field_name='user_id')
+        
+        to_update = []
+        to_create = []
+        for cycle in new_cycles:
+            user_level = levels.get(cycle.user_id)
+            if user_level is None:
+                to_create.append(UserLevel(user_id=cycle.user_id, current_level='NOVATO', current_cycle=cycle))
+                continue
+            
+            user_level.current_cycle = cycle
+            user_level.current_cycle_points = 0
+            user_level.updated_at = now
+            # Misma regla que reset_for_new_cycle: la racha solo se pierde sin actividad reciente
+            if user_level.last_activity_date and (today - user_level.last_activity_date).days > 1:
+                user_level.current_streak = 0
+            to_update.append(user_level)
+        
+        if to_update:
+            UserLevel.objects.bulk_update(to_update, ['current_cycle', 'current_cycle_points', 'current_streak', 'updated_at'])
+        if to_create:
+            UserLevel.objects.bulk_create(to_create, ignore_conflicts=True)
+        DashboardCache.invalidate(*(cycle.user_id for cycle in new_cycles))
@@ -0,0 +1,270 @@
+# gamification/streaks.py
+"""
+Motor de rachas de gamificación.
+
+El cumplimiento diario de cada usuario se guarda en un mapa de bits compacto
+(DailyCompletionBitmap): un bit "todos los hábitos >= 2" y otro "todos los
+hábitos = 3" por día. Rachas, semana completa y días perfectos se calculan con
+operaciones de bits sobre unos pocos bytes en lugar de recorrer HabitLog.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from habits.models import HabitLog
+
+_local = threading.local()
+
+
+@contextmanager
+def streak_memo():
+    """
+    Activa una memoria por petición para el motor de rachas.
+
+    Mientras el contexto está activo, el bitmap de cada usuario se lee una
+    sola vez; las llamadas repetidas (puntos del día, progreso de nivel,
+    medallas) no vuelven a tocar la base de datos.
+    Los contextos anidados reutilizan la memoria del contexto exterior.
+    """
+    is_outer = getattr(_local, 'bits_by_user', None) is None
+    if is_outer:
+        _local.bits_by_user = {}
+    try:
+        yield
+    finally:
+        if is_outer:
+            _local.bits_by_user = None
+
+
+def prime_memo(user_id, bits):
+    """
+    Precarga en la memoria activa el CompletionBits de un usuario ya obtenido
+    por otra vía (p. ej. una consulta por lotes de varios usuarios).
+    """
+    bits_by_user = getattr(_local, 'bits_by_user', None)
+    if bits_by_user is not None:
+        bits_by_user[user_id] = bits
+
+
+def forget_memo(user_id):
+    """Descarta de la memoria activa los datos de un usuario modificado"""
+    bits_by_user = getattr(_local, 'bits_by_user', None)
+    if bits_by_user is not None:
+        bits_by_user.pop(user_id, None)
+
+
+class CompletionBits:
+    """
+    Días completos y perfectos de un usuario como enteros de bits.
+    El bit i corresponde a origin + i días.
+    """
+    __slots__ = ('origin', 'complete', 'perfect')
+
+    def __init__(self, origin=None, complete=0, perfect=0):
+        self.origin = origin
+        self.complete = complete
+        self.perfect = perfect
+
+    @classmethod
+    def from_days(cls, days):
+        """Construye los bits desde {fecha: (total, completados, perfectos)}"""
+        bits = cls()
+        for log_date, (total, completed, perfect) in days.items():
+            bits.set_day(log_date, total > 0 and completed == total, total > 0 and perfect == total)
+        return bits
+
+    @classmethod
+    def from_bitmap(cls, bitmap):
+        return cls(
+            origin=bitmap.origin_date,
+            complete=int.from_bytes(bytes(bitmap.complete_bits), 'little'),
+            perfect=int.from_bytes(bytes(bitmap.perfect_bits), 'little'),
+        )
+
+    def to_bytes(self):
+        """(complete_bits, perfect_bits) serializados en little-endian"""
+        length = (max(self.complete.bit_length(), self.perfect.bit_length()) + 7) // 8
+        return self.complete.to_bytes(length, 'little'), self.perfect.to_bytes(length, 'little')
+
+    def set_day(self, day, is_complete, is_perfect):
+        if self.origin is None:
+            self.origin = day
+        elif day < self.origin:
+            # Desplazar para que el nuevo día sea el bit 0
+            shift = (self.origin - day).days
+            self.complete <<= shift
+            self.perfect <<= shift
+            self.origin = day
+
+        bit = 1 << (day - self.origin).days
+        self.complete = self.complete | bit if is_complete else self.complete & ~bit
+        self.perfect = self.perfect | bit if is_perfect else self.perfect & ~bit
+
+    def streak_ending(self, day):
+        """Longitud de la racha de días completos que termina en day (incluido)"""
+        if self.origin is None or day < self.origin:
+            return 0
+        offset = (day - self.origin).days
+        mask = (1 << (offset + 1)) - 1
+        gaps = ~self.complete & mask
+        if not gaps:
+            return offset + 1
+        # El hueco más reciente marca el inicio de la racha
+        return offset - (gaps.bit_length() - 1)
+
+    def complete_run_after(self, day):
+        """
+        Número de días completos consecutivos justo después de day.
+        Son los días cuya racha depende de day: al editar day hay que recalcularlos.
+        """
+        if self.origin is None:
+            return 0
+        offset = (day - self.origin).days + 1
+        if offset < 0:
+            # Días sin registrar entre day y el origen: la cadena se corta antes
+            return 0
+        following = self.complete >> offset
+        # Unos consecutivos desde el bit 0
+        return ((~following) & (following + 1)).bit_length() - 1
+
+    def perfect_days_between(self, start, end):
+        """Número de días perfectos entre start y end (incluidos)"""
+        if self.origin is None or end < self.origin or end < start:
+            return 0
+        low = max((start - self.origin).days, 0)
+        high = (end - self.origin).days
+        return ((self.perfect >> low) & ((1 << (high - low + 1)) - 1)).bit_count()
+
+
+class StreakEngine:
+    """
+    Cálculo de rachas sobre el bitmap de cumplimiento diario.
+    """
+
+    @staticmethod
+    def daily_completion_by_user(user_ids):
+        """
+        {user_id: {fecha: (total, completados_nivel_2_o_3, perfectos_nivel_3)}}
+        con una única consulta agrupada sobre HabitLog.
+        """
+        rows = HabitLog.objects.filter(
+            user_id__in=user_ids
+        ).order_by().values('user_id', 'date').annotate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(completion_level__gte=2)),
+            perfect=Count('id', filter=Q(completion_level=3))
+        ).values_list('user_id', 'date', 'total', 'completed', 'perfect')
+
+        days_by_user = defaultdict(dict)
+        for user_id, log_date, total, completed, perfect in rows:
+            days_by_user[user_id][log_date] = (total, completed, perfect)
+        return days_by_user
+
+    @staticmethod
+    def completion_bits(user):
+        """
+        CompletionBits del usuario leído del bitmap (una consulta), o
+        reconstruido desde HabitLog si todavía no existe.
+        """
+        bits_by_user = getattr(_local, 'bits_by_user', None)
+        if bits_by_user is not None and user.pk in bits_by_user:
+            return bits_by_user[user.pk]
+
+        from .models import DailyCompletionBitmap
+        bitmap = DailyCompletionBitmap.objects.filter(user_id=user.pk).first()
+        if bitmap is not None:
+            bits = CompletionBits.from_bitmap(bitmap)
+        else:
+            bits = CompletionBitmapService.rebuild([user.pk])[user.pk]
+
+        if bits_by_user is not None:
+            bits_by_user[user.pk] = bits
+        return bits
+
+    @staticmethod
+    def streak_on_date(user, target_date):
+        """Racha de días consecutivos completos hasta target_date (incluido)"""
+        return StreakEngine.completion_bits(user).streak_ending(target_date)
+
+
+class CompletionBitmapService:
+    """
+    Mantenimiento de DailyCompletionBitmap
+    """
+
+    @staticmethod
+    def refresh_days(user_id, dates, create=True):
+        """
+        Recalcula los bits de las fechas indicadas tras escribir o borrar HabitLog.
+        Con create=False no se crea el bitmap si el usuario todavía no tiene uno.
+        """
+        from .models import DailyCompletionBitmap
+
+        dates = set(dates)
+        days = {
+            log_date: (total, completed, perfect)
+            for log_date, total, completed, perfect in HabitLog.objects.filter(
+                user_id=user_id,
+                date__in=dates
+            ).order_by().values('date').annotate(
+                total=Count('id'),
+                completed=Count('id', filter=Q(completion_level__gte=2)),
+                perfect=Count('id', filter=Q(completion_level=3))
+            ).values_list('date', 'total', 'completed', 'perfect')
+        }
+
+        forget_memo(user_id)
+        with transaction.atomic():
+            bitmap = DailyCompletionBitmap.objects.select_for_update().filter(user_id=user_id).first()
+            if bitmap is None:
+                if create:
+                    CompletionBitmapService.rebuild([user_id])
+                return
+
+            bits = CompletionBits.from_bitmap(bitmap)
+            for day in dates:
+                total, completed, perfect = days.get(day, (0, 0, 0))
+                bits.set_day(day, total > 0 and completed == total, total > 0 and perfect == total)
+            CompletionBitmapService._assign(bitmap, bits)
+            bitmap.save(update_fields=['origin_date', 'complete_bits', 'perfect_bits', 'updated_at'])
+
+    @staticmethod
+    def _assign(bitmap, bits):
+        bitmap.origin_date = bits.origin
+        bitmap.complete_bits, bitmap.perfect_bits = bits.to_bytes()
+
+    @staticmethod
+    def store(bits_by_user):
+        """Guarda (insert o update) los bitmaps de varios usuarios en bloque"""
+        from .models import DailyCompletionBitmap
+
+        bitmaps = []
+        for user_id, bits in bits_by_user.items():
+            bitmap = DailyCompletionBitmap(user_id=user_id)
+            CompletionBitmapService._assign(bitmap, bits)
+            bitmaps.append(bitmap)
+
+        DailyCompletionBitmap.objects.bulk_create(
+            bitmaps,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['origin_date', 'complete_bits', 'perfect_bits', 'updated_at'],
+            batch_size=1000
+        )
+
+    @staticmethod
+    def rebuild(user_ids):
+        """
+        Reconstruye desde HabitLog los bitmaps de varios usuarios (una consulta
+        agrupada y un upsert en bloque). Devuelve {user_id: CompletionBits}.
+        """
+        days_by_user = StreakEngine.daily_completion_by_user(user_ids)
+        bits_by_user = {
+            user_id: CompletionBits.from_days(days_by_user.get(user_id, {}))
+            for user_id in user_ids
+        }
+        CompletionBitmapService.store(bits_by_user)
+        return bits_by_user
@@ -0,0 +1,109 @@
+# gamification/tests/test_batch.py
+import pytest
+from io import StringIO
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+from gamification.batch import GamificationBatchService
+from gamification.models import UserLevel, DailyPoints
+from gamification.services import GamificationService
+from cycles.models import UserCycle
+from habits.models import HabitTracker, HabitLog
+from questionnaires.models import HabitQuestion
+
+
+@pytest.mark.django_db
+class TestGamificationBatch:
+    """Tests para el recálculo de gamificación por lotes"""
+
+    @pytest.fixture
+    def users_with_activity(self):
+        """Dos usuarios con ciclo activo y 3 días de actividad completa"""
+        habits = [
+            HabitQuestion.objects.create(habit_type=f'HABIT_{i}', text=f'Hábito {i}')
+            for i in range(3)
+        ]
+        today = timezone.now().date()
+        users = []
+        for username in ['batch1', 'batch2']:
+            user = User.objects.create_user(username=username)
+            UserCycle.objects.create(
+                user=user,
+                cycle_number=1,
+                start_date=timezone.now() - timedelta(days=5),
+                end_date=timezone.now() + timedelta(days=25),
+                status='ACTIVE'
+            )
+            for i, habit in enumerate(habits):
+                tracker = HabitTracker.objects.create(user=user, habit=habit, is_promoted=(i == 0))
+                for days_ago in range(3):
+                    HabitLog.objects.create(
+                        tracker=tracker,
+                        date=today - timedelta(days=days_ago),
+                        completion_level=3
+                    )
+            users.append(user)
+        return users, today
+
+    def test_recompute_matches_online_processing(self, users_with_activity):
+        """Test el recálculo por lotes produce los mismos puntos que el proceso diario"""
+        (user1, user2), today = users_with_activity
+        dates = [today - timedelta(days=2), today - timedelta(days=1), today]
+
+        stats = GamificationBatchService.recompute_users([user1.id, user2.id], dates)
+        assert stats['users'] == 2
+        assert stats['daily_points'] == 6
+
+        batch_totals = {
+            dp.date: dp.total_points for dp in DailyPoints.objects.filter(user=user1)
+        }
+        level = UserLevel.objects.get(user=user1)
+        assert level.current_streak == 3
+        assert level.current_cycle_points == sum(batch_totals.values())
+        assert level.total_points_all_time == sum(batch_totals.values())
+
+        # El proceso en línea recalcula los mismos valores
+        for log_date in dates:
+            online = GamificationService.calculate_daily_points(user1, log_date)
+            assert online['total_points'] == batch_totals[log_date]
+
+    def test_recompute_dry_run_writes_nothing(self, users_with_activity):
+        """Test dry-run calcula sin escribir"""
+        (user1, user2), today = users_with_activity
+
+        stats = GamificationBatchService.recompute_users([user1.id, user2.id], [today], dry_run=True)
+
+        assert stats['daily_points'] == 2
+        assert not DailyPoints.objects.exists()
+        assert not UserLevel.objects.exists()
+
+    def test_recompute_command(self, users_with_activity):
+        """Test comando recompute_gamification con rango de fechas"""
+        (user1, user2), today = users_with_activity
+        out = StringIO()
+
+        call_command(
+            'recompute_gamification',
+            '--since', (today - timedelta(days=2)).isoformat(),
+            '--date', today.isoformat(),
+            '--chunk-size', '1',
+            stdout=out
+        )
+
+        assert DailyPoints.objects.count() == 6
+        assert 'usuarios/s' in out.getvalue()
+
+    def test_backdated_processing_checks_medals_once(self, users_with_activity):
+        """Test un registro atrasado recalcula los días siguientes y verifica medallas una sola vez"""
+        (user1, _), today = users_with_activity
+        GamificationService.process_daily_gamification(user1, today)
+
+        with patch.object(
+            GamificationService, 'check_new_medals', wraps=GamificationService.check_new_medals
+        ) as check_new_medals:
+            GamificationService.process_daily_gamification(user1, today - timedelta(days=2))
+
+        assert check_new_medals.call_count == 1
+        assert DailyPoints.objects.filter(user=user1).count() == 3
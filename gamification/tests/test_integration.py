@@ -47,7 +47,9 @@ class TestGamificationIntegration:
             description='3 días consecutivos',
             required_points=100,
             required_level='NOVATO',
-            required_cycle_number=1
+            required_cycle_number=1,
+            criterion_type='STREAK',
+            criterion_threshold=3
         )
         medals.append(streak_medal)
         
@@ -167,6 +169,7 @@ class TestGamificationIntegration:
                 date=points_date,
                 total_points=1700  # Suficiente para subir
             )
+            GamificationService.reconcile_points(user_ids=[user.id])
             
             # Actualizar progreso
             level, changed = GamificationService.update_user_level_progress(user)
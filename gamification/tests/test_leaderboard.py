@@ -0,0 +1,99 @@
+# gamification/tests/test_leaderboard.py
+import pytest
+from io import StringIO
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from gamification.leaderboard import LeaderboardService, public_alias
+from gamification.models import UserLevel, LeaderboardEntry, CycleGamificationSummary
+from cycles.models import UserCycle
+
+
+@pytest.mark.django_db
+class TestLeaderboard:
+    """Tests para la clasificación por ciclo"""
+
+    @pytest.fixture
+    def ranked_users(self):
+        """Cuatro usuarios en el ciclo 1 (con empate) y uno en el ciclo 2"""
+        users = {}
+        for username, cycle_number, points in [
+            ('ana', 1, 900), ('bea', 1, 500), ('carla', 1, 500), ('dani', 1, 100), ('eva', 2, 50)
+        ]:
+            user = User.objects.create_user(username=username)
+            cycle = UserCycle.objects.create(
+                user=user,
+                cycle_number=cycle_number,
+                start_date=timezone.now(),
+                end_date=timezone.now() + timedelta(days=28),
+                status='ACTIVE'
+            )
+            UserLevel.objects.create(
+                user=user,
+                current_cycle=cycle,
+                current_level='NOVATO',
+                current_cycle_points=points
+            )
+            users[username] = user
+        return users
+
+    def test_refresh_ranks_per_cycle_number(self, ranked_users):
+        """Test posiciones y percentiles por número de ciclo, con empates"""
+        assert LeaderboardService.refresh() == 5
+
+        entries = {e.user.username: e for e in LeaderboardEntry.objects.select_related('user')}
+        assert [entries[name].rank for name in ('ana', 'bea', 'carla', 'dani')] == [1, 2, 2, 4]
+        assert entries['ana'].percentile == 100.0
+        assert entries['dani'].percentile == 0.0
+        assert (entries['eva'].cycle_number, entries['eva'].rank) == (2, 1)
+
+        # Un usuario sin ciclo actual desaparece en el siguiente refresh
+        UserLevel.objects.filter(user=ranked_users['dani']).update(current_cycle=None)
+        LeaderboardService.refresh()
+        assert not LeaderboardEntry.objects.filter(user=ranked_users['dani']).exists()
+
+        # Las cuentas desactivadas tampoco se clasifican
+        User.objects.filter(pk=ranked_users['ana'].pk).update(is_active=False, username='deleted_user_1')
+        LeaderboardService.refresh()
+        assert not LeaderboardEntry.objects.filter(user=ranked_users['ana']).exists()
+        assert LeaderboardEntry.objects.get(user=ranked_users['bea']).rank == 1
+
+    def test_refresh_fills_cycle_ranking(self, ranked_users):
+        """Test el refresh rellena cycle_ranking de los resúmenes de ciclo"""
+        for username, points in [('ana', 300), ('bea', 700)]:
+            user = ranked_users[username]
+            CycleGamificationSummary.objects.create(
+                user=user,
+                cycle=UserCycle.objects.get(user=user),
+                total_points_earned=points,
+                final_level='NOVATO'
+            )
+
+        call_command('refresh_leaderboard', stdout=StringIO())
+
+        rankings = dict(CycleGamificationSummary.objects.values_list('user__username', 'cycle_ranking'))
+        assert rankings == {'bea': 1, 'ana': 2}
+
+    def test_leaderboard_view(self, ranked_users, django_assert_max_num_queries):
+        """Test la API devuelve el top y la posición del usuario sin recalcular"""
+        LeaderboardService.refresh()
+        user = ranked_users['dani']
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+
+        # Token, entrada del usuario, top-N y total del ciclo
+        with django_assert_max_num_queries(5):
+            response = client.get(reverse('gamification-leaderboard'), {'limit': 2})
+
+        assert response.status_code == 200
+        assert response.data['cycle_number'] == 1
+        assert response.data['total_users'] == 4
+        assert [row['alias'] for row in response.data['top']] == [
+            public_alias(ranked_users['ana'].id), public_alias(ranked_users['bea'].id)
+        ]
+        assert all('username' not in row and 'ana' not in row['alias'] for row in response.data['top'])
+        assert response.data['me'] == {'rank': 4, 'percentile': 0.0, 'points': 100, 'level': 'NOVATO'}
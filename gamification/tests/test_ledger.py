@@ -0,0 +1,133 @@
+# gamification/tests/test_ledger.py
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from django.db.models import Sum
+from django.utils import timezone
+from datetime import timedelta
+from cycles.models import UserCycle
+from gamification.batch import GamificationBatchService
+from gamification.ledger import PointsLedgerService
+from gamification.models import PointsLedger, DailyPoints
+from gamification.services import GamificationService
+from habits.models import HabitTracker, HabitLog
+from questionnaires.models import HabitQuestion
+
+
+@pytest.mark.django_db
+class TestPointsLedger:
+    """Tests para el libro de puntos"""
+
+    @pytest.fixture
+    def user_with_logs(self, user_with_gamification):
+        """Usuario con dos hábitos registrados hoy (uno promocionado)"""
+        user, cycle, level = user_with_gamification
+        today = timezone.now().date()
+        logs = []
+        for i in range(2):
+            tracker = HabitTracker.objects.create(
+                user=user,
+                habit=HabitQuestion.objects.create(habit_type=f'HABIT_{i}', text=f'Hábito {i}'),
+                is_promoted=(i == 0)
+            )
+            logs.append(HabitLog.objects.create(tracker=tracker, date=today, completion_level=3))
+        return user, level, logs, today
+
+    def test_update_daily_points_appends_deltas(self, user_with_logs):
+        """Test cada recálculo anota solo las variaciones y el saldo coincide con UserLevel"""
+        user, level, logs, today = user_with_logs
+
+        daily = GamificationService.update_daily_points(user, today)
+        first_entries = PointsLedger.objects.filter(user=user).count()
+        assert {'HABIT', 'PROMOTED', 'COMPLETION'} <= {e.component for e in PointsLedger.objects.filter(user=user)}
+
+        # Recalcular sin cambios no añade movimientos
+        GamificationService.update_daily_points(user, today)
+        assert PointsLedger.objects.filter(user=user).count() == first_entries
+
+        logs[1].completion_level = 1
+        logs[1].save()
+        daily = GamificationService.update_daily_points(user, today)
+
+        history = list(PointsLedgerService.day_history(user, today))
+        assert len(history) > first_entries
+        assert sum(entry.delta for entry in history) == daily.total_points
+        level.refresh_from_db()
+        assert PointsLedgerService.balance_at(user) == level.total_points_all_time == daily.total_points
+
+    def test_replay_rebuilds_daily_points(self, user_with_logs):
+        """Test replay_points reconstruye DailyPoints y los contadores desde el libro"""
+        user, level, _, today = user_with_logs
+        expected = GamificationService.update_daily_points(user, today).total_points
+        DailyPoints.objects.filter(user=user).update(total_points=1, habit_points=1)
+
+        out = StringIO()
+        call_command('replay_points', '--username', user.username, stdout=out)
+
+        assert DailyPoints.objects.get(user=user, date=today).total_points == expected
+        level.refresh_from_db()
+        assert level.current_cycle_points == expected
+        assert '1 con cambios' in out.getvalue()
+
+    def test_rescore_after_config_change(self, user_with_logs, monkeypatch):
+        """Test --rescore aplica la configuración nueva y deja la diferencia en el libro"""
+        user, level, _, today = user_with_logs
+        before = GamificationService.update_daily_points(user, today).total_points
+
+        config = dict(GamificationService.POINTS_CONFIG, bonus_all_completed=100)
+        monkeypatch.setattr(GamificationService, 'POINTS_CONFIG', config)
+        call_command('replay_points', '--rescore', stdout=StringIO())
+
+        daily = DailyPoints.objects.get(user=user, date=today)
+        assert daily.bonus_completion == 100
+        rescored = PointsLedger.objects.filter(user=user, reason='RESCORE')
+        assert rescored.aggregate(total=Sum('delta'))['total'] == daily.total_points - before
+        level.refresh_from_db()
+        assert level.total_points_all_time == daily.total_points
+
+    def test_deleting_cycle_keeps_history(self, user_with_logs):
+        """Test borrar un ciclo conserva sus movimientos con el número de ciclo"""
+        user, level, _, today = user_with_logs
+        GamificationService.update_daily_points(user, today)
+        entries = PointsLedger.objects.filter(user=user).count()
+        assert set(PointsLedger.objects.filter(user=user).values_list('cycle_number', flat=True)) == {1}
+
+        level.current_cycle.delete()
+
+        assert PointsLedger.objects.filter(user=user, cycle__isnull=True, cycle_number=1).count() == entries
+        # Sin ciclo no hay nada que reproducir en DailyPoints
+        assert PointsLedgerService.replay(user_ids=[user.id], dry_run=True)['days'] == 0
+
+    def test_backdated_day_goes_to_containing_cycle(self, user_with_logs):
+        """Test el registro en vivo y el recálculo por lotes asignan el mismo ciclo a un día pasado"""
+        user, level, logs, today = user_with_logs
+        past = today - timedelta(days=10)
+        old_cycle = level.current_cycle
+        old_cycle.start_date = timezone.now() - timedelta(days=40)
+        old_cycle.status = 'COMPLETED'
+        old_cycle.save()
+        new_cycle = UserCycle.objects.create(
+            user=user,
+            cycle_number=2,
+            start_date=timezone.now() - timedelta(days=5),
+            end_date=timezone.now() + timedelta(days=25),
+            status='ACTIVE'
+        )
+        level.current_cycle = new_cycle
+        level.save()
+        HabitLog.objects.create(tracker=logs[0].tracker, date=past, completion_level=3)
+
+        daily = GamificationService.update_daily_points(user, past)
+        assert daily.cycle_id == old_cycle.id
+        level.refresh_from_db()
+        assert level.current_cycle_points == 0
+        assert level.total_points_all_time == daily.total_points
+        entries = PointsLedger.objects.filter(user=user).count()
+
+        GamificationBatchService.recompute_users([user.id], [past])
+
+        assert DailyPoints.objects.get(user=user, date=past).cycle_id == old_cycle.id
+        # Misma asignación: el lote no mueve el día de ciclo
+        assert PointsLedger.objects.filter(user=user).count() == entries
+        level.refresh_from_db()
+        assert level.current_cycle_points == 0
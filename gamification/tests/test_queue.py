@@ -0,0 +1,112 @@
+# gamification/tests/test_queue.py
+import pytest
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.urls import reverse
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from gamification.models import GamificationTask, DailyPoints
+from gamification.queue import GamificationQueue, retry_backoff, MAX_ATTEMPTS
+from gamification.services import GamificationService
+from habits.models import HabitTracker
+from questionnaires.models import HabitQuestion
+
+
+@pytest.mark.django_db
+class TestGamificationQueue:
+    """Tests para la gamificación diferida"""
+
+    def test_enqueue_coalesces_same_user_and_date(self, user_with_gamification):
+        """Test varias solicitudes del mismo día se agrupan en una tarea"""
+        user, _, _ = user_with_gamification
+        today = timezone.now().date()
+
+        for _ in range(3):
+            GamificationQueue.enqueue(user.id, today)
+
+        assert GamificationTask.objects.count() == 1
+        assert GamificationQueue.stats()['depth'] == 1
+
+    def test_request_during_processing_is_requeued(self, user_with_gamification):
+        """Test una solicitud que llega durante el recálculo no se pierde"""
+        user, _, _ = user_with_gamification
+        today = timezone.now().date()
+        GamificationQueue.enqueue(user.id, today)
+
+        [task] = GamificationQueue.claim()
+        assert GamificationQueue.claim() == []  # ya reservada
+        GamificationQueue.enqueue(user.id, today)
+
+        assert GamificationQueue.complete(task) is False
+        assert [t.claimed_at for t in GamificationTask.objects.all()] == [None]
+
+    def test_failed_task_waits_for_backoff(self, user_with_gamification):
+        """Test una tarea fallida no se reserva de nuevo hasta que pasa su espera"""
+        user, _, _ = user_with_gamification
+        today = timezone.now().date()
+        GamificationQueue.enqueue(user.id, today)
+
+        with patch.object(GamificationService, 'process_daily_gamification', side_effect=RuntimeError('boom')):
+            assert GamificationQueue.drain()['failed'] == 1
+
+        task = GamificationTask.objects.get()
+        assert task.attempts == 1
+        assert task.claimed_at is None
+        assert task.available_at > timezone.now()
+        assert GamificationQueue.claim() == []
+
+        # Pasada la espera vuelve a estar disponible
+        GamificationTask.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+        assert len(GamificationQueue.claim()) == 1
+
+    def test_new_request_revives_exhausted_task(self, user_with_gamification):
+        """Test un registro nuevo reactiva una tarea que agotó sus reintentos"""
+        user, _, _ = user_with_gamification
+        today = timezone.now().date()
+        GamificationQueue.enqueue(user.id, today)
+        GamificationTask.objects.update(attempts=MAX_ATTEMPTS, available_at=timezone.now() + timedelta(hours=1))
+        assert GamificationQueue.claim() == []
+
+        GamificationQueue.enqueue(user.id, today)
+
+        [task] = GamificationQueue.claim()
+        assert task.attempts == 0
+        assert task.available_at is None
+
+    def test_retry_backoff_is_exponential_and_capped(self):
+        """Test la espera se duplica en cada intento hasta el máximo"""
+        assert [retry_backoff(n).total_seconds() for n in (1, 2, 3)] == [30, 60, 120]
+        assert retry_backoff(20).total_seconds() == 3600
+
+    def test_deferred_habit_log_and_worker(self, user_with_gamification, settings):
+        """Test el registro en modo diferido responde pendiente y el worker procesa la cola"""
+        settings.GAMIFICATION_DEFERRED = True
+        user, _, _ = user_with_gamification
+        tracker = HabitTracker.objects.create(
+            user=user,
+            habit=HabitQuestion.objects.create(habit_type='MEAL_SIZE', text='Hábito')
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+
+        for level in (2, 3):
+            response = client.post(
+                reverse('log-habit'),
+                {'tracker_id': tracker.id, 'completion_level': level},
+                format='json'
+            )
+            assert response.status_code == 201
+            assert response.data['gamification']['pending'] is True
+
+        assert GamificationTask.objects.count() == 1
+        assert not DailyPoints.objects.exists()
+
+        out = StringIO()
+        call_command('run_gamification_worker', '--once', stdout=out)
+
+        assert not GamificationTask.objects.exists()
+        assert DailyPoints.objects.get(user=user).habits_completed == 1
+        assert '1 recálculo(s) procesados' in out.getvalue()
@@ -3,6 +3,8 @@ import pytest
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
+from unittest.mock import patch
+from gamification.medal_rules import MedalRuleEngine
 from gamification.services import GamificationService
 from gamification.models import UserLevel, Medal, UserMedal, DailyPoints
 from cycles.models import UserCycle
@@ -162,6 +164,8 @@ class TestGamificationService:
             date=timezone.now().date(),
             total_points=1700  # Más de 1600 necesarios
         )
+        # Los contadores son incrementales: sincronizarlos con el registro creado a mano
+        GamificationService.reconcile_points(user_ids=[user.id])
         
         # Actualizar progreso
         updated_level, level_changed = GamificationService.update_user_level_progress(user)
@@ -262,4 +266,215 @@ class TestGamificationService:
         assert updated_level.current_cycle == new_cycle
         assert updated_level.current_cycle_points == 0  # Reseteado
         assert updated_level.current_level == 'BRONCE'  # Se mantiene
-        assert updated_level.current_streak == 10  # Se mantiene si hay actividad reciente
\ No newline at end of file
+        assert updated_level.current_streak == 10  # Se mantiene si hay actividad reciente
+    
+    def test_calculate_streak_single_query(self, user_with_habits_and_cycle, django_assert_num_queries):
+        """Test la racha se calcula con una sola consulta agrupada"""
+        user, cycle, habits, trackers = user_with_habits_and_cycle
+        today = timezone.now().date()
+        
+        # 5 días completos, un hueco y otros 2 días completos
+        for days_ago in list(range(5)) + [6, 7]:
+            for tracker in trackers:
+                HabitLog.objects.create(
+                    tracker=tracker,
+                    date=today - timedelta(days=days_ago),
+                    completion_level=2
+                )
+        
+        with django_assert_num_queries(1):
+            streak = GamificationService.calculate_streak_on_date(user, today)
+        assert streak == 5
+        
+        with django_assert_num_queries(1):
+            streak_before_gap = GamificationService.calculate_streak_on_date(
+                user, today - timedelta(days=6)
+            )
+        assert streak_before_gap == 2
+    
+    def test_calculate_streak_incomplete_day_breaks(self, user_with_habits_and_cycle):
+        """Test un día con algún hábito por debajo de nivel 2 rompe la racha"""
+        user, cycle, habits, trackers = user_with_habits_and_cycle
+        today = timezone.now().date()
+        
+        for days_ago in range(3):
+            for i, tracker in enumerate(trackers):
+                level = 1 if (days_ago == 1 and i == 0) else 3
+                HabitLog.objects.create(
+                    tracker=tracker,
+                    date=today - timedelta(days=days_ago),
+                    completion_level=level
+                )
+        
+        assert GamificationService.calculate_streak_on_date(user, today) == 1
+    
+    def test_streak_memo_reuses_daily_data(self, user_with_habits_and_cycle, django_assert_num_queries):
+        """Test dentro de streak_memo las rachas repetidas no consultan la BD"""
+        from gamification.streaks import streak_memo
+        user, cycle, habits, trackers = user_with_habits_and_cycle
+        today = timezone.now().date()
+        
+        for tracker in trackers:
+            HabitLog.objects.create(tracker=tracker, date=today, completion_level=3)
+        
+        with streak_memo():
+            with django_assert_num_queries(1):
+                first = GamificationService.calculate_streak_on_date(user, today)
+                second = GamificationService.calculate_streak_on_date(user, today)
+                third = GamificationService.calculate_streak_on_date(user, today - timedelta(days=1))
+        
+        assert (first, second, third) == (1, 1, 0)
+    
+    def test_update_daily_points_applies_delta_to_counters(self, user_with_habits_and_cycle):
+        """Test los contadores de UserLevel reciben solo la diferencia del día"""
+        user, cycle, habits, trackers = user_with_habits_and_cycle
+        level = UserLevel.objects.create(user=user, current_cycle=cycle, current_level='NOVATO')
+        today = timezone.now().date()
+        
+        logs = [
+            HabitLog.objects.create(tracker=tracker, date=today, completion_level=1)
+            for tracker in trackers
+        ]
+        first = GamificationService.update_daily_points(user, today)
+        level.refresh_from_db()
+        assert level.current_cycle_points == first.total_points
+        assert level.total_points_all_time == first.total_points
+        
+        # Mejorar el día: solo se suma la diferencia
+        for log in logs:
+            log.completion_level = 3
+            log.save()
+        second = GamificationService.update_daily_points(user, today)
+        level.refresh_from_db()
+        assert second.total_points > first.total_points
+        assert level.current_cycle_points == second.total_points
+        assert level.total_points_all_time == second.total_points
+        
+        # Recalcular sin cambios no altera los contadores
+        GamificationService.update_daily_points(user, today)
+        level.refresh_from_db()
+        assert level.current_cycle_points == second.total_points
+    
+    def test_reconcile_points_repairs_drift(self, user_with_habits_and_cycle):
+        """Test reconcile_points detecta y corrige desviaciones de los contadores"""
+        user, cycle, _, _ = user_with_habits_and_cycle
+        level = UserLevel.objects.create(
+            user=user,
+            current_cycle=cycle,
+            current_level='NOVATO',
+            current_cycle_points=999,
+            total_points_all_time=5
+        )
+        DailyPoints.objects.create(
+            user=user, cycle=cycle, date=timezone.now().date(), total_points=120
+        )
+        
+        drifts = GamificationService.reconcile_points(dry_run=True)
+        assert [d['user_id'] for d in drifts] == [user.id]
+        level.refresh_from_db()
+        assert level.current_cycle_points == 999  # dry-run no modifica
+        
+        GamificationService.reconcile_points()
+        level.refresh_from_db()
+        assert level.current_cycle_points == 120
+        assert level.total_points_all_time == 120
+        
+        # Una segunda pasada ya no encuentra desviaciones
+        assert GamificationService.reconcile_points() == []
+    
+    def test_check_new_medals_structured_criteria(self, user_with_habits_and_cycle, django_assert_max_num_queries):
+        """Test medallas de racha y días perfectos con criterio estructurado"""
+        user, cycle, _, trackers = user_with_habits_and_cycle
+        cycle.start_date = timezone.now() - timedelta(days=5)
+        cycle.save()
+        UserLevel.objects.create(
+            user=user,
+            current_cycle=cycle,
+            current_level='NOVATO',
+            current_cycle_points=300
+        )
+        today = timezone.now().date()
+        # 3 días completos; solo los 2 últimos perfectos
+        for days_ago in range(3):
+            for tracker in trackers:
+                HabitLog.objects.create(
+                    tracker=tracker,
+                    date=today - timedelta(days=days_ago),
+                    completion_level=2 if days_ago == 2 else 3
+                )
+        
+        streak3 = Medal.objects.create(
+            name='Test Racha 3', description='x', required_points=0,
+            required_level='NOVATO', required_cycle_number=1,
+            criterion_type='STREAK', criterion_threshold=3
+        )
+        Medal.objects.create(
+            name='Test Racha 10', description='x', required_points=0,
+            required_level='NOVATO', required_cycle_number=1,
+            criterion_type='STREAK', criterion_threshold=10
+        )
+        Medal.objects.create(
+            name='Test Semana', description='x', required_points=0,
+            required_level='NOVATO', required_cycle_number=1,
+            criterion_type='WEEK_COMPLETE', criterion_threshold=7
+        )
+        perfect2 = Medal.objects.create(
+            name='Test Perfectos 2', description='x', required_points=0,
+            required_level='NOVATO', required_cycle_number=1,
+            criterion_type='PERFECT_DAYS', criterion_threshold=2
+        )
+        Medal.objects.create(
+            name='Test Perfectos 3', description='x', required_points=0,
+            required_level='NOVATO', required_cycle_number=1,
+            criterion_type='PERFECT_DAYS', criterion_threshold=3
+        )
+        GamificationService.check_new_medals(user)  # compila la tabla de reglas
+        UserMedal.objects.filter(user=user).delete()
+        
+        # Nivel, medallas ganadas, datos diarios y un único INSERT (+ savepoint)
+        with django_assert_max_num_queries(6):
+            new_medals = GamificationService.check_new_medals(user)
+        
+        test_medals = {m.medal for m in new_medals if m.medal.name.startswith('Test ')}
+        assert test_medals == {streak3, perfect2}
+    
+    def test_medal_rules_invalidated_on_save(self, user_with_habits_and_cycle):
+        """Test la tabla de reglas se recompila al editar una medalla"""
+        user, cycle, _, _ = user_with_habits_and_cycle
+        UserLevel.objects.create(
+            user=user,
+            current_cycle=cycle,
+            current_level='NOVATO',
+            current_cycle_points=50
+        )
+        medal = Medal.objects.create(
+            name='Test Medalla 100', description='x', required_points=100,
+            required_level='NOVATO', required_cycle_number=1
+        )
+        assert not [m for m in GamificationService.check_new_medals(user) if m.medal == medal]
+        
+        medal.required_points = 50
+        medal.save()
+        
+        assert [m.medal for m in GamificationService.check_new_medals(user) if m.medal == medal] == [medal]
+    
+    def test_medal_rules_shared_version_checked_at_most_once_per_interval(self, settings):
+        """Test las búsquedas en la tabla no leen la versión compartida en cada llamada"""
+        settings.GAMIFICATION_MEDAL_RULES_VERSION_CHECK = 60
+        medal = Medal.objects.create(
+            name='Test Medalla', description='x', required_points=10,
+            required_level='NOVATO', required_cycle_number=1
+        )
+        MedalRuleEngine.rules()
+        
+        with patch.object(MedalRuleEngine, '_shared_version', wraps=MedalRuleEngine._shared_version) as shared_version:
+            for _ in range(10):
+                MedalRuleEngine.rules()
+                MedalRuleEngine.medal(medal.id)
+                MedalRuleEngine.catalog()
+            assert shared_version.call_count == 0
+            
+            # Vencido el intervalo se vuelve a consultar una vez
+            settings.GAMIFICATION_MEDAL_RULES_VERSION_CHECK = 0
+            MedalRuleEngine.rules()
+            assert shared_version.call_count == 1
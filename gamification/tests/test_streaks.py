@@ -0,0 +1,123 @@
+# gamification/tests/test_streaks.py
+import pytest
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import date, timedelta
+from gamification.models import DailyCompletionBitmap
+from gamification.streaks import CompletionBits, StreakEngine
+from habits.models import HabitTracker, HabitLog
+from questionnaires.models import HabitQuestion
+
+
+class TestCompletionBits:
+    """Tests de operaciones de bits sin base de datos"""
+
+    def test_streak_and_perfect_days(self):
+        """Test racha y días perfectos sobre días desordenados"""
+        start = date(2025, 1, 1)
+        days = {
+            start + timedelta(days=3): (2, 2, 2),   # perfecto
+            start + timedelta(days=1): (2, 2, 1),   # completo
+            start + timedelta(days=2): (2, 2, 2),   # perfecto
+            start: (2, 1, 0),                      # incompleto
+        }
+        bits = CompletionBits.from_days(days)
+
+        assert bits.origin == start
+        assert bits.streak_ending(start + timedelta(days=3)) == 3
+        assert bits.streak_ending(start + timedelta(days=4)) == 0
+        assert bits.streak_ending(start - timedelta(days=1)) == 0
+        assert bits.perfect_days_between(start, start + timedelta(days=10)) == 2
+        assert bits.perfect_days_between(start + timedelta(days=3), start + timedelta(days=3)) == 1
+
+    def test_bytes_roundtrip(self):
+        """Test serialización a bytes y vuelta"""
+        bits = CompletionBits()
+        for offset in (0, 9, 20):
+            bits.set_day(date(2025, 1, 1) + timedelta(days=offset), True, offset == 9)
+
+        complete, perfect = bits.to_bytes()
+        bitmap = DailyCompletionBitmap(origin_date=bits.origin, complete_bits=complete, perfect_bits=perfect)
+        restored = CompletionBits.from_bitmap(bitmap)
+
+        assert len(complete) == 3
+        assert (restored.complete, restored.perfect) == (bits.complete, bits.perfect)
+
+
+@pytest.mark.django_db
+class TestCompletionBitmap:
+    """Tests de mantenimiento del bitmap desde HabitLog"""
+
+    @pytest.fixture
+    def user_with_trackers(self):
+        user = User.objects.create_user(username='bitmapuser')
+        trackers = [
+            HabitTracker.objects.create(
+                user=user,
+                habit=HabitQuestion.objects.create(habit_type=f'HABIT_{i}', text=f'Hábito {i}')
+            )
+            for i in range(2)
+        ]
+        return user, trackers
+
+    def test_logging_and_deleting_updates_bitmap(self, user_with_trackers):
+        """Test guardar y borrar HabitLog actualiza el bit del día"""
+        user, trackers = user_with_trackers
+        today = timezone.now().date()
+        for days_ago in range(3):
+            for tracker in trackers:
+                HabitLog.objects.create(tracker=tracker, date=today - timedelta(days=days_ago), completion_level=3)
+
+        assert StreakEngine.streak_on_date(user, today) == 3
+
+        HabitLog.objects.filter(tracker=trackers[0], date=today - timedelta(days=1)).delete()
+        log = HabitLog.objects.get(tracker=trackers[1], date=today - timedelta(days=1))
+        log.completion_level = 1
+        log.save()
+
+        assert StreakEngine.streak_on_date(user, today) == 1
+
+    def test_bulk_writes_update_bitmap(self, user_with_trackers):
+        """Test bulk_create, los upserts, update y bulk_update de HabitLog también actualizan el bitmap"""
+        user, trackers = user_with_trackers
+        today = timezone.now().date()
+        HabitLog.objects.bulk_create([
+            HabitLog(tracker=tracker, user=user, date=today - timedelta(days=days_ago), completion_level=3)
+            for days_ago in range(3)
+            for tracker in trackers
+        ])
+        assert StreakEngine.streak_on_date(user, today) == 3
+
+        HabitLog.objects.filter(tracker=trackers[0], date=today - timedelta(days=1)).update(completion_level=0)
+        assert StreakEngine.streak_on_date(user, today) == 1
+
+        HabitLog.objects.bulk_create(
+            [HabitLog(tracker=trackers[0], user=user, date=today - timedelta(days=1), completion_level=2)],
+            update_conflicts=True,
+            unique_fields=['tracker', 'date'],
+            update_fields=['completion_level']
+        )
+        assert StreakEngine.streak_on_date(user, today) == 3
+
+        log = HabitLog.objects.get(tracker=trackers[1], date=today)
+        log.completion_level = 1
+        HabitLog.objects.bulk_update([log], ['completion_level'])
+        assert StreakEngine.streak_on_date(user, today) == 0
+
+    def test_rebuild_command(self, user_with_trackers):
+        """Test el comando reconstruye el bitmap desde HabitLog"""
+        user, trackers = user_with_trackers
+        today = timezone.now().date()
+        for tracker in trackers:
+            HabitLog.objects.create(tracker=tracker, date=today, completion_level=3)
+        DailyCompletionBitmap.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_completion_bitmaps', stdout=out)
+
+        bits = CompletionBits.from_bitmap(DailyCompletionBitmap.objects.get(user=user))
+        assert bits.streak_ending(today) == 1
+        assert bits.perfect_days_between(today, today) == 1
+        assert '1 bitmap(s) reconstruidos' in out.getvalue()
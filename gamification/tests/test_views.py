@@ -50,10 +50,37 @@ class TestGamificationViews:
         response = client.get(url)
         
         assert response.status_code == 200
-        assert response.data['level'] == 'NOVATO'
-        assert response.data['current_points'] == 250
-        assert response.data['cycle_number'] == 1
-        assert 'progress' in response.data
+        data = response.json()  # JSON pre-serializado (sin response.data)
+        assert data['level'] == 'NOVATO'
+        assert data['current_points'] == 250
+        assert data['cycle_number'] == 1
+        assert 'progress' in data
+    
+    def test_gamification_dashboard_cache(self, authenticated_client_with_cycle, settings, django_assert_num_queries):
+        """Test el dashboard cacheado no consulta la BD y se invalida al procesar"""
+        from django.core.cache import caches
+        settings.GAMIFICATION_CACHE_ALIAS = 'locmem'
+        caches['locmem'].clear()
+        client, user, _, cycle, level = authenticated_client_with_cycle
+        url = reverse('gamification-dashboard')
+        
+        client.get(url)
+        # Solo la consulta de autenticación por token
+        with django_assert_num_queries(1):
+            cached = client.get(url)
+        assert cached.json()['current_points'] == 250
+        
+        UserLevel.objects.filter(pk=level.pk).update(current_cycle_points=900)
+        assert client.get(url).json()['current_points'] == 250  # sigue cacheado
+        
+        client.post(reverse('process-gamification'), {}, format='json')
+        assert client.get(url).json()['current_points'] == 900
+        
+        user.is_staff = True
+        user.save()
+        stats = client.get(reverse('gamification-cache-stats')).data
+        assert (stats['hits'], stats['misses']) == (2, 2)
+        assert stats['hit_rate'] == 50.0
     
     def test_process_gamification(self, authenticated_client_with_cycle):
         """Test procesar gamificación"""
@@ -155,6 +182,41 @@ class TestGamificationViews:
         assert earned_medal['is_earned'] is True
         assert not_earned_medal['is_earned'] is False
     
+    def test_medal_catalog_cached_and_versioned(self, authenticated_client_with_cycle, django_assert_num_queries):
+        """Test el catálogo se serializa una vez y se recompila al editar una medalla"""
+        from gamification.serializers import UserMedalSerializer
+        client, user, _, cycle, _ = authenticated_client_with_cycle
+        medal = Medal.objects.create(
+            name='Test Catálogo',
+            required_points=100,
+            required_level='NOVATO',
+            required_cycle_number=1
+        )
+        user_medal = UserMedal.objects.create(
+            user=user,
+            medal=medal,
+            cycle_earned=cycle,
+            points_when_earned=100,
+            level_when_earned='NOVATO'
+        )
+        url = reverse('all-medals')
+        client.get(url)
+        
+        # Token + medallas ganadas
+        with django_assert_num_queries(2):
+            response = client.get(url)
+        assert next(m for m in response.data['medals'] if m['id'] == medal.id)['is_earned'] is True
+        
+        medal.name = 'Test Catálogo v2'
+        medal.save()
+        response = client.get(url)
+        assert next(m for m in response.data['medals'] if m['id'] == medal.id)['name'] == 'Test Catálogo v2'
+        
+        # UserMedalsView mantiene el formato del serializer
+        response = client.get(reverse('user-medals'))
+        user_medal.refresh_from_db()
+        assert response.data['medals'] == [UserMedalSerializer(user_medal).data]
+    
     def test_test_gamification_view_staff_only(self, authenticated_client_with_cycle):
         """Test que la vista de test es solo para staff"""
         client, user, _, _, _ = authenticated_client_with_cycle
@@ -5,7 +5,10 @@ from .views import (
     ProcessGamificationView,
     UserMedalsView,
     AllMedalsView,  # ← AÑADIR
-    TestGamificationView
+    TestGamificationView,
+    LeaderboardView,
+    DashboardCacheStatsView,
+    GamificationQueueStatsView
 )
 
 urlpatterns = [
@@ -14,4 +17,7 @@ urlpatterns = [
     path('medals/', UserMedalsView.as_view(), name='user-medals'),
     path('all-medals/', AllMedalsView.as_view(), name='all-medals'),  # ← AÑADIR
     path('test/', TestGamificationView.as_view(), name='test-gamification'),
+    path('leaderboard/', LeaderboardView.as_view(), name='gamification-leaderboard'),
+    path('cache-stats/', DashboardCacheStatsView.as_view(), name='gamification-cache-stats'),
+    path('queue-stats/', GamificationQueueStatsView.as_view(), name='gamification-queue-stats'),
 ]
\ No newline at end of file
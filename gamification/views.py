@@ -3,9 +3,16 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework import serializers
+from django.http import HttpResponse
 from django.utils import timezone
 from .models import UserLevel, UserMedal, Medal
 from .services import GamificationService
+from .cache import DashboardCache
+from .medal_rules import MedalRuleEngine
+from .queue import GamificationQueue
+from .leaderboard import LeaderboardService, LEADERBOARD_TOP_N, LEADERBOARD_MAX_N
 from .serializers import UserLevelSerializer, UserMedalSerializer, MedalSerializer
 
 
@@ -17,7 +24,20 @@ class GamificationDashboardView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user_level = GamificationService.get_or_create_user_level(request.user)
+        return HttpResponse(self.cached_payload(request.user), content_type='application/json')
+    
+    @classmethod
+    def cached_payload(cls, user):
+        """JSON del dashboard; en un acierto de caché no hace consultas"""
+        payload = DashboardCache.get(user.id)
+        if payload is None:
+            payload = JSONRenderer().render(cls._build_payload(user))
+            DashboardCache.set(user.id, payload)
+        return payload
+    
+    @staticmethod
+    def _build_payload(user):
+        user_level = GamificationService.get_or_create_user_level(user)
         
         # Calcular progreso hacia siguiente nivel
         progress_data = {
@@ -41,11 +61,11 @@ class GamificationDashboardView(APIView):
         cycle_medals = []
         if user_level.current_cycle:
             cycle_medals = UserMedal.objects.filter(
-                user=request.user,
+                user=user,
                 cycle_earned=user_level.current_cycle
-            ).select_related('medal')
+            ).select_related('medal', 'cycle_earned')
         
-        return Response({
+        return {
             'level': user_level.current_level,
             'current_points': user_level.current_cycle_points,
             'current_streak': user_level.current_streak,
@@ -53,7 +73,7 @@ class GamificationDashboardView(APIView):
             'progress': progress_data,
             'cycle_number': user_level.current_cycle.cycle_number if user_level.current_cycle else None,
             'medals_this_cycle': UserMedalSerializer(cycle_medals, many=True).data
-        })
+        }
 
 class ProcessGamificationView(APIView):
     """
@@ -171,14 +191,31 @@ class UserMedalsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        # Medallas ganadas por el usuario
-        user_medals = UserMedal.objects.filter(
+        # Medallas ganadas por el usuario; los datos de cada medalla salen del catálogo
+        user_medals = list(UserMedal.objects.filter(
             user=request.user
-        ).select_related('medal', 'cycle_earned').order_by('-earned_at')
+        ).order_by('-earned_at').values(
+            'id', 'medal_id', 'earned_at', 'points_when_earned',
+            'level_when_earned', 'cycle_earned__cycle_number'
+        ))
+        catalog = MedalRuleEngine.catalog(medal_ids=[user_medal['medal_id'] for user_medal in user_medals])
+        earned_at_field = serializers.DateTimeField()
+        
+        medals_data = [
+            {
+                'id': user_medal['id'],
+                'medal': catalog[user_medal['medal_id']],
+                'earned_at': earned_at_field.to_representation(user_medal['earned_at']),
+                'points_when_earned': user_medal['points_when_earned'],
+                'level_when_earned': user_medal['level_when_earned'],
+                'cycle_number': user_medal['cycle_earned__cycle_number'],
+            }
+            for user_medal in user_medals
+        ]
         
         return Response({
-            'medals': UserMedalSerializer(user_medals, many=True).data,
-            'total_medals': user_medals.count()
+            'medals': medals_data,
+            'total_medals': len(medals_data)
         })
 
 class TestGamificationView(APIView):
@@ -211,23 +248,104 @@ class AllMedalsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        # Todas las medallas activas
-        all_medals = Medal.objects.filter(is_active=True).order_by('required_cycle_number', 'order')
+        # Catálogo de medallas activas ya serializado (versionado, compartido entre usuarios)
+        catalog = MedalRuleEngine.active_catalog()
         
-        # Medallas ganadas por el usuario
-        earned_medal_ids = UserMedal.objects.filter(
-            user=request.user
-        ).values_list('medal_id', flat=True)
+        # Medallas ganadas por el usuario: una sola consulta
+        earned_medal_ids = set(
+            UserMedal.objects.filter(user=request.user).values_list('medal_id', flat=True)
+        )
         
         # Añadir campo is_earned a cada medalla
-        medals_data = []
-        for medal in all_medals:
-            medal_data = MedalSerializer(medal).data
-            medal_data['is_earned'] = medal.id in earned_medal_ids
-            medals_data.append(medal_data)
+        medals_data = [
+            {**medal_data, 'is_earned': medal_data['id'] in earned_medal_ids}
+            for medal_data in catalog
+        ]
         
         return Response({
             'medals': medals_data,
             'total_medals': len(medals_data),
             'earned_count': len(earned_medal_ids)
-        })
\ No newline at end of file
+        })
+
+
+class LeaderboardView(APIView):
+    """
+    Clasificación del número de ciclo del usuario: top-N y su posición/percentil.
+    Se sirve desde el snapshot materializado por refresh_leaderboard.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        limit = LEADERBOARD_TOP_N
+        if request.query_params.get('limit'):
+            try:
+                limit = int(request.query_params['limit'])
+            except ValueError:
+                return Response({'error': 'limit debe ser un número'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, LEADERBOARD_MAX_N))
+        # Solo se cachean los dos tamaños de snapshot habituales
+        snapshot_size = LEADERBOARD_TOP_N if limit <= LEADERBOARD_TOP_N else LEADERBOARD_MAX_N
+        
+        entry = LeaderboardService.entry_for(request.user)
+        
+        cycle_number = request.query_params.get('cycle')
+        if cycle_number is None:
+            if entry is None:
+                return Response({
+                    'cycle_number': None,
+                    'top': [],
+                    'me': None,
+                    'message': 'Aún no apareces en la clasificación'
+                })
+            cycle_number = entry.cycle_number
+        else:
+            try:
+                cycle_number = int(cycle_number)
+            except ValueError:
+                return Response({'error': 'cycle debe ser un número'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        snapshot = LeaderboardService.top(cycle_number, snapshot_size)
+        
+        me = None
+        if entry is not None and entry.cycle_number == cycle_number:
+            me = {
+                'rank': entry.rank,
+                'percentile': entry.percentile,
+                'points': entry.points,
+                'level': entry.level,
+            }
+        
+        return Response({
+            'cycle_number': cycle_number,
+            'total_users': snapshot['total_users'],
+            'computed_at': snapshot['computed_at'],
+            'top': snapshot['top'][:limit],
+            'me': me
+        })
+
+
+class DashboardCacheStatsView(APIView):
+    """
+    Aciertos/fallos de la caché del dashboard (monitorización, solo staff)
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if not request.user.is_staff:
+            return Response({'error': 'Solo para staff'}, status=status.HTTP_403_FORBIDDEN)
+        
+        return Response(DashboardCache.stats())
+
+
+class GamificationQueueStatsView(APIView):
+    """
+    Profundidad y latencia de la cola de gamificación diferida (solo staff)
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if not request.user.is_staff:
+            return Response({'error': 'Solo para staff'}, status=status.HTTP_403_FORBIDDEN)
+        
+        return Response(GamificationQueue.stats())
@@ -0,0 +1,11 @@
+# gastro_assistant/cache.py
+"""
+Backend de caché compartido por las apps (dashboard, analítica, progreso...).
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+
+def app_cache():
+    """Backend de caché configurado en GAMIFICATION_CACHE_ALIAS (por defecto 'default')"""
+    return caches[getattr(settings, 'GAMIFICATION_CACHE_ALIAS', 'default')]
@@ -0,0 +1,49 @@
+# gastro_assistant/db.py
+"""
+Utilidades de base de datos compartidas por las apps.
+"""
+
+
+def upsert(model, lookup, defaults, update_fields=None):
+    """
+    Crea o actualiza una fila en un solo viaje a la base de datos
+    (INSERT ... ON CONFLICT DO UPDATE) y devuelve la instancia.
+
+    lookup son los campos de la restricción única (user/date, tracker/date...)
+    y defaults los valores a escribir. A diferencia de update_or_create no hay
+    SELECT previo, así que dos peticiones simultáneas con la misma clave no
+    fallan por la restricción única: la última escritura gana.
+
+    Los campos auto_now se actualizan siempre; los auto_now_add y el resto de
+    campos fuera de update_fields conservan en la base de datos su valor
+    original y se releen (una consulta por clave primaria) para que la
+    instancia devuelta coincida con la fila guardada.
+    No se envían señales post_save.
+    """
+    if update_fields is None:
+        update_fields = list(defaults)
+    update_fields = list(update_fields) + [
+        field.name for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) and field.name not in update_fields
+    ]
+
+    instance = model(**lookup, **defaults)
+    model._default_manager.bulk_create(
+        [instance],
+        update_conflicts=True,
+        unique_fields=list(lookup),
+        update_fields=update_fields
+    )
+
+    # Backends sin RETURNING en upserts (MySQL) no devuelven la clave primaria
+    if instance.pk is None:
+        return model._default_manager.get(**lookup)
+
+    # En un conflicto la fila conserva sus valores fuera de update_fields (logged_at, created_at...)
+    kept_fields = [
+        field.attname for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in update_fields and field.name not in lookup
+    ]
+    if kept_fields:
+        instance.refresh_from_db(fields=kept_fields)
+    return instance
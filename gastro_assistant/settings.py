@@ -161,3 +161,31 @@ RESEND_API_KEY = os.getenv('RESEND_API_KEY')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'Gastro Assistant <info@refluxion.com>')
 
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://165.227.88.231')
+
+# Caché: Redis si hay REDIS_URL (recomendado en producción: un único almacén
+# compartido por todos los hosts y workers, así la invalidación del dashboard
+# llega a todos y los contadores incr son atómicos). CACHE_BACKEND/CACHE_LOCATION
+# permiten configurar otro backend explícitamente. Sin ninguno se mantiene la
+# caché por defecto de Django (LocMem, propia de cada proceso).
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif os.getenv('CACHE_BACKEND'):
+    CACHES = {
+        'default': {
+            'BACKEND': os.getenv('CACHE_BACKEND'),
+            'LOCATION': os.getenv('CACHE_LOCATION', ''),
+        }
+    }
+
+# Gamificación
+GAMIFICATION_CACHE_ALIAS = os.getenv('GAMIFICATION_CACHE_ALIAS', 'default')  # Dashboard cacheado
+GAMIFICATION_CACHE_STATS_SAMPLE_RATE = float(os.getenv('GAMIFICATION_CACHE_STATS_SAMPLE_RATE', '0.05'))  # Fracción de lecturas que actualizan los contadores
+GAMIFICATION_MEDAL_RULES_TTL = int(os.getenv('GAMIFICATION_MEDAL_RULES_TTL', '300'))  # Segundos
+GAMIFICATION_MEDAL_RULES_VERSION_CHECK = int(os.getenv('GAMIFICATION_MEDAL_RULES_VERSION_CHECK', '5'))  # Segundos entre consultas de la versión compartida
+GAMIFICATION_DEFERRED = os.getenv('GAMIFICATION_DEFERRED', 'False') == 'True'  # Registro de hábitos con gamificación en cola (run_gamification_worker)
@@ -1,6 +1,7 @@
 # gastro_assistant/urls.py
 from django.contrib import admin
 from django.urls import path, include
+from habits.views import TodayView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -21,6 +22,9 @@ urlpatterns = [
     
     path('api/habits/', include('habits.urls')),  #
 
+    # Pantalla de inicio en una sola petición
+    path('api/home/today/', TodayView.as_view(), name='home-today'),
+
     path('api/cycles/', include('cycles.urls')),
 
     path('api/gamification/', include('gamification.urls')),  # ← AÑADIR ESTA LÍNEA
@@ -37,13 +37,13 @@ class HabitTrackerAdmin(admin.ModelAdmin):
 class HabitLogAdmin(admin.ModelAdmin):
     list_display = ('get_user', 'get_habit_type', 'date', 'completion_level', 'logged_at')
     list_filter = ('completion_level', 'tracker__habit__habit_type', 'date')
-    search_fields = ('tracker__user__username', 'tracker__user__email', 'notes')
+    search_fields = ('user__username', 'user__email', 'notes')
     date_hierarchy = 'date'
     
     def get_user(self, obj):
-        return obj.tracker.user
+        return obj.user
     get_user.short_description = 'Usuario'
-    get_user.admin_order_field = 'tracker__user'
+    get_user.admin_order_field = 'user'
     
     def get_habit_type(self, obj):
         return obj.tracker.habit.get_habit_type_display()
@@ -0,0 +1,170 @@
+# habits/analytics.py
+"""
+Analítica de adherencia a los hábitos por ciclo.
+
+Los logs del ciclo se leen en una sola consulta columnar (tracker, fecha,
+nivel) y se procesan como una matriz hábitos x días con NumPy: tasa de
+adherencia, media móvil de 7 días, mejor/peor día de la semana y tendencia
+salen de operaciones vectorizadas, sin bucles por log.
+
+El resultado se cachea por (usuario, ciclo, último día de la ventana,
+versión de datos); la versión cambia con cualquier escritura de logs del
+ciclo y el último día avanza con la fecha, así que no hace falta invalidar
+explícitamente.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from gastro_assistant.cache import app_cache
+from .models import HabitTracker, HabitLog
+
+ANALYTICS_CACHE_KEY = 'habits:analytics:{user_id}:{cycle_number}:{end}:{version}'
+ANALYTICS_CACHE_TIMEOUT = 60 * 60 * 24
+MOVING_AVERAGE_DAYS = 7
+WEEKDAY_NAMES = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+class HabitAnalyticsService:
+    """
+    Tendencias de adherencia de los hábitos de un usuario en un ciclo
+    """
+
+    @staticmethod
+    def cycle_window(cycle):
+        """(primer día, último día) del ciclo, sin pasar de hoy"""
+        start = cycle.start_date.date()
+        end = min(cycle.end_date.date(), timezone.now().date())
+        return start, max(start, end)
+
+    @staticmethod
+    def data_version(user, start, end):
+        """Versión de los datos del ciclo: cambia al crear, editar o borrar logs"""
+        summary = HabitLog.objects.filter(
+            user=user,
+            date__range=(start, end)
+        ).aggregate(
+            logs=Count('id'),
+            last_log=Max('updated_at'),
+            last_tracker=Max('tracker__updated_at')
+        )
+        return '{}-{}-{}'.format(
+            summary['logs'],
+            summary['last_log'].timestamp() if summary['last_log'] else 0,
+            summary['last_tracker'].timestamp() if summary['last_tracker'] else 0
+        )
+
+    @staticmethod
+    def for_cycle(user, cycle):
+        """Analítica del ciclo, desde caché si los datos no han cambiado"""
+        start, end = HabitAnalyticsService.cycle_window(cycle)
+        key = ANALYTICS_CACHE_KEY.format(
+            user_id=user.id,
+            cycle_number=cycle.cycle_number,
+            # La ventana de un ciclo en curso termina hoy: cambia cada día
+            end=end.isoformat(),
+            version=HabitAnalyticsService.data_version(user, start, end)
+        )
+
+        cache = app_cache()
+        result = cache.get(key)
+        if result is None:
+            result = HabitAnalyticsService.compute(user, start, end)
+            result['cycle_number'] = cycle.cycle_number
+            cache.set(key, result, ANALYTICS_CACHE_TIMEOUT)
+        return result
+
+    @staticmethod
+    def compute(user, start, end):
+        """Calcula la analítica de los logs entre start y end (incluidos)"""
+        days = (end - start).days + 1
+
+        rows = list(HabitLog.objects.filter(
+            user=user,
+            date__range=(start, end)
+        ).values_list('tracker_id', 'date', 'completion_level'))
+
+        logged_ids = {tracker_id for tracker_id, _, _ in rows}
+        trackers = [
+            tracker for tracker in HabitTracker.objects.filter(user=user).select_related('habit')
+            if tracker.is_active or tracker.id in logged_ids
+        ]
+
+        result = {
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+            'days': days,
+            'habits': []
+        }
+        if not trackers:
+            return result
+
+        # Matriz hábitos x días con el nivel registrado (-1 = sin registro)
+        row_of = {tracker.id: index for index, tracker in enumerate(trackers)}
+        levels = np.full((len(trackers), days), -1, dtype=np.int8)
+        if rows:
+            tracker_ids, dates, completion = zip(*rows)
+            levels[
+                np.fromiter((row_of[tracker_id] for tracker_id in tracker_ids), dtype=np.intp, count=len(rows)),
+                np.fromiter(((log_date - start).days for log_date in dates), dtype=np.intp, count=len(rows))
+            ] = completion
+
+        completed = (levels >= 2).astype(np.float64)
+        logged = levels >= 0
+
+        adherence = completed.mean(axis=1)
+        logged_rate = logged.mean(axis=1)
+        logged_days = logged.sum(axis=1)
+        average_level = np.divide(
+            np.where(logged, levels, 0).sum(axis=1),
+            logged_days,
+            out=np.zeros(len(trackers)),
+            where=logged_days > 0
+        )
+
+        # Media móvil de 7 días (ventanas más cortas al principio del ciclo)
+        cumulative = np.cumsum(completed, axis=1)
+        lagged = np.zeros_like(cumulative)
+        lagged[:, MOVING_AVERAGE_DAYS:] = cumulative[:, :-MOVING_AVERAGE_DAYS]
+        window = np.minimum(np.arange(1, days + 1), MOVING_AVERAGE_DAYS)
+        moving_average = (cumulative - lagged) / window
+
+        # Adherencia por día de la semana (NaN si el día no aparece en el ciclo)
+        weekdays = (start.weekday() + np.arange(days)) % 7
+        weekday_days = np.bincount(weekdays, minlength=7)
+        weekday_completed = np.stack([
+            completed[:, weekdays == weekday].sum(axis=1) for weekday in range(7)
+        ], axis=1)
+        weekday_rates = np.divide(
+            weekday_completed,
+            weekday_days,
+            out=np.full(weekday_completed.shape, np.nan),
+            where=weekday_days > 0
+        )
+
+        # Tendencia: pendiente de la regresión lineal de la adherencia diaria, por semana
+        x = np.arange(days, dtype=np.float64) - (days - 1) / 2
+        denominator = (x * x).sum()
+        slope = (completed @ x) / denominator if denominator else np.zeros(len(trackers))
+
+        for index, tracker in enumerate(trackers):
+            rates = weekday_rates[index]
+            result['habits'].append({
+                'tracker_id': tracker.id,
+                'habit_type': tracker.habit.habit_type,
+                'habit_name': tracker.habit.text,
+                'is_active': tracker.is_active,
+                'is_promoted': tracker.is_promoted,
+                'adherence_rate': round(float(adherence[index]), 3),
+                'logged_rate': round(float(logged_rate[index]), 3),
+                'average_level': round(float(average_level[index]), 2),
+                'moving_average_7d': np.round(moving_average[index], 3).tolist(),
+                'weekday_rates': [None if np.isnan(rate) else round(float(rate), 3) for rate in rates],
+                'best_weekday': WEEKDAY_NAMES[int(np.nanargmax(rates))],
+                'worst_weekday': WEEKDAY_NAMES[int(np.nanargmin(rates))],
+                'trend_per_week': round(float(slope[index]) * 7, 3),
+            })
+
+        return result
@@ -0,0 +1,40 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_habitlog_user(apps, schema_editor):
+    """Copia tracker.user en HabitLog.user por lotes de ids"""
+    HabitLog = apps.get_model('habits', 'HabitLog')
+    HabitTracker = apps.get_model('habits', 'HabitTracker')
+
+    tracker_user = Subquery(HabitTracker.objects.filter(pk=OuterRef('tracker_id')).values('user_id')[:1])
+    last_id = 0
+    while True:
+        ids = list(
+            HabitLog.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:BACKFILL_BATCH_SIZE]
+        )
+        if not ids:
+            break
+        HabitLog.objects.filter(id__gte=ids[0], id__lte=ids[-1]).update(user_id=tracker_user)
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0003_sync_change_tracking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habitlog',
+            name='user',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='habit_logs', to=settings.AUTH_USER_MODEL, verbose_name='Usuario'),
+        ),
+        migrations.RunPython(backfill_habitlog_user, migrations.RunPython.noop),
+    ]
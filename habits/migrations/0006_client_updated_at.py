@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:30
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_client_updated_at(apps, schema_editor):
+    """Filas anteriores: la mejor estimación de la última edición es updated_at"""
+    for model_name in ('HabitLog', 'DailyNote'):
+        model = apps.get_model('habits', model_name)
+        model.objects.filter(client_updated_at__isnull=True).update(client_updated_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0005_habitlog_user_not_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailynote',
+            name='client_updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Editado en el cliente'),
+        ),
+        migrations.AddField(
+            model_name='habitlog',
+            name='client_updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Editado en el cliente'),
+        ),
+        migrations.RunPython(backfill_client_updated_at, migrations.RunPython.noop),
+    ]
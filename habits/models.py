@@ -1,6 +1,7 @@
 # habits/models.py
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from questionnaires.models import HabitQuestion
 
 class HabitTracker(models.Model):
@@ -30,7 +31,7 @@ class HabitTracker(models.Model):
         verbose_name="Puntuación actual"
     )
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return f"{self.user.username} - {self.habit}"
@@ -41,6 +42,45 @@ class HabitTracker(models.Model):
         verbose_name = "Seguimiento de hábito"
         verbose_name_plural = "Seguimientos de hábitos"
 
+def refresh_completion_bitmaps(user_dates):
+    """
+    Actualiza el bitmap de cumplimiento de los pares (usuario, fecha) escritos.
+    Punto único para todas las escrituras de HabitLog: las señales cubren
+    save()/delete() y HabitLogQuerySet las escrituras en bloque.
+    """
+    from gamification.streaks import CompletionBitmapService
+
+    dates_by_user = {}
+    for user_id, log_date in user_dates:
+        dates_by_user.setdefault(user_id, set()).add(log_date)
+    for user_id, dates in dates_by_user.items():
+        CompletionBitmapService.refresh_days(user_id, dates)
+
+
+class HabitLogQuerySet(models.QuerySet):
+    """
+    Escrituras en bloque de HabitLog que mantienen el bitmap de cumplimiento
+    (bulk_create, los upserts y update no envían post_save; bulk_update usa update).
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        refresh_completion_bitmaps((log.user_id, log.date) for log in objs)
+        return objs
+
+    def update(self, **kwargs):
+        rows = list(self.values_list('pk', 'user_id', 'date'))
+        updated = super().update(**kwargs)
+        affected = {(user_id, log_date) for _, user_id, log_date in rows}
+        if rows and {'user', 'user_id', 'date'} & set(kwargs):
+            # La fila cambió de día o de usuario: también cuenta su nuevo par
+            affected.update(
+                HabitLog.objects.filter(pk__in=[pk for pk, _, _ in rows]).values_list('user_id', 'date')
+            )
+        refresh_completion_bitmaps(affected)
+        return updated
+
+
 class HabitLog(models.Model):
     """
     Registro diario del cumplimiento de hábitos.
@@ -58,6 +98,15 @@ class HabitLog(models.Model):
         related_name='logs',
         verbose_name="Seguimiento"
     )
+    # Copia de tracker.user: las consultas por usuario y fecha no necesitan JOIN
+    # (el índice compuesto (user, date) cubre también las búsquedas por usuario)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='habit_logs',
+        db_index=False,
+        verbose_name="Usuario"
+    )
     date = models.DateField(verbose_name="Fecha")
     completion_level = models.IntegerField(
         choices=COMPLETION_CHOICES,
@@ -66,12 +115,30 @@ class HabitLog(models.Model):
     )
     notes = models.TextField(blank=True, verbose_name="Notas")
     logged_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Momento de la edición en el dispositivo (última escritura gana en la sincronización);
+    # updated_at es solo la marca de auditoría del servidor
+    client_updated_at = models.DateTimeField(null=True, blank=True, verbose_name="Editado en el cliente")
+    
+    objects = HabitLogQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.tracker.user.username} - {self.tracker.habit} - {self.date}"
     
+    def save(self, *args, **kwargs):
+        # El usuario denormalizado siempre es el del tracker (nunca el que venga asignado)
+        if self.tracker_id:
+            self.user_id = self.tracker.user_id
+        # Escrituras en línea: la edición del cliente es ahora
+        if self.client_updated_at is None:
+            self.client_updated_at = timezone.now()
+        super().save(*args, **kwargs)
+    
     class Meta:
         unique_together = ('tracker', 'date')
+        indexes = [
+            models.Index(fields=['user', 'date'], name='habitlog_user_date_idx'),
+        ]
         ordering = ['-date']
         verbose_name = "Registro de hábito"
         verbose_name_plural = "Registros de hábitos"
@@ -89,6 +156,7 @@ class HabitStreak(models.Model):
     current_streak = models.IntegerField(default=0, verbose_name="Racha actual")
     longest_streak = models.IntegerField(default=0, verbose_name="Racha más larga")
     last_log_date = models.DateField(null=True, blank=True, verbose_name="Fecha del último registro")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return f"{self.tracker.user.username} - {self.tracker.habit} - Racha: {self.current_streak}"
@@ -115,6 +183,8 @@ class DailyNote(models.Model):
         verbose_name="Todos los hábitos completados"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    client_updated_at = models.DateTimeField(null=True, blank=True, verbose_name="Editado en el cliente")
     
     def __str__(self):
         return f"{self.user.username} - {self.date}"
@@ -124,3 +194,27 @@ class DailyNote(models.Model):
         ordering = ['-date']
         verbose_name = "Nota diaria"
         verbose_name_plural = "Notas diarias"
+
+
+class SyncReceipt(models.Model):
+    """
+    Resultado de una escritura offline ya aplicada, por clave de idempotencia.
+    Si el cliente reintenta el envío se devuelve el mismo resultado sin reaplicarla.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='sync_receipts',
+        verbose_name="Usuario"
+    )
+    idempotency_key = models.CharField(max_length=64, verbose_name="Clave de idempotencia")
+    result = models.JSONField(verbose_name="Resultado")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.idempotency_key}"
+    
+    class Meta:
+        unique_together = ('user', 'idempotency_key')
+        verbose_name = "Recibo de sincronización"
+        verbose_name_plural = "Recibos de sincronización"
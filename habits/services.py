@@ -0,0 +1,548 @@
+# habits/services.py
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.db import transaction
+from django.db.models import Q, Count, Max
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .models import HabitTracker, HabitLog, HabitStreak, DailyNote
+
+
+class HabitStreakService:
+    """
+    Cálculo de rachas por hábito (compartido por el registro individual y por lotes)
+    """
+
+    @staticmethod
+    def advance(streak, date, completion_level):
+        """
+        Aplica un registro a la racha (sin guardar).
+        Nivel >= 2 continúa o inicia la racha; un nivel menor la rompe.
+        """
+        if completion_level >= 2:
+            # Verificar si es consecutivo
+            if streak.last_log_date and (date - streak.last_log_date).days == 1:
+                streak.current_streak += 1
+            elif streak.last_log_date is None or (date - streak.last_log_date).days > 1:
+                streak.current_streak = 1
+
+            if streak.current_streak > streak.longest_streak:
+                streak.longest_streak = streak.current_streak
+        else:
+            streak.current_streak = 0
+
+        streak.last_log_date = date
+        return streak
+
+    @staticmethod
+    def advance_many(levels_by_tracker, date):
+        """
+        Actualiza las rachas de varios trackers para una fecha:
+        una lectura, un upsert en bloque de las nuevas y un bulk_update del resto.
+        Si la fecha no es posterior al último registro (día atrasado o re-registro)
+        la racha de ese tracker se reconstruye desde sus logs.
+        levels_by_tracker: {tracker_id: completion_level}
+        """
+        existing = {
+            streak.tracker_id: streak
+            for streak in HabitStreak.objects.filter(tracker_id__in=levels_by_tracker)
+        }
+
+        to_create = []
+        to_update = []
+        to_rebuild = []
+        for tracker_id, completion_level in levels_by_tracker.items():
+            streak = existing.get(tracker_id)
+            if streak is None:
+                streak = HabitStreak(tracker_id=tracker_id, current_streak=0, longest_streak=0)
+                to_create.append(streak)
+            elif streak.last_log_date and date <= streak.last_log_date:
+                to_rebuild.append(streak)
+                continue
+            else:
+                to_update.append(streak)
+            HabitStreakService.advance(streak, date, completion_level)
+
+        if to_rebuild:
+            HabitStreakService.rebuild_from_logs(to_rebuild)
+            to_update.extend(to_rebuild)
+
+        # bulk_update no aplica auto_now: updated_at alimenta la sincronización
+        now = timezone.now()
+        for streak in to_update:
+            streak.updated_at = now
+
+        if to_create:
+            # Upsert: si otra petición creó la racha a la vez, gana la última escritura
+            HabitStreak.objects.bulk_create(
+                to_create,
+                update_conflicts=True,
+                unique_fields=['tracker'],
+                update_fields=['current_streak', 'longest_streak', 'last_log_date', 'updated_at']
+            )
+        if to_update:
+            HabitStreak.objects.bulk_update(
+                to_update,
+                ['current_streak', 'longest_streak', 'last_log_date', 'updated_at']
+            )
+        return to_create + to_update
+
+    @staticmethod
+    def rebuild_from_logs(streaks):
+        """
+        Recalcula (sin guardar) racha actual, más larga y último registro de
+        varias rachas con una sola consulta de sus logs en orden de fecha.
+        """
+        by_tracker = {streak.tracker_id: streak for streak in streaks}
+        for streak in streaks:
+            streak.current_streak = 0
+            streak.longest_streak = 0
+            streak.last_log_date = None
+
+        for tracker_id, log_date, completion_level in HabitLog.objects.filter(
+            tracker_id__in=by_tracker
+        ).order_by('tracker_id', 'date').values_list('tracker_id', 'date', 'completion_level'):
+            HabitStreakService.advance(by_tracker[tracker_id], log_date, completion_level)
+        return streaks
+
+
+class HabitLogBatchService:
+    """
+    Registro de varios hábitos del mismo día en una sola transacción
+    """
+
+    @staticmethod
+    def validate_items(user, items):
+        """
+        Valida los elementos y resuelve todos los trackers con una consulta.
+        Devuelve (válidos, resultados): válidos es [(índice, tracker, nivel, notas)]
+        y resultados tiene una entrada por elemento (los errores ya rellenos).
+        """
+        results = [{'index': index} for index in range(len(items))]
+        parsed = []
+        tracker_ids = set()
+        habit_ids = set()
+
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index]['error'] = 'Elemento inválido'
+                continue
+
+            try:
+                completion_level = int(item.get('completion_level'))
+                if completion_level < 0 or completion_level > 3:
+                    raise ValueError()
+            except (TypeError, ValueError):
+                results[index]['error'] = 'completion_level debe ser un número entre 0 y 3'
+                continue
+
+            tracker_id = item.get('tracker_id')
+            habit_id = item.get('habit_id')
+            if not tracker_id and not habit_id:
+                results[index]['error'] = 'Se requiere tracker_id o habit_id'
+                continue
+            try:
+                tracker_id = int(tracker_id) if tracker_id else None
+                habit_id = int(habit_id) if habit_id and not tracker_id else None
+            except (TypeError, ValueError):
+                results[index]['error'] = 'tracker_id o habit_id inválido'
+                continue
+
+            if tracker_id:
+                tracker_ids.add(tracker_id)
+            else:
+                habit_ids.add(habit_id)
+
+            parsed.append((index, tracker_id, habit_id, completion_level, item.get('notes', '')))
+
+        trackers = HabitTracker.objects.filter(
+            Q(id__in=tracker_ids) | Q(habit_id__in=habit_ids),
+            user=user,
+            is_active=True
+        ) if parsed else []
+        by_id = {tracker.id: tracker for tracker in trackers}
+        by_habit = {tracker.habit_id: tracker for tracker in by_id.values()}
+
+        valid = []
+        seen = {}
+        for index, tracker_id, habit_id, completion_level, notes in parsed:
+            tracker = by_id.get(tracker_id) if tracker_id else by_habit.get(habit_id)
+            if tracker is None:
+                results[index]['error'] = 'No se encontró el tracker del hábito'
+                continue
+            if tracker.id in seen:
+                # El último registro del mismo hábito en el lote es el que vale
+                previous = seen[tracker.id]
+                results[previous]['error'] = 'Hábito repetido en el lote'
+                valid = [entry for entry in valid if entry[0] != previous]
+            seen[tracker.id] = index
+            results[index]['tracker_id'] = tracker.id
+            valid.append((index, tracker, completion_level, notes))
+
+        return valid, results
+
+    @staticmethod
+    def log_many(user, date, valid):
+        """
+        Guarda los registros válidos: un upsert en bloque de HabitLog (que
+        actualiza el bitmap de cumplimiento) y las rachas en bloque.
+        Devuelve {tracker_id: (log, creado)}.
+        """
+        tracker_ids = [tracker.id for _, tracker, _, _ in valid]
+        existing_ids = set(
+            HabitLog.objects.filter(tracker_id__in=tracker_ids, date=date).values_list('tracker_id', flat=True)
+        )
+
+        now = timezone.now()
+        with transaction.atomic():
+            HabitLog.objects.bulk_create(
+                [
+                    HabitLog(
+                        tracker=tracker,
+                        user=user,
+                        date=date,
+                        completion_level=completion_level,
+                        notes=notes,
+                        client_updated_at=now
+                    )
+                    for _, tracker, completion_level, notes in valid
+                ],
+                update_conflicts=True,
+                unique_fields=['tracker', 'date'],
+                update_fields=['completion_level', 'notes', 'client_updated_at', 'updated_at']
+            )
+            HabitStreakService.advance_many(
+                {tracker.id: completion_level for _, tracker, completion_level, _ in valid},
+                date
+            )
+
+        logs = HabitLog.objects.filter(tracker_id__in=tracker_ids, date=date).select_related('tracker')
+        return {log.tracker_id: (log, log.tracker_id not in existing_ids) for log in logs}
+
+
+SYNC_CURSOR_SALT = 'habits.sync'
+# Margen para filas escritas por transacciones que confirmaron después de emitir el cursor
+SYNC_OVERLAP_SECONDS = 5
+
+
+class HabitSyncService:
+    """
+    Sincronización incremental para el registro offline de hábitos.
+
+    El cursor es un instante del servidor firmado (opaco para el cliente).
+    GET devuelve solo las filas con updated_at posterior; POST aplica un lote de
+    escrituras offline con clave de idempotencia y "gana la última escritura"
+    por (tracker, fecha) comparando la hora de edición del cliente con la
+    client_updated_at guardada (updated_at es solo la marca del servidor).
+    """
+
+    @staticmethod
+    def issue_cursor(at):
+        return signing.dumps(at.isoformat(), salt=SYNC_CURSOR_SALT)
+
+    @staticmethod
+    def parse_cursor(token):
+        """Instante del cursor; ValueError si el cursor no es válido"""
+        try:
+            return datetime.fromisoformat(signing.loads(token, salt=SYNC_CURSOR_SALT))
+        except (signing.BadSignature, TypeError, ValueError):
+            raise ValueError('Cursor inválido')
+
+    @staticmethod
+    def changes_since(user, since=None):
+        """
+        Trackers, logs, rachas y notas del usuario modificados desde since
+        (todo si since es None) y el cursor para la siguiente sincronización.
+        """
+        from .serializers import HabitTrackerSerializer, HabitLogSerializer, HabitStreakSerializer, DailyNoteSerializer
+
+        now = timezone.now()
+        changed = {}
+        if since is not None:
+            changed = {'updated_at__gt': since - timedelta(seconds=SYNC_OVERLAP_SECONDS)}
+
+        trackers = HabitTracker.objects.filter(user=user, **changed).select_related(
+            'habit'
+        ).prefetch_related('habit__options')
+        logs = HabitLog.objects.filter(user=user, **changed).select_related('tracker__habit')
+        streaks = HabitStreak.objects.filter(tracker__user=user, **changed)
+        notes = DailyNote.objects.filter(user=user, **changed)
+
+        return {
+            'cursor': HabitSyncService.issue_cursor(now),
+            'full': since is None,
+            'trackers': [
+                {key: value for key, value in HabitTrackerSerializer(tracker).data.items() if key != 'streak'}
+                for tracker in trackers
+            ],
+            'logs': HabitLogSerializer(logs, many=True).data,
+            'streaks': [
+                {'tracker_id': streak.tracker_id, **HabitStreakSerializer(streak).data}
+                for streak in streaks
+            ],
+            'daily_notes': DailyNoteSerializer(notes, many=True).data,
+        }
+
+    @staticmethod
+    def _parse_change(change, trackers):
+        """Valida una escritura offline; devuelve (datos, error)"""
+        if change.get('type') not in ('log', 'note'):
+            return None, 'type debe ser log o note'
+        try:
+            target_date = datetime.strptime(str(change.get('date')), '%Y-%m-%d').date()
+        except ValueError:
+            return None, 'Formato de fecha inválido. Use YYYY-MM-DD'
+
+        client_updated_at = timezone.now()
+        if change.get('client_updated_at'):
+            try:
+                client_updated_at = datetime.fromisoformat(change['client_updated_at'])
+            except (TypeError, ValueError):
+                return None, 'client_updated_at inválido'
+            if timezone.is_naive(client_updated_at):
+                client_updated_at = timezone.make_aware(client_updated_at, dt_timezone.utc)
+
+        parsed = {'type': change['type'], 'date': target_date, 'client_updated_at': client_updated_at}
+        if change['type'] == 'note':
+            parsed['notes'] = change.get('notes', '')
+            parsed['all_habits_completed'] = bool(change.get('all_completed', True))
+            return parsed, None
+
+        try:
+            completion_level = int(change.get('completion_level'))
+            if completion_level < 0 or completion_level > 3:
+                raise ValueError()
+        except (TypeError, ValueError):
+            return None, 'completion_level debe ser un número entre 0 y 3'
+        try:
+            tracker = trackers.get(int(change.get('tracker_id')))
+        except (TypeError, ValueError):
+            tracker = None
+        if tracker is None:
+            return None, 'No se encontró el tracker del hábito'
+
+        parsed.update({'tracker': tracker, 'completion_level': completion_level, 'notes': change.get('notes', '')})
+        return parsed, None
+
+    @staticmethod
+    def apply(user, changes):
+        """
+        Aplica un lote de escrituras offline. Devuelve (resultados, fechas con
+        logs escritos); cada resultado es applied, stale (el servidor tiene una
+        versión más reciente, que se devuelve) o error.
+        """
+        from .serializers import HabitLogSerializer, DailyNoteSerializer
+        from .models import SyncReceipt
+
+        keys = [str(change.get('idempotency_key') or '') if isinstance(change, dict) else '' for change in changes]
+        receipts = dict(
+            SyncReceipt.objects.filter(user=user, idempotency_key__in=[key for key in keys if key]).values_list(
+                'idempotency_key', 'result'
+            )
+        )
+        trackers = {tracker.id: tracker for tracker in HabitTracker.objects.filter(user=user, is_active=True)}
+
+        results = [None] * len(changes)
+        pending = {}
+        for index, (key, change) in enumerate(zip(keys, changes)):
+            if key in receipts:
+                results[index] = receipts[key]
+                continue
+            if not key or len(key) > 64:
+                results[index] = {'idempotency_key': key, 'status': 'error', 'error': 'Se requiere idempotency_key (máx. 64)'}
+                continue
+            if key in pending:
+                continue
+            parsed, error = HabitSyncService._parse_change(change, trackers)
+            if error:
+                results[index] = {'idempotency_key': key, 'status': 'error', 'error': error}
+                continue
+            pending[key] = parsed
+
+        # La escritura más reciente del cliente por (tracker, fecha) o fecha de nota
+        latest = {}
+        for key, parsed in pending.items():
+            target = (parsed['tracker'].id, parsed['date']) if parsed['type'] == 'log' else ('note', parsed['date'])
+            if target not in latest or parsed['client_updated_at'] >= pending[latest[target]]['client_updated_at']:
+                latest[target] = key
+        winners = set(latest.values())
+
+        log_targets = [target for target in latest if target[0] != 'note']
+        note_dates = [target[1] for target in latest if target[0] == 'note']
+        written_dates = set()
+        status_by_key = {}
+
+        with transaction.atomic():
+            current_logs = {
+                (log.tracker_id, log.date): log.client_updated_at
+                for log in HabitLog.objects.select_for_update().filter(
+                    tracker_id__in={tracker_id for tracker_id, _ in log_targets},
+                    date__in={log_date for _, log_date in log_targets}
+                )
+            }
+            current_notes = dict(
+                DailyNote.objects.select_for_update().filter(user=user, date__in=note_dates).values_list(
+                    'date', 'client_updated_at'
+                )
+            )
+
+            new_logs = []
+            new_notes = []
+            for key, parsed in pending.items():
+                if key not in winners:
+                    status_by_key[key] = 'stale'
+                    continue
+                if parsed['type'] == 'log':
+                    server_updated_at = current_logs.get((parsed['tracker'].id, parsed['date']))
+                else:
+                    server_updated_at = current_notes.get(parsed['date'])
+                if server_updated_at and parsed['client_updated_at'] < server_updated_at:
+                    # El servidor ya tiene una edición posterior del cliente
+                    status_by_key[key] = 'stale'
+                    continue
+
+                status_by_key[key] = 'applied'
+                if parsed['type'] == 'log':
+                    new_logs.append(HabitLog(
+                        tracker=parsed['tracker'],
+                        user=user,
+                        date=parsed['date'],
+                        completion_level=parsed['completion_level'],
+                        notes=parsed['notes'],
+                        client_updated_at=parsed['client_updated_at']
+                    ))
+                else:
+                    new_notes.append(DailyNote(
+                        user=user,
+                        date=parsed['date'],
+                        notes=parsed['notes'],
+                        all_habits_completed=parsed['all_habits_completed'],
+                        client_updated_at=parsed['client_updated_at']
+                    ))
+
+            if new_logs:
+                HabitLog.objects.bulk_create(
+                    new_logs,
+                    update_conflicts=True,
+                    unique_fields=['tracker', 'date'],
+                    update_fields=['completion_level', 'notes', 'client_updated_at', 'updated_at']
+                )
+                # Rachas en orden de fecha (las fechas atrasadas se reconstruyen)
+                levels_by_date = {}
+                for log in new_logs:
+                    levels_by_date.setdefault(log.date, {})[log.tracker_id] = log.completion_level
+                for log_date in sorted(levels_by_date):
+                    HabitStreakService.advance_many(levels_by_date[log_date], log_date)
+                written_dates = set(levels_by_date)
+
+            if new_notes:
+                DailyNote.objects.bulk_create(
+                    new_notes,
+                    update_conflicts=True,
+                    unique_fields=['user', 'date'],
+                    update_fields=['notes', 'all_habits_completed', 'client_updated_at', 'updated_at']
+                )
+
+            # Estado final de cada fila tocada (aplicada o más reciente en el servidor)
+            logs = {
+                (log.tracker_id, log.date): HabitLogSerializer(log).data
+                for log in HabitLog.objects.filter(
+                    tracker_id__in={tracker_id for tracker_id, _ in log_targets},
+                    date__in={log_date for _, log_date in log_targets}
+                ).select_related('tracker__habit')
+            }
+            notes = {
+                note.date: DailyNoteSerializer(note).data
+                for note in DailyNote.objects.filter(user=user, date__in=note_dates)
+            }
+
+            new_receipts = []
+            for key, parsed in pending.items():
+                result = {'idempotency_key': key, 'status': status_by_key[key]}
+                if parsed['type'] == 'log':
+                    result['log'] = logs.get((parsed['tracker'].id, parsed['date']))
+                else:
+                    result['note'] = notes.get(parsed['date'])
+                receipts[key] = result
+                new_receipts.append(SyncReceipt(user=user, idempotency_key=key, result=result))
+            SyncReceipt.objects.bulk_create(new_receipts, ignore_conflicts=True)
+
+        for index, key in enumerate(keys):
+            if results[index] is None:
+                results[index] = receipts[key]
+        return results, sorted(written_dates)
+
+
+NOTES_MONTHS_DEFAULT = 6
+NOTES_MONTHS_MAX = 24
+
+
+class DailyNoteService:
+    """
+    Consultas de notas diarias agregadas en la base de datos
+    """
+
+    @staticmethod
+    def summary(user, today):
+        """Total de notas, notas del mes actual y fecha de la última, en una sola consulta"""
+        return DailyNote.objects.filter(user=user).aggregate(
+            total=Count('id'),
+            current_month=Count('id', filter=Q(date__gte=today.replace(day=1), date__lte=today)),
+            last_date=Max('date')
+        )
+
+    @staticmethod
+    def parse_month(value):
+        """'YYYY-MM' -> primer día del mes (ValueError si el formato no es válido)"""
+        return datetime.strptime(value, '%Y-%m').date()
+
+    @staticmethod
+    def monthly_page(user, before=None, limit=NOTES_MONTHS_DEFAULT):
+        """
+        Página de meses con notas, del más reciente al más antiguo.
+        before es el primer día del mes a partir del cual (excluido) se pagina;
+        con limit=None se devuelven todos los meses.
+        Dos consultas: meses agrupados con TruncMonth y notas de esos meses.
+        Devuelve (meses, cursor 'YYYY-MM' de la siguiente página o None).
+        """
+        months_query = DailyNote.objects.filter(user=user)
+        if before is not None:
+            months_query = months_query.filter(date__lt=before)
+        months = list(
+            months_query.annotate(
+                month=TruncMonth('date')
+            ).values('month').annotate(
+                count=Count('id'),
+                completed_count=Count('id', filter=Q(all_habits_completed=True))
+            ).order_by('-month')[:None if limit is None else limit + 1]
+        )
+
+        next_before = None
+        if limit is not None and len(months) > limit:
+            months = months[:limit]
+            next_before = months[-1]['month'].strftime('%Y-%m')
+        if not months:
+            return [], None
+
+        page = {}
+        for month in months:
+            page[month['month']] = {
+                'month': month['month'].strftime('%B %Y'),
+                'month_key': month['month'].strftime('%Y-%m'),
+                'count': month['count'],
+                'completed_count': month['completed_count'],
+                'notes': []
+            }
+
+        notes = DailyNote.objects.filter(
+            user=user,
+            date__gte=months[-1]['month'],
+        ).order_by('-date').values('id', 'date', 'notes', 'all_habits_completed')
+        if before is not None:
+            notes = notes.filter(date__lt=before)
+
+        for note in notes:
+            page[note['date'].replace(day=1)]['notes'].append(note)
+
+        return list(page.values()), next_before
@@ -0,0 +1,44 @@
+# habits/tests/conftest.py
+import pytest
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from cycles.models import UserCycle
+from gamification.models import UserLevel
+from habits.models import HabitTracker
+from questionnaires.models import HabitQuestion
+
+
+@pytest.fixture
+def user_with_trackers():
+    """Usuario con ciclo activo, nivel y tres hábitos en seguimiento"""
+    user = User.objects.create_user(username='habituser')
+    cycle = UserCycle.objects.create(
+        user=user,
+        cycle_number=1,
+        start_date=timezone.now(),
+        end_date=timezone.now() + timedelta(days=30),
+        status='ACTIVE'
+    )
+    UserLevel.objects.create(user=user, current_cycle=cycle, current_level='NOVATO')
+
+    trackers = [
+        HabitTracker.objects.create(
+            user=user,
+            habit=HabitQuestion.objects.create(habit_type=f'HABIT_{i}', text=f'Hábito {i}'),
+            is_promoted=(i == 0)
+        )
+        for i in range(3)
+    ]
+    return user, trackers
+
+
+@pytest.fixture
+def habits_client(user_with_trackers):
+    """Cliente autenticado con token del usuario con hábitos"""
+    user, _ = user_with_trackers
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+    return client
@@ -0,0 +1,155 @@
+# habits/tests/test_analytics.py
+import pytest
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from cycles.models import UserCycle
+from habits.models import HabitLog
+
+
+@pytest.mark.django_db
+class TestHabitAnalyticsView:
+    """Tests para la analítica de adherencia"""
+
+    @pytest.fixture
+    def two_weeks(self, user_with_trackers):
+        """Ciclo de 14 días: un hábito siempre cumplido y otro solo la última semana"""
+        user, trackers = user_with_trackers
+        today = timezone.now().date()
+        UserCycle.objects.filter(user=user).update(start_date=timezone.now() - timedelta(days=13))
+        days = [today - timedelta(days=offset) for offset in range(13, -1, -1)]
+
+        HabitLog.objects.bulk_create(
+            [HabitLog(tracker=trackers[0], user_id=trackers[0].user_id, date=day, completion_level=3) for day in days] +
+            [HabitLog(tracker=trackers[1], user_id=trackers[1].user_id, date=day, completion_level=2) for day in days[7:]] +
+            [HabitLog(tracker=trackers[1], user_id=trackers[1].user_id, date=day, completion_level=0) for day in days[:7]]
+        )
+        return user, trackers, days
+
+    def test_adherence_metrics(self, two_weeks, habits_client):
+        """Test tasas, media móvil, días de la semana y tendencia por hábito"""
+        _, trackers, days = two_weeks
+
+        response = habits_client.get(reverse('habits-analytics'), {'cycle': 1})
+
+        assert response.status_code == 200
+        assert response.data['days'] == 14
+        habits = {habit['tracker_id']: habit for habit in response.data['habits']}
+
+        steady, improving, untouched = (habits[t.id] for t in trackers)
+        assert (steady['adherence_rate'], steady['trend_per_week']) == (1.0, 0.0)
+        assert steady['weekday_rates'] == [1.0] * 7
+        assert (improving['adherence_rate'], improving['logged_rate']) == (0.5, 1.0)
+        assert improving['trend_per_week'] > 0
+        assert improving['moving_average_7d'][6] == 0.0
+        assert improving['moving_average_7d'][-1] == 1.0
+        assert len(improving['moving_average_7d']) == 14
+        assert (untouched['adherence_rate'], untouched['average_level']) == (0.0, 0.0)
+
+    def test_cached_per_data_version(self, two_weeks, habits_client, settings, django_assert_num_queries):
+        """Test una segunda consulta sale de caché y un log nuevo cambia la versión"""
+        _, trackers, days = two_weeks
+        settings.GAMIFICATION_CACHE_ALIAS = 'locmem'
+        caches['locmem'].clear()
+        url = reverse('habits-analytics')
+
+        habits_client.get(url)
+        # Autenticación, ciclo y versión de datos
+        with django_assert_num_queries(3):
+            habits_client.get(url)
+
+        HabitLog.objects.filter(tracker=trackers[1], date=days[0]).update(completion_level=3, updated_at=timezone.now())
+        response = habits_client.get(url)
+        habits = {habit['tracker_id']: habit for habit in response.data['habits']}
+        assert habits[trackers[1].id]['adherence_rate'] == round(8 / 14, 3)
+
+    def test_cache_follows_window_end_of_ongoing_cycle(self, two_weeks, habits_client, settings, monkeypatch):
+        """Test en un ciclo en curso la ventana cacheada avanza con la fecha"""
+        settings.GAMIFICATION_CACHE_ALIAS = 'locmem'
+        caches['locmem'].clear()
+        url = reverse('habits-analytics')
+
+        assert habits_client.get(url).data['days'] == 14
+
+        later = timezone.now() + timedelta(days=3)
+        monkeypatch.setattr(timezone, 'now', lambda: later)
+        assert habits_client.get(url).data['days'] == 17
+
+    def test_unknown_cycle(self, user_with_trackers, habits_client):
+        """Test un ciclo inexistente devuelve 404"""
+        response = habits_client.get(reverse('habits-analytics'), {'cycle': 9})
+        assert response.status_code == 404
+
+
+def decode_calendar(entry, days):
+    """Decodifica levels/logged de un tracker a {día: nivel}"""
+    import base64
+    levels = base64.b64decode(entry['levels'])
+    logged = base64.b64decode(entry['logged'])
+    return {
+        day: (levels[day // 4] >> (2 * (day % 4))) & 3
+        for day in range(days)
+        if logged[day // 8] >> (day % 8) & 1
+    }
+
+
+@pytest.mark.django_db
+class TestHabitCalendarView:
+    """Tests para el calendario compacto"""
+
+    def test_packed_levels_round_trip(self, user_with_trackers, habits_client):
+        """Test los niveles empaquetados se decodifican igual que los logs"""
+        _, trackers = user_with_trackers
+        today = timezone.now().date()
+        start = today - timedelta(days=9)
+        HabitLog.objects.bulk_create([
+            HabitLog(tracker=trackers[0], user_id=trackers[0].user_id, date=start, completion_level=0),
+            HabitLog(tracker=trackers[0], user_id=trackers[0].user_id, date=start + timedelta(days=5), completion_level=2),
+            HabitLog(tracker=trackers[1], user_id=trackers[1].user_id, date=today, completion_level=3),
+            HabitLog(tracker=trackers[1], user_id=trackers[1].user_id, date=start - timedelta(days=1), completion_level=3),
+        ])
+
+        response = habits_client.get(reverse('habits-calendar'), {'from': start.isoformat(), 'to': today.isoformat()})
+
+        assert response.status_code == 200
+        assert (response.data['origin'], response.data['days']) == (start.isoformat(), 10)
+        by_id = {entry['tracker_id']: entry for entry in response.data['trackers']}
+        assert decode_calendar(by_id[trackers[0].id], 10) == {0: 0, 5: 2}
+        assert decode_calendar(by_id[trackers[1].id], 10) == {9: 3}
+        assert decode_calendar(by_id[trackers[2].id], 10) == {}
+
+    def test_full_year_payload_is_small(self, user_with_trackers, habits_client, django_assert_num_queries):
+        """Test un año completo de hábitos ocupa pocos KB y sale de una consulta"""
+        _, trackers = user_with_trackers
+        today = timezone.now().date()
+        HabitLog.objects.bulk_create([
+            HabitLog(tracker=tracker, user_id=tracker.user_id, date=today - timedelta(days=offset), completion_level=offset % 4)
+            for tracker in trackers
+            for offset in range(365)
+        ])
+
+        # Autenticación y la consulta del calendario
+        with django_assert_num_queries(2):
+            response = habits_client.get(reverse('habits-calendar'))
+
+        assert response.data['days'] == 365
+        assert len(response.content) < 2048
+        assert decode_calendar(response.data['trackers'][0], 365)[364] == 0
+
+    def test_invalid_range(self, habits_client):
+        """Test un rango invertido devuelve 400"""
+        response = habits_client.get(reverse('habits-calendar'), {'from': '2024-02-01', 'to': '2024-01-01'})
+        assert response.status_code == 400
+
+    def test_user_without_trackers(self):
+        """Test un usuario sin hábitos (onboarding sin terminar) recibe un calendario vacío"""
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(username='sinhabitos'))
+
+        response = client.get(reverse('habits-calendar'))
+
+        assert response.status_code == 200
+        assert response.data['trackers'] == []
@@ -0,0 +1,107 @@
+# habits/tests/test_models.py
+import pytest
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from gamification.batch import GamificationBatchService
+from habits.analytics import HabitAnalyticsService
+from habits.heatmap import HabitCalendarService
+from habits.models import HabitLog, HabitTracker
+
+# Índices de HabitLog: (user, date) y la restricción única (tracker, date)
+HABITLOG_INDEXES = ('habitlog_user_date_idx', 'tracker_id_date')
+
+
+def habitlog_plans(run):
+    """Planes de ejecución de las consultas sobre HabitLog que lanza run()"""
+    with CaptureQueriesContext(connection) as context:
+        run()
+    plans = []
+    for query in context.captured_queries:
+        if 'habits_habitlog' in query['sql']:
+            with connection.cursor() as cursor:
+                cursor.execute(connection.ops.explain_query_prefix() + ' ' + query['sql'])
+                plans.append('\n'.join(' '.join(map(str, row)) for row in cursor.fetchall()))
+    return plans
+
+
+@pytest.mark.django_db
+class TestHabitLogUser:
+    """Tests para el usuario desnormalizado en HabitLog"""
+
+    def test_save_fills_user_from_tracker(self, user_with_trackers):
+        """Test el usuario se copia del tracker al guardar"""
+        user, trackers = user_with_trackers
+        log = HabitLog.objects.create(tracker=trackers[0], date=timezone.now().date(), completion_level=2)
+
+        assert log.user_id == user.id
+        assert HabitLog.objects.filter(user=user).count() == 1
+
+    def test_save_always_takes_user_from_tracker(self, user_with_trackers):
+        """Test un usuario distinto al del tracker se corrige al guardar"""
+        user, trackers = user_with_trackers
+        other = User.objects.create_user(username='otro')
+        log = HabitLog(tracker=trackers[0], user=other, date=timezone.now().date(), completion_level=1)
+        log.save()
+
+        assert log.user_id == user.id
+
+        # Mover el log a un tracker de otro usuario también actualiza el usuario
+        log.tracker = HabitTracker.objects.create(user=other, habit=trackers[0].habit)
+        log.save()
+        log.refresh_from_db()
+        assert log.user_id == other.id
+
+    def test_user_date_filter_uses_index_without_join(self, user_with_trackers):
+        """Test la consulta por (usuario, fecha) usa el índice compuesto sin unir con trackers"""
+        user, _ = user_with_trackers
+        queryset = HabitLog.objects.filter(user=user, date=timezone.now().date())
+
+        assert 'habits_habittracker' not in str(queryset.query)
+        assert 'habitlog_user_date_idx' in queryset.explain()
+
+
+@pytest.mark.django_db
+class TestHabitLogIndexCoverage:
+    """Las consultas por (usuario, fecha) de calendario, analítica y lotes usan índices"""
+
+    @pytest.fixture
+    def logs(self, user_with_trackers):
+        user, trackers = user_with_trackers
+        today = timezone.now().date()
+        HabitLog.objects.bulk_create([
+            HabitLog(tracker=tracker, user=user, date=today - timedelta(days=days_ago), completion_level=2)
+            for tracker in trackers
+            for days_ago in range(5)
+        ])
+        return user, today
+
+    def assert_indexed(self, plans):
+        assert plans
+        for plan in plans:
+            assert any(index in plan for index in HABITLOG_INDEXES), plan
+
+    def test_calendar_uses_index(self, logs):
+        """Test el calendario busca los logs por (tracker, fecha)"""
+        user, today = logs
+        self.assert_indexed(habitlog_plans(
+            lambda: HabitCalendarService.packed(user, today - timedelta(days=30), today)
+        ))
+
+    def test_analytics_uses_index(self, logs):
+        """Test la versión de datos y el cálculo de la analítica usan (usuario, fecha)"""
+        user, today = logs
+        start = today - timedelta(days=30)
+        self.assert_indexed(habitlog_plans(lambda: (
+            HabitAnalyticsService.data_version(user, start, today),
+            HabitAnalyticsService.compute(user, start, today)
+        )))
+
+    def test_batch_recompute_uses_index(self, logs):
+        """Test el recálculo por lotes lee los logs por (usuario, fecha)"""
+        user, today = logs
+        self.assert_indexed(habitlog_plans(
+            lambda: GamificationBatchService.recompute_users([user.id], [today], dry_run=True)
+        ))
@@ -0,0 +1,400 @@
+# habits/tests/test_views.py
+import pytest
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from gamification.models import DailyPoints
+from gamification.services import GamificationService
+from gamification.streaks import StreakEngine
+from habits.models import HabitTracker, HabitLog, HabitStreak, DailyNote, SyncReceipt
+from habits.serializers import HabitLogSerializer, DailyNoteSerializer
+
+
+@pytest.mark.django_db
+class TestHabitLogBatchView:
+    """Tests para el registro de hábitos por lotes"""
+
+    def test_batch_logs_all_habits_and_processes_gamification_once(self, user_with_trackers, habits_client, monkeypatch):
+        """Test el lote guarda logs, rachas y bitmap y procesa la gamificación una vez"""
+        user, trackers = user_with_trackers
+        calls = []
+        original = GamificationService.process_daily_gamification
+
+        def counting(*args, **kwargs):
+            calls.append(kwargs.get('target_date'))
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(GamificationService, 'process_daily_gamification', counting)
+
+        response = habits_client.post(reverse('log-habit-batch'), {
+            'logs': [
+                {'tracker_id': trackers[0].id, 'completion_level': 3},
+                {'habit_id': trackers[1].habit_id, 'completion_level': 2, 'notes': 'Bien'},
+                {'tracker_id': trackers[2].id, 'completion_level': 3},
+                {'tracker_id': 999999, 'completion_level': 3},
+                {'tracker_id': trackers[2].id, 'completion_level': 7},
+            ]
+        }, format='json')
+
+        assert response.status_code == 201
+        assert response.data['logged'] == 3
+        assert response.data['failed'] == 2
+        assert [r.get('error') for r in response.data['results'][3:]] == [
+            'No se encontró el tracker del hábito',
+            'completion_level debe ser un número entre 0 y 3',
+        ]
+        assert all(r['created'] for r in response.data['results'][:3])
+        assert len(calls) == 1
+
+        today = timezone.now().date()
+        daily = DailyPoints.objects.get(user=user, date=today)
+        assert daily.habits_completed == 3
+        assert response.data['gamification']['points_earned_today'] == daily.total_points
+        assert HabitLog.objects.get(tracker=trackers[1], date=today).notes == 'Bien'
+        assert set(HabitStreak.objects.values_list('current_streak', flat=True)) == {1}
+        assert StreakEngine.completion_bits(user).streak_ending(today) == 1
+
+    def test_batch_updates_existing_logs_and_streaks(self, user_with_trackers, habits_client):
+        """Test un segundo lote actualiza los logs existentes y continúa las rachas"""
+        user, trackers = user_with_trackers
+        today = timezone.now().date()
+        yesterday = today - timedelta(days=1)
+        url = reverse('log-habit-batch')
+
+        habits_client.post(url, {
+            'date': yesterday.isoformat(),
+            'logs': [{'tracker_id': t.id, 'completion_level': 3} for t in trackers]
+        }, format='json')
+        habits_client.post(url, {
+            'logs': [{'tracker_id': t.id, 'completion_level': 2} for t in trackers]
+        }, format='json')
+        response = habits_client.post(url, {
+            'logs': [{'tracker_id': t.id, 'completion_level': 3} for t in trackers]
+        }, format='json')
+
+        assert response.status_code == 201
+        assert not any(r['created'] for r in response.data['results'])
+        assert HabitLog.objects.filter(date=today, completion_level=3).count() == 3
+        assert DailyPoints.objects.get(user=user, date=today).habits_completed == 3
+        # Volver a registrar el mismo día no cuenta dos veces
+        assert set(HabitStreak.objects.values_list('current_streak', 'longest_streak')) == {(2, 2)}
+
+    def test_batch_rejects_when_no_valid_items(self, habits_client):
+        """Test un lote sin registros válidos devuelve 400 con el detalle por elemento"""
+        response = habits_client.post(reverse('log-habit-batch'), {
+            'logs': [{'completion_level': 2}]
+        }, format='json')
+
+        assert response.status_code == 400
+        assert response.data['results'][0]['error'] == 'Se requiere tracker_id o habit_id'
+        assert not HabitLog.objects.exists()
+
+
+@pytest.mark.django_db
+class TestUpsertWrites:
+    """Tests para las escrituras por día con upsert"""
+
+    def test_relogging_habit_updates_same_row(self, user_with_trackers, habits_client):
+        """Test registrar dos veces el mismo hábito actualiza la fila y conserva logged_at"""
+        user, trackers = user_with_trackers
+        url = reverse('log-habit')
+
+        habits_client.post(url, {'tracker_id': trackers[0].id, 'completion_level': 1}, format='json')
+        first = HabitLog.objects.get(tracker=trackers[0])
+        response = habits_client.post(url, {'tracker_id': trackers[0].id, 'completion_level': 3}, format='json')
+
+        assert response.status_code == 201
+        assert response.data['habit_data']['id'] == first.id
+        log = HabitLog.objects.get(tracker=trackers[0])
+        assert (log.completion_level, log.logged_at) == (3, first.logged_at)
+        # La respuesta muestra la fila guardada, no la hora del reintento
+        assert response.data['habit_data']['logged_at'] == HabitLogSerializer(first).data['logged_at']
+        # Re-registrar el día reconstruye la racha desde los logs
+        assert HabitStreak.objects.get(tracker=trackers[0]).current_streak == 1
+        assert StreakEngine.completion_bits(user).perfect_days_between(log.date, log.date) == 1
+
+    def test_daily_note_upsert(self, user_with_trackers, habits_client):
+        """Test guardar la nota del día dos veces deja una sola nota con el último texto"""
+        user, _ = user_with_trackers
+        url = reverse('daily-notes')
+
+        habits_client.post(url, {'notes': 'Primera'}, format='json')
+        first = DailyNote.objects.get(user=user)
+        response = habits_client.post(url, {'notes': 'Segunda'}, format='json')
+
+        assert response.status_code == 201
+        assert response.data['data']['notes'] == 'Segunda'
+        assert response.data['data']['created_at'] == DailyNoteSerializer(first).data['created_at']
+        assert list(DailyNote.objects.filter(user=user).values_list('notes', flat=True)) == ['Segunda']
+
+
+@pytest.mark.django_db
+class TestBackdatedHabitLogs:
+    """Tests para registros atrasados y el recálculo de los días siguientes"""
+
+    def _log_day(self, client, trackers, day, level=3):
+        return client.post(reverse('log-habit-batch'), {
+            'date': day.isoformat(),
+            'logs': [{'tracker_id': t.id, 'completion_level': level} for t in trackers]
+        }, format='json')
+
+    def test_filling_missed_day_recomputes_following_streaks(self, user_with_trackers, habits_client):
+        """Test rellenar un día olvidado actualiza rachas y puntos de los días posteriores"""
+        user, trackers = user_with_trackers
+        today = timezone.now().date()
+        days = [today - timedelta(days=offset) for offset in (3, 2, 1, 0)]
+        for day in (days[0], days[2], days[3]):
+            self._log_day(habits_client, trackers, day)
+
+        before = dict(DailyPoints.objects.filter(user=user).values_list('date', 'streak_on_date'))
+        assert [before[day] for day in (days[0], days[2], days[3])] == [1, 1, 2]
+
+        response = habits_client.post(reverse('log-habit'), {
+            'tracker_id': trackers[0].id,
+            'date': days[1].isoformat(),
+            'completion_level': 3
+        }, format='json')
+        assert response.status_code == 201
+        self._log_day(habits_client, trackers[1:], days[1])
+
+        after = dict(DailyPoints.objects.filter(user=user).values_list('date', 'streak_on_date'))
+        assert [after[day] for day in days] == [1, 2, 3, 4]
+        assert DailyPoints.objects.get(user=user, date=today).bonus_streak == \
+            GamificationService.score_day([(3, False)], 4)['bonus_streak']
+        assert set(HabitStreak.objects.values_list('current_streak', 'longest_streak', 'last_log_date')) == {(4, 4, today)}
+
+        level = user.gamification_level
+        level.refresh_from_db()
+        assert level.current_streak == 4
+        assert level.total_points_all_time == sum(DailyPoints.objects.filter(user=user).values_list('total_points', flat=True))
+
+    def test_backdated_break_stops_at_chain_end(self, user_with_trackers, habits_client):
+        """Test romper un día pasado solo recalcula hasta el siguiente día incompleto"""
+        user, trackers = user_with_trackers
+        today = timezone.now().date()
+        days = [today - timedelta(days=offset) for offset in (4, 3, 2, 1, 0)]
+        for day in days:
+            self._log_day(habits_client, trackers, day, level=1 if day == days[2] else 3)
+
+        assert HabitStreak.objects.values_list('current_streak', flat=True)[0] == 2
+        calls = []
+        original = GamificationService.update_daily_points
+
+        def recording(user, target_date=None):
+            calls.append(target_date)
+            return original(user, target_date)
+
+        GamificationService.update_daily_points = recording
+        try:
+            self._log_day(habits_client, trackers, days[0], level=1)
+        finally:
+            GamificationService.update_daily_points = original
+
+        after = dict(DailyPoints.objects.filter(user=user).values_list('date', 'streak_on_date'))
+        assert [after[day] for day in days] == [0, 1, 0, 1, 2]
+        # Solo el día editado pasa por el recálculo individual
+        assert calls == [days[0]]
+        assert set(HabitStreak.objects.values_list('current_streak', 'longest_streak')) == {(2, 2)}
+
+
+TODAY_QUERY_BUDGET = 9
+
+
+@pytest.mark.django_db
+class TestTodayView:
+    """Tests para la pantalla de inicio en una sola petición"""
+
+    def test_today_payload(self, user_with_trackers, habits_client):
+        """Test devuelve hábitos con log de hoy, completado, ciclo y gamificación"""
+        user, trackers = user_with_trackers
+        habits_client.post(reverse('log-habit'), {'tracker_id': trackers[0].id, 'completion_level': 3}, format='json')
+
+        response = habits_client.get(reverse('home-today'))
+
+        assert response.status_code == 200
+        by_id = {tracker['id']: tracker for tracker in response.data['trackers']}
+        assert by_id[trackers[0].id]['today_log']['completion_level'] == 3
+        assert by_id[trackers[0].id]['streak']['current_streak'] == 1
+        assert by_id[trackers[1].id]['today_log'] is None
+        assert response.data['completion'] == {
+            'has_habits': True,
+            'all_completed': False,
+            'modal_shown': False,
+            'completed_count': 1,
+            'total_habits': 3
+        }
+        assert response.data['cycle']['days_elapsed'] == 1
+        assert response.data['cycle']['needs_renewal'] is False
+        assert response.data['gamification']['cycle_number'] == 1
+
+    def test_today_query_budget(self, user_with_trackers, habits_client, django_assert_max_num_queries):
+        """Test el número de consultas no crece con el número de hábitos registrados"""
+        _, trackers = user_with_trackers
+        habits_client.post(reverse('log-habit-batch'), {
+            'logs': [{'tracker_id': t.id, 'completion_level': 3} for t in trackers]
+        }, format='json')
+        habits_client.post(reverse('daily-notes'), {'notes': 'Gran día'}, format='json')
+
+        with django_assert_max_num_queries(TODAY_QUERY_BUDGET):
+            response = habits_client.get(reverse('home-today'))
+
+        assert response.data['completion']['all_completed'] is True
+        assert response.data['completion']['modal_shown'] is True
+        assert response.data['daily_note']['notes'] == 'Gran día'
+
+
+@pytest.mark.django_db
+class TestHabitSyncView:
+    """Tests para la sincronización offline"""
+
+    def _age_rows(self):
+        """Lleva las filas existentes al pasado (fuera del margen del cursor)"""
+        past = timezone.now() - timedelta(hours=1)
+        for model in (HabitTracker, HabitLog, HabitStreak, DailyNote):
+            model.objects.update(updated_at=past)
+
+    def test_delta_sync_returns_only_changes(self, user_with_trackers, habits_client):
+        """Test con cursor solo se devuelven las filas modificadas después"""
+        _, trackers = user_with_trackers
+        url = reverse('habits-sync')
+        habits_client.post(reverse('log-habit'), {'tracker_id': trackers[0].id, 'completion_level': 2}, format='json')
+        self._age_rows()
+
+        full = habits_client.get(url)
+        assert full.data['full'] is True
+        assert (len(full.data['trackers']), len(full.data['logs']), len(full.data['streaks'])) == (3, 1, 1)
+
+        empty = habits_client.get(url, {'since': full.data['cursor']})
+        assert [empty.data[key] for key in ('trackers', 'logs', 'streaks', 'daily_notes')] == [[], [], [], []]
+
+        habits_client.post(reverse('log-habit'), {'tracker_id': trackers[1].id, 'completion_level': 3}, format='json')
+        delta = habits_client.get(url, {'since': empty.data['cursor']})
+        assert [log['tracker_id'] for log in delta.data['logs']] == [trackers[1].id]
+        assert [streak['tracker_id'] for streak in delta.data['streaks']] == [trackers[1].id]
+        assert delta.data['trackers'] == []
+
+        assert habits_client.get(url, {'since': 'manipulado'}).status_code == 400
+
+    def test_offline_edits_newer_than_client_edit_apply_after_server_writes(self, user_with_trackers, habits_client):
+        """Test ediciones offline posteriores a la última edición se aplican aunque el servidor escribiera después"""
+        user, trackers = user_with_trackers
+        url = reverse('habits-sync')
+        today = timezone.now().date()
+        logged_at = timezone.now() - timedelta(hours=3)
+        HabitLog.objects.create(tracker=trackers[0], date=today, completion_level=3, client_updated_at=logged_at)
+        # Escritura posterior del servidor (p. ej. un recálculo): solo cambia updated_at
+        HabitLog.objects.update(updated_at=timezone.now())
+
+        response = habits_client.post(url, {'changes': [
+            {'idempotency_key': 'edit-1', 'type': 'log', 'tracker_id': trackers[0].id, 'date': today.isoformat(),
+             'completion_level': 1, 'client_updated_at': (logged_at + timedelta(minutes=30)).isoformat()},
+            {'idempotency_key': 'edit-2', 'type': 'log', 'tracker_id': trackers[0].id, 'date': today.isoformat(),
+             'completion_level': 2, 'client_updated_at': (logged_at + timedelta(minutes=35)).isoformat()},
+        ]}, format='json')
+
+        assert [r['status'] for r in response.data['results']] == ['stale', 'applied']
+        log = HabitLog.objects.get(tracker=trackers[0], date=today)
+        assert log.completion_level == 2
+        assert log.client_updated_at == logged_at + timedelta(minutes=35)
+
+    def test_offline_writes_are_idempotent_and_last_writer_wins(self, user_with_trackers, habits_client):
+        """Test reintentos con la misma clave no reaplican y una escritura antigua no pisa una nueva"""
+        user, trackers = user_with_trackers
+        url = reverse('habits-sync')
+        yesterday = timezone.now().date() - timedelta(days=1)
+        changes = [
+            {'idempotency_key': f'k{t.id}', 'type': 'log', 'tracker_id': t.id,
+             'date': yesterday.isoformat(), 'completion_level': 3}
+            for t in trackers
+        ] + [{'idempotency_key': 'note-1', 'type': 'note', 'date': yesterday.isoformat(), 'notes': 'Offline'}]
+
+        first = habits_client.post(url, {'changes': changes}, format='json')
+        assert first.data['applied'] == 4
+        assert DailyPoints.objects.get(user=user, date=yesterday).habits_completed == 3
+        assert DailyNote.objects.get(user=user, date=yesterday).notes == 'Offline'
+
+        retry = habits_client.post(url, {'changes': changes}, format='json')
+        assert retry.data['results'] == first.data['results']
+        assert HabitLog.objects.count() == 3
+        assert SyncReceipt.objects.filter(user=user).count() == 4
+
+        stale_time = (timezone.now() - timedelta(hours=2)).isoformat()
+        response = habits_client.post(url, {'changes': [
+            {'idempotency_key': 'old', 'type': 'log', 'tracker_id': trackers[0].id,
+             'date': yesterday.isoformat(), 'completion_level': 0, 'client_updated_at': stale_time},
+            {'idempotency_key': 'bad', 'type': 'log', 'tracker_id': 999999,
+             'date': yesterday.isoformat(), 'completion_level': 1},
+        ]}, format='json')
+
+        assert [r['status'] for r in response.data['results']] == ['stale', 'error']
+        assert response.data['results'][0]['log']['completion_level'] == 3
+        assert HabitLog.objects.get(tracker=trackers[0], date=yesterday).completion_level == 3
+
+
+@pytest.mark.django_db
+class TestDailyNotesViews:
+    """Tests para el resumen y el listado mensual de notas diarias"""
+
+    def _create_notes(self, user):
+        """Notas en enero (2), marzo (1) y abril (1) de 2026, sin notas en febrero"""
+        from datetime import date
+        days = [date(2026, 1, 10), date(2026, 1, 20), date(2026, 3, 5), date(2026, 4, 1)]
+        DailyNote.objects.bulk_create([
+            DailyNote(user=user, date=day, notes=f'Nota {day}', all_habits_completed=(day.day != 20))
+            for day in days
+        ])
+
+    def test_monthly_notes_are_keyset_paginated(self, user_with_trackers, habits_client, django_assert_num_queries):
+        """Test los meses se agrupan en la base de datos y se paginan con before"""
+        user, _ = user_with_trackers
+        self._create_notes(user)
+        url = reverse('daily-notes-monthly')
+
+        # Token + meses agrupados + notas de esos meses
+        with django_assert_num_queries(3):
+            first = habits_client.get(url, {'limit': 2})
+
+        assert first.status_code == 200
+        assert [month['month_key'] for month in first.data['months']] == ['2026-04', '2026-03']
+        assert first.data['next_before'] == '2026-03'
+
+        second = habits_client.get(url, {'limit': 2, 'before': first.data['next_before']})
+        january = second.data['months'][0]
+        assert [month['month_key'] for month in second.data['months']] == ['2026-01']
+        assert second.data['next_before'] is None
+        assert january['count'] == 2
+        assert january['completed_count'] == 1
+        assert [str(note['date']) for note in january['notes']] == ['2026-01-20', '2026-01-10']
+
+    def test_monthly_notes_without_params_keeps_list_shape(self, user_with_trackers, habits_client):
+        """Test sin before ni limit se devuelve la lista completa de meses (formato original)"""
+        user, _ = user_with_trackers
+        self._create_notes(user)
+
+        response = habits_client.get(reverse('daily-notes-monthly'))
+
+        assert response.status_code == 200
+        assert isinstance(response.data, list)
+        assert [month['month_key'] for month in response.data] == ['2026-04', '2026-03', '2026-01']
+        assert len(response.data[-1]['notes']) == 2
+
+    def test_monthly_notes_rejects_invalid_cursor(self, habits_client):
+        """Test un before mal formado devuelve 400"""
+        response = habits_client.get(reverse('daily-notes-monthly'), {'before': '2026/01'})
+
+        assert response.status_code == 400
+
+    def test_summary_uses_single_aggregate(self, user_with_trackers, habits_client, django_assert_num_queries):
+        """Test el resumen sale de una sola consulta agregada"""
+        user, _ = user_with_trackers
+        self._create_notes(user)
+        today = timezone.now().date()
+        DailyNote.objects.create(user=user, date=today, notes='Hoy')
+
+        # Token + agregado
+        with django_assert_num_queries(2):
+            response = habits_client.get(reverse('daily-notes-summary'))
+
+        assert response.data['totalNotesCount'] == 5
+        assert response.data['currentMonthCount'] >= 1
+        assert response.data['lastNoteDate'] == today
@@ -2,6 +2,10 @@ from django.urls import path
 from .views import (
     UserHabitTrackersView,
     HabitLogView,
+    HabitLogBatchView,
+    HabitSyncView,
+    HabitAnalyticsView,
+    HabitCalendarView,
     HabitLogsHistoryView,
     DailyNoteView,  
     CheckAllHabitsCompletedView,
@@ -13,6 +17,10 @@ urlpatterns = [
     path('', UserHabitTrackersView.as_view(), name='user-habit-trackers'),
     path('my-trackers/', UserHabitTrackersView.as_view(), name='user-habit-trackers-alt'),
     path('log/', HabitLogView.as_view(), name='log-habit'),
+    path('log/batch/', HabitLogBatchView.as_view(), name='log-habit-batch'),
+    path('sync/', HabitSyncView.as_view(), name='habits-sync'),
+    path('analytics/', HabitAnalyticsView.as_view(), name='habits-analytics'),
+    path('calendar/', HabitCalendarView.as_view(), name='habits-calendar'),
     path('<int:habit_id>/history/', HabitLogsHistoryView.as_view(), name='habit-logs-history'),
     path('daily-notes/', DailyNoteView.as_view(), name='daily-notes'),  # Nueva
     path('check-completion/', CheckAllHabitsCompletedView.as_view(), name='check-completion'),  # Nueva
@@ -1,4 +1,6 @@
 # habits/views.py
+import json
+from datetime import timedelta
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -6,14 +8,26 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework import generics
 from django.utils import timezone
 from django.db.models import Prefetch
+from django.contrib.auth.models import User
+from cycles.models import UserCycle
 from questionnaires.models import HabitQuestion, UserHabitAnswer, HabitOption
 from questionnaires.serializers import HabitQuestionSerializer, UserHabitAnswerSerializer
 from .models import HabitTracker, HabitLog, HabitStreak, DailyNote
 from .serializers import HabitTrackerSerializer, HabitLogSerializer, DailyNoteSerializer
+from .services import HabitStreakService, HabitLogBatchService, HabitSyncService
+from .services import DailyNoteService, NOTES_MONTHS_DEFAULT, NOTES_MONTHS_MAX
+from .analytics import HabitAnalyticsService
+from .heatmap import HabitCalendarService, CALENDAR_DEFAULT_DAYS, CALENDAR_MAX_DAYS
 from recommendations.services import HabitTrackingService
 from recommendations.services import RecommendationService
 
 from gamification.services import GamificationService
+from gamification.models import DailyPoints
+from gamification.queue import GamificationQueue, deferred_enabled
+from gamification.batch import GamificationBatchService
+from gastro_assistant.db import upsert
+from gamification.views import GamificationDashboardView
+from cycles.services import CycleService
 
 
 class HabitQuestionsView(generics.ListAPIView):
@@ -63,11 +77,10 @@ class SubmitHabitQuestionnaireView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Guardar la respuesta
-            user_answer, created = UserHabitAnswer.objects.update_or_create(
-                user=request.user,
-                question=question,
-                is_onboarding=True,
-                defaults={'selected_option': option}
+            user_answer = upsert(
+                UserHabitAnswer,
+                {'user': request.user, 'question': question, 'is_onboarding': True},
+                {'selected_option': option}
             )
             
             saved_answers.append(user_answer)
@@ -180,13 +193,15 @@ class HabitLogView(APIView):
                     'error': 'Se requiere tracker_id o habit_id'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Crear o actualizar el log
-            log, created = HabitLog.objects.update_or_create(
-                tracker=tracker,
-                date=date,
-                defaults={
+            # Crear o actualizar el log (upsert: sin carreras por reintentos)
+            log = upsert(
+                HabitLog,
+                {'tracker': tracker, 'date': date},
+                {
+                    'user': request.user,
                     'completion_level': completion_level,
-                    'notes': notes
+                    'notes': notes,
+                    'client_updated_at': timezone.now()
                 }
             )
             
@@ -205,6 +220,10 @@ class HabitLogView(APIView):
                 'error': f'Error al registrar el hábito: {str(e)}'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # MODO DIFERIDO: encolar y responder con el estado actual de gamificación
+        if deferred_enabled():
+            return self._deferred_response(request.user, log, date)
+        
         # PROCESAR GAMIFICACIÓN después de registrar el hábito
         try:
             print(f"🎮 Procesando gamificación para usuario {request.user.id}")
@@ -219,27 +238,9 @@ class HabitLogView(APIView):
             response_data = {
                 'message': 'Hábito registrado con éxito',
                 'habit_data': HabitLogSerializer(log).data,
-                'gamification': {
-                    'points_earned_today': self._safe_get_points(gamification_result, 'daily_points'),
-                    'total_cycle_points': self._safe_get_cycle_points(gamification_result, 'user_level'),
-                    'current_level': self._safe_get_level(gamification_result, 'user_level'),
-                    'current_streak': self._safe_get_streak(gamification_result, 'user_level'),
-                    'new_medals': len(gamification_result.get('new_medals', [])),
-                    'level_up': gamification_result.get('level_up', False)
-                }
+                'gamification': self._gamification_data(gamification_result)
             }
             
-            # Añadir detalles de medallas nuevas si las hay
-            if gamification_result.get('new_medals'):
-                response_data['gamification']['medals_earned'] = [
-                    {
-                        'name': medal.medal.name,
-                        'icon': medal.medal.icon,
-                        'description': medal.medal.description
-                    }
-                    for medal in gamification_result['new_medals']
-                ]
-            
             return Response(response_data, status=status.HTTP_201_CREATED)
             
         except Exception as e:
@@ -254,44 +255,71 @@ class HabitLogView(APIView):
                 'gamification_error': 'Error calculando puntos, pero el hábito se guardó correctamente'
             }, status=status.HTTP_201_CREATED)
     
+    def _gamification_data(self, gamification_result):
+        """
+        Resumen de gamificación que devuelven los endpoints de registro
+        """
+        data = {
+            'points_earned_today': self._safe_get_points(gamification_result, 'daily_points'),
+            'total_cycle_points': self._safe_get_cycle_points(gamification_result, 'user_level'),
+            'current_level': self._safe_get_level(gamification_result, 'user_level'),
+            'current_streak': self._safe_get_streak(gamification_result, 'user_level'),
+            'new_medals': len(gamification_result.get('new_medals', [])),
+            'level_up': gamification_result.get('level_up', False)
+        }
+        
+        # Añadir detalles de medallas nuevas si las hay
+        if gamification_result.get('new_medals'):
+            data['medals_earned'] = [
+                {
+                    'name': medal.medal.name,
+                    'icon': medal.medal.icon,
+                    'description': medal.medal.description
+                }
+                for medal in gamification_result['new_medals']
+            ]
+        
+        return data
+    
+    def _deferred_response(self, user, log, date):
+        """
+        Encola el recálculo (se agrupa con otros registros del mismo día) y
+        devuelve la gamificación tal como está ahora, marcada como pendiente.
+        """
+        return Response({
+            'message': 'Hábito registrado con éxito',
+            'habit_data': HabitLogSerializer(log).data,
+            'gamification': self._deferred_gamification(user, date)
+        }, status=status.HTTP_201_CREATED)
+    
+    def _deferred_gamification(self, user, date):
+        """
+        Encola el recálculo y devuelve el estado actual de gamificación (pendiente)
+        """
+        GamificationQueue.enqueue(user.id, date)
+        
+        user_level = GamificationService.get_or_create_user_level(user)
+        points_today = DailyPoints.objects.filter(
+            user=user,
+            date=date
+        ).values_list('total_points', flat=True).first()
+        
+        return {
+            'points_earned_today': points_today or 0,
+            'total_cycle_points': user_level.current_cycle_points,
+            'current_level': user_level.current_level,
+            'current_streak': user_level.current_streak,
+            'new_medals': 0,
+            'level_up': False,
+            'pending': True
+        }
+    
     def _update_habit_streak(self, tracker, date, completion_level):
         """
         Actualiza la racha de cumplimiento de un hábito.
         """
         try:
-            # Obtener o crear el streak
-            streak, created = HabitStreak.objects.get_or_create(
-                tracker=tracker,
-                defaults={
-                    'current_streak': 0,
-                    'longest_streak': 0,
-                    'last_log_date': None
-                }
-            )
-            
-            # Si el hábito se completó (nivel >= 2)
-            if completion_level >= 2:
-                # Verificar si es consecutivo
-                if (streak.last_log_date and 
-                    (date - streak.last_log_date).days == 1):
-                    # Continuar racha
-                    streak.current_streak += 1
-                elif streak.last_log_date is None or (date - streak.last_log_date).days > 1:
-                    # Iniciar nueva racha
-                    streak.current_streak = 1
-                
-                # Actualizar racha más larga si es necesario
-                if streak.current_streak > streak.longest_streak:
-                    streak.longest_streak = streak.current_streak
-                    
-            else:
-                # Romper racha si no se completó adecuadamente
-                streak.current_streak = 0
-            
-            # Actualizar fecha del último registro
-            streak.last_log_date = date
-            streak.save()
-            
+            HabitStreakService.advance_many({tracker.id: completion_level}, date)
         except Exception as e:
             print(f"❌ Error al actualizar streak: {str(e)}")
     
@@ -343,6 +371,222 @@ class HabitLogView(APIView):
         except:
             return 0
 
+class HabitLogBatchView(HabitLogView):
+    """
+    Vista para registrar varios hábitos del mismo día en una sola petición.
+    Resuelve los trackers con una consulta, guarda logs y rachas en bloque
+    y procesa la gamificación una sola vez.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        """
+        Espera un JSON como:
+        {
+            "date": "2023-06-15", (opcional, default=hoy)
+            "logs": [
+                {"tracker_id": 1, "completion_level": 3, "notes": ""},
+                {"habit_id": 4, "completion_level": 2},
+                ...
+            ]
+        }
+        """
+        items = request.data.get('logs')
+        date_str = request.data.get('date')
+        
+        if not isinstance(items, list) or not items:
+            return Response({
+                'error': 'Se requiere una lista de registros en logs'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Procesar fecha
+        if date_str:
+            try:
+                from datetime import datetime
+                date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            except ValueError:
+                return Response({
+                    'error': 'Formato de fecha inválido. Use YYYY-MM-DD'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            date = timezone.now().date()
+        
+        valid, results = HabitLogBatchService.validate_items(request.user, items)
+        if not valid:
+            return Response({
+                'error': 'Ningún registro válido',
+                'results': results
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            logs = HabitLogBatchService.log_many(request.user, date, valid)
+            print(f"✅ {len(logs)} hábitos registrados en lote para usuario {request.user.id}")
+        except Exception as e:
+            print(f"❌ Error al crear logs en lote: {str(e)}")
+            return Response({
+                'error': f'Error al registrar los hábitos: {str(e)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        for index, tracker, _, _ in valid:
+            log, created = logs[tracker.id]
+            results[index]['created'] = created
+            results[index]['habit_data'] = HabitLogSerializer(log).data
+        
+        response_data = {
+            'message': 'Hábitos registrados con éxito',
+            'logged': len(valid),
+            'failed': len(results) - len(valid),
+            'results': results
+        }
+        
+        # MODO DIFERIDO: encolar y responder con el estado actual de gamificación
+        if deferred_enabled():
+            response_data['gamification'] = self._deferred_gamification(request.user, date)
+            return Response(response_data, status=status.HTTP_201_CREATED)
+        
+        # PROCESAR GAMIFICACIÓN una vez para todo el lote
+        try:
+            gamification_result = GamificationService.process_daily_gamification(
+                user=request.user,
+                target_date=date
+            )
+            response_data['gamification'] = self._gamification_data(gamification_result)
+        except Exception as e:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.error(f"Error en gamificación para usuario {request.user.id}: {str(e)}")
+            response_data['gamification_error'] = 'Error calculando puntos, pero los hábitos se guardaron correctamente'
+        
+        return Response(response_data, status=status.HTTP_201_CREATED)
+
+class HabitSyncView(APIView):
+    """
+    Sincronización incremental para el registro offline de hábitos.
+    GET ?since=<cursor> devuelve solo lo modificado desde el cursor;
+    POST aplica un lote de escrituras hechas sin conexión.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        since = None
+        token = request.query_params.get('since')
+        if token:
+            try:
+                since = HabitSyncService.parse_cursor(token)
+            except ValueError:
+                return Response({
+                    'error': 'Cursor inválido, sincronice sin since'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(HabitSyncService.changes_since(request.user, since))
+    
+    def post(self, request):
+        """
+        Espera un JSON como:
+        {
+            "changes": [
+                {"idempotency_key": "a1b2", "type": "log", "tracker_id": 1,
+                 "date": "2023-06-15", "completion_level": 3, "notes": "",
+                 "client_updated_at": "2023-06-15T21:04:00+02:00"},
+                {"idempotency_key": "c3d4", "type": "note", "date": "2023-06-15",
+                 "notes": "Buen día", "client_updated_at": "..."},
+                ...
+            ]
+        }
+        """
+        changes = request.data.get('changes')
+        if not isinstance(changes, list) or not changes:
+            return Response({
+                'error': 'Se requiere una lista de cambios en changes'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        results, written_dates = HabitSyncService.apply(request.user, changes)
+        
+        # Gamificación de los días escritos (y de los siguientes que dependen de ellos)
+        if written_dates:
+            try:
+                if deferred_enabled():
+                    for log_date in written_dates:
+                        GamificationQueue.enqueue(request.user.id, log_date)
+                else:
+                    GamificationBatchService.recompute_days(request.user, written_dates)
+            except Exception as e:
+                print(f"❌ Error en gamificación tras sincronizar: {str(e)}")
+        
+        statuses = [result['status'] for result in results]
+        return Response({
+            'applied': statuses.count('applied'),
+            'stale': statuses.count('stale'),
+            'errors': statuses.count('error'),
+            'results': results
+        })
+
+class HabitAnalyticsView(APIView):
+    """
+    Tendencias de adherencia por hábito en un ciclo.
+    Query params: ?cycle=<número de ciclo> (opcional, default=ciclo actual)
+    El personal puede consultar a otro usuario con ?user_id=<id>.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        user = request.user
+        user_id = request.query_params.get('user_id')
+        if user_id and request.user.is_staff:
+            try:
+                user = User.objects.get(id=int(user_id))
+            except (ValueError, User.DoesNotExist):
+                return Response({
+                    'error': 'Usuario no encontrado'
+                }, status=status.HTTP_404_NOT_FOUND)
+        
+        cycles = UserCycle.objects.filter(user=user)
+        cycle_number = request.query_params.get('cycle')
+        if cycle_number:
+            try:
+                cycle = cycles.filter(cycle_number=int(cycle_number)).first()
+            except ValueError:
+                return Response({
+                    'error': 'cycle debe ser un número'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            cycle = cycles.order_by('-cycle_number').first()
+        
+        if cycle is None:
+            return Response({
+                'error': 'No se encontró el ciclo'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response(HabitAnalyticsService.for_cycle(user, cycle))
+
+class HabitCalendarView(APIView):
+    """
+    Calendario de todos los hábitos en formato compacto (bits empaquetados).
+    Query params: ?from=2023-01-01&to=2023-12-31 (opcionales, default=último año)
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        start, end = HabitCalendarService.default_range(timezone.now().date())
+        try:
+            from datetime import datetime
+            if request.query_params.get('to'):
+                end = datetime.strptime(request.query_params['to'], '%Y-%m-%d').date()
+                start = end - timedelta(days=CALENDAR_DEFAULT_DAYS - 1)
+            if request.query_params.get('from'):
+                start = datetime.strptime(request.query_params['from'], '%Y-%m-%d').date()
+        except ValueError:
+            return Response({
+                'error': 'Formato de fecha inválido. Use YYYY-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if end < start or (end - start).days >= CALENDAR_MAX_DAYS:
+            return Response({
+                'error': f'Rango inválido (máximo {CALENDAR_MAX_DAYS} días)'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(HabitCalendarService.packed(request.user, start, end))
+
 class HabitLogsHistoryView(generics.ListAPIView):
     """
     Vista para obtener el historial de logs de un hábito específico.
@@ -362,7 +606,7 @@ class HabitLogsHistoryView(generics.ListAPIView):
         start_date = timezone.now().date() - timezone.timedelta(days=days)
         
         return HabitLog.objects.filter(
-            tracker__user=self.request.user,
+            user=self.request.user,
             tracker__habit_id=habit_id,
             date__gte=start_date
         ).select_related('tracker').order_by('-date')
@@ -400,13 +644,10 @@ class DailyNoteView(APIView):
             date = timezone.now().date()
         
         # Crear o actualizar la nota diaria
-        daily_note, created = DailyNote.objects.update_or_create(
-            user=request.user,
-            date=date,
-            defaults={
-                'notes': notes,
-                'all_habits_completed': all_completed
-            }
+        daily_note = upsert(
+            DailyNote,
+            {'user': request.user, 'date': date},
+            {'notes': notes, 'all_habits_completed': all_completed, 'client_updated_at': timezone.now()}
         )
         
         return Response({
@@ -470,7 +711,7 @@ class CheckAllHabitsCompletedView(APIView):
         
         # Verificar logs del día
         logs_today = HabitLog.objects.filter(
-            tracker__user=request.user,
+            user=request.user,
             date=date
         ).values_list('tracker_id', flat=True)
         
@@ -496,60 +737,105 @@ class DailyNotesSummaryView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user = request.user
-        today = timezone.now().date()
-        current_month_start = today.replace(day=1)
+        summary = DailyNoteService.summary(request.user, timezone.now().date())
         
-        # Contar notas del mes actual
-        current_month_count = DailyNote.objects.filter(
-            user=user,
-            date__gte=current_month_start,
-            date__lte=today
-        ).count()
+        return Response({
+            'currentMonthCount': summary['current_month'],
+            'totalNotesCount': summary['total'],
+            'lastNoteDate': summary['last_date']
+        })
+    
+class DailyNotesMonthlyView(APIView):
+    """
+    Vista para obtener notas agrupadas por mes, paginadas por mes.
+    Query params: ?before=YYYY-MM (meses anteriores a ese, excluido) y ?limit=N meses.
+    Sin parámetros de paginación devuelve la lista de todos los meses
+    (formato original, para las versiones de la app que no paginan).
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if 'before' not in request.query_params and 'limit' not in request.query_params:
+            months, _ = DailyNoteService.monthly_page(request.user, limit=None)
+            return Response(months)
         
-        # Total de notas
-        total_notes = DailyNote.objects.filter(user=user).count()
+        before = request.query_params.get('before')
+        if before:
+            try:
+                before = DailyNoteService.parse_month(before)
+            except ValueError:
+                return Response({
+                    'error': 'Formato de mes inválido. Use YYYY-MM'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            before = None
+        
+        limit = NOTES_MONTHS_DEFAULT
+        if request.query_params.get('limit'):
+            try:
+                limit = int(request.query_params['limit'])
+            except ValueError:
+                return Response({'error': 'limit debe ser un número'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, NOTES_MONTHS_MAX))
         
-        # Última nota
-        last_note = DailyNote.objects.filter(user=user).order_by('-date').first()
+        months, next_before = DailyNoteService.monthly_page(request.user, before, limit)
         
         return Response({
-            'currentMonthCount': current_month_count,
-            'totalNotesCount': total_notes,
-            'lastNoteDate': last_note.date if last_note else None
+            'months': months,
+            'next_before': next_before
         })
-    
-class DailyNotesMonthlyView(APIView):
-    """Vista para obtener notas agrupadas por mes"""
+
+class TodayView(APIView):
+    """
+    Pantalla de inicio en una sola petición: hábitos con rachas y registro de hoy,
+    estado de completado y del modal, contadores del ciclo y resumen de gamificación.
+    Sustituye a las llamadas separadas al abrir la app.
+    """
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         user = request.user
+        date = timezone.now().date()
         
-        # Obtener todas las notas ordenadas por fecha
-        notes = DailyNote.objects.filter(user=user).order_by('-date')
-        
-        # Agrupar por mes
-        monthly_notes = {}
-        for note in notes:
-            month_key = note.date.strftime('%Y-%m')
-            month_name = note.date.strftime('%B %Y')
-            
-            if month_key not in monthly_notes:
-                monthly_notes[month_key] = {
-                    'month': month_name,
-                    'month_key': month_key,
-                    'notes': []
-                }
-            
-            monthly_notes[month_key]['notes'].append({
-                'id': note.id,
-                'date': note.date,
-                'notes': note.notes,
-                'all_habits_completed': note.all_habits_completed
-            })
+        # Trackers con hábito, opciones, racha y el log de hoy precargados
+        trackers = list(
+            HabitTracker.objects.filter(
+                user=user,
+                is_active=True
+            ).select_related('habit', 'streak').prefetch_related(
+                'habit__options',
+                Prefetch('logs', queryset=HabitLog.objects.filter(date=date), to_attr='today_logs')
+            )
+        )
         
-        # Convertir a lista ordenada
-        result = list(monthly_notes.values())
+        habits = []
+        completed_count = 0
+        for tracker in trackers:
+            data = HabitTrackerSerializer(tracker).data
+            today_log = tracker.today_logs[0] if tracker.today_logs else None
+            data['today_log'] = {
+                'id': today_log.id,
+                'completion_level': today_log.completion_level,
+                'notes': today_log.notes,
+                'logged_at': today_log.logged_at
+            } if today_log else None
+            completed_count += today_log is not None
+            habits.append(data)
+        
+        # La nota del día indica si ya se mostró el modal de celebración
+        daily_note = DailyNote.objects.filter(user=user, date=date).first()
         
-        return Response(result)
\ No newline at end of file
+        return Response({
+            'date': str(date),
+            'trackers': habits,
+            'completion': {
+                'has_habits': bool(trackers),
+                'all_completed': bool(trackers) and completed_count == len(trackers),
+                'modal_shown': daily_note is not None,
+                'completed_count': completed_count,
+                'total_habits': len(trackers)
+            },
+            'daily_note': DailyNoteSerializer(daily_note).data if daily_note else None,
+            'cycle': CycleService.status_summary(user),
+            'gamification': json.loads(GamificationDashboardView.cached_payload(user))
+        })
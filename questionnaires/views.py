@@ -14,6 +14,7 @@ from .serializers import (
     HabitQuestionSerializer, UserHabitAnswerSerializer
 )
 from habits.models import HabitTracker
+from gastro_assistant.db import upsert
 from recommendations.services import HabitTrackingService
 
 # --- Vistas para cuestionarios existentes ---
@@ -259,11 +260,10 @@ class SubmitHabitQuestionnaireView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
 
             # Guardar la respuesta
-            user_answer, created = UserHabitAnswer.objects.update_or_create(
-                user=request.user,
-                question=question,
-                is_onboarding=True,
-                defaults={'selected_option': option}
+            user_answer = upsert(
+                UserHabitAnswer,
+                {'user': request.user, 'question': question, 'is_onboarding': True},
+                {'selected_option': option}
             )
             saved_answers.append(user_answer)
 
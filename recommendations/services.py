@@ -1,5 +1,6 @@
 # recommendations/services.py - VERSIÓN CORREGIDA
 
+from django.db import transaction
 from django.db.models import Avg
 from django.utils import timezone
 from .models import RecommendationType, ConditionalRecommendation, UserRecommendation
@@ -244,12 +245,22 @@ class RecommendationService:
         
         return top_recommendations
 
-# HabitTrackingService sin cambios
 class HabitTrackingService:
+    """
+    Configuración de los hábitos en seguimiento a partir del cuestionario de hábitos
+    """
+    
+    TRACKER_SYNC_FIELDS = ['is_active', 'is_promoted', 'current_score', 'target_score', 'updated_at']
+    
     @staticmethod
     def setup_habit_tracking(user, num_habits=5):
-        HabitTracker.objects.filter(user=user).delete()
-        
+        """
+        Reconcilia los trackers del usuario con los num_habits peores hábitos
+        (sin contar los excluidos). Los trackers que salen se desactivan, los que
+        vuelven se reactivan y los nuevos se insertan en bloque: los logs y
+        rachas existentes se conservan.
+        Devuelve (trackers activos, tracker promocionado).
+        """
         EXCLUDED_HABIT_TYPES = ['SMOKING', 'ALCOHOL']
         
         habit_answers = UserHabitAnswer.objects.filter(
@@ -262,10 +273,6 @@ class HabitTrackingService:
             if answer.question.habit_type not in EXCLUDED_HABIT_TYPES
         ]
         
-        if not filtered_answers:
-            print(f"Usuario {user.username}: No hay hábitos válidos para configurar")
-            return []
-        
         sorted_answers = sorted(
             filtered_answers,
             key=lambda x: x.selected_option.value
@@ -273,24 +280,53 @@ class HabitTrackingService:
         
         worst_habits = sorted_answers[:num_habits]
         
+        existing = {tracker.habit_id: tracker for tracker in HabitTracker.objects.filter(user=user)}
+        now = timezone.now()
+        
         trackers = []
-        promoted_habit = None
+        to_create = []
+        to_update = []
         
         for i, answer in enumerate(worst_habits):
-            is_promoted = (i == 0)
+            target = {
+                'is_active': True,
+                'is_promoted': (i == 0),
+                'current_score': answer.selected_option.value,
+                'target_score': 3
+            }
             
-            tracker = HabitTracker.objects.create(
-                user=user,
-                habit=answer.question,
-                current_score=answer.selected_option.value,
-                target_score=3,
-                is_promoted=is_promoted
-            )
+            tracker = existing.pop(answer.question_id, None)
+            if tracker is None:
+                tracker = HabitTracker(user=user, habit=answer.question, **target)
+                to_create.append(tracker)
+            elif any(getattr(tracker, field) != value for field, value in target.items()):
+                for field, value in target.items():
+                    setattr(tracker, field, value)
+                tracker.updated_at = now
+                to_update.append(tracker)
             trackers.append(tracker)
-            
-            if is_promoted:
-                promoted_habit = tracker
         
-        print(f"Usuario {user.username}: {len(trackers)} hábitos configurados para tracking")
+        # Hábitos que ya no están entre los peores: se desactivan conservando su historial
+        for tracker in existing.values():
+            if tracker.is_active or tracker.is_promoted:
+                tracker.is_active = False
+                tracker.is_promoted = False
+                tracker.updated_at = now
+                to_update.append(tracker)
+        
+        with transaction.atomic():
+            if to_create:
+                HabitTracker.objects.bulk_create(to_create)
+            if to_update:
+                HabitTracker.objects.bulk_update(to_update, HabitTrackingService.TRACKER_SYNC_FIELDS)
+        
+        if not trackers:
+            print(f"Usuario {user.username}: No hay hábitos válidos para configurar")
+            return [], None
+        
+        print(
+            f"Usuario {user.username}: {len(trackers)} hábitos configurados para tracking "
+            f"({len(to_create)} nuevos, {len(to_update)} actualizados)"
+        )
         
-        return trackers, promoted_habit
\ No newline at end of file
+        return trackers, trackers[0]
@@ -0,0 +1,67 @@
+# recommendations/tests/test_services.py
+import pytest
+from django.contrib.auth.models import User
+from django.utils import timezone
+from habits.models import HabitTracker, HabitLog
+from questionnaires.models import HabitQuestion, HabitOption, UserHabitAnswer
+from recommendations.services import HabitTrackingService
+
+
+@pytest.mark.django_db
+class TestHabitTrackingService:
+    """Tests para la configuración de hábitos en seguimiento"""
+
+    @pytest.fixture
+    def answered_user(self):
+        """Usuario con respuestas a siete hábitos (uno excluido)"""
+        user = User.objects.create_user(username='trackeduser')
+        questions = [
+            HabitQuestion.objects.create(habit_type=habit_type, text=habit_type)
+            for habit_type in ('MEAL_SIZE', 'DINNER_TIME', 'LIE_DOWN', 'NIGHT_SYMPTOMS',
+                               'FOOD_TRIGGERS', 'STRESS', 'SMOKING')
+        ]
+        options = {
+            question.id: [
+                HabitOption.objects.create(question=question, text=str(value), value=value)
+                for value in range(4)
+            ]
+            for question in questions
+        }
+
+        def answer(values):
+            for question, value in zip(questions, values):
+                UserHabitAnswer.objects.update_or_create(
+                    user=user,
+                    question=question,
+                    is_onboarding=True,
+                    defaults={'selected_option': options[question.id][value]}
+                )
+
+        return user, questions, answer
+
+    def test_reonboarding_keeps_history(self, answered_user):
+        """Test volver a hacer el cuestionario desactiva y reactiva trackers sin borrar logs"""
+        user, questions, answer = answered_user
+        answer([0, 1, 1, 2, 2, 3, 0])
+
+        trackers, promoted = HabitTrackingService.setup_habit_tracking(user)
+        assert {t.habit_id for t in trackers} == {q.id for q in questions[:5]}
+        assert promoted.habit_id == questions[0].id
+        log = HabitLog.objects.create(tracker=promoted, date=timezone.now().date(), completion_level=3)
+
+        # El primer hábito mejora: sale de los peores y entra STRESS
+        answer([3, 1, 1, 2, 2, 0, 0])
+        trackers, promoted = HabitTrackingService.setup_habit_tracking(user)
+
+        assert promoted.habit_id == questions[5].id
+        assert {t.habit_id for t in trackers} == {q.id for q in questions[1:6]}
+        assert HabitLog.objects.filter(pk=log.pk).exists()
+        assert list(HabitTracker.objects.filter(user=user, is_promoted=True)) == [promoted]
+        assert HabitTracker.objects.get(user=user, habit=questions[0]).is_active is False
+        assert HabitTracker.objects.filter(user=user, is_active=True).count() == 5
+
+        # Vuelve a empeorar: el mismo tracker se reactiva con su historial
+        answer([0, 1, 1, 2, 2, 3, 0])
+        trackers, promoted = HabitTrackingService.setup_habit_tracking(user)
+        assert promoted.pk == log.tracker_id
+        assert HabitTracker.objects.filter(user=user).count() == 6
@@ -32,9 +32,17 @@ PASSWORD_HASHERS = [
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+    # Caché real para los tests que la necesitan (override de GAMIFICATION_CACHE_ALIAS)
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
     }
 }
 
+# Contar todas las lecturas del dashboard (sin muestreo) para tests deterministas
+GAMIFICATION_CACHE_STATS_SAMPLE_RATE = 1
+
 # Email backend para tests (no envía emails reales)
 EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 